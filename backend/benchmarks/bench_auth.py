@@ -0,0 +1,61 @@
+"""Per-request overhead of get_current_user with and without the token cache.
+
+Issues tokens for a handful of users and resolves them the way FastAPI does
+on every authenticated request: cold (cache disabled, jwt.decode each time)
+and warm (verified claims served from the cache). Needs JWT_SECRET and
+JWT_ALGORITHM set as for the app.
+
+Run from backend/:  python -m benchmarks.bench_auth
+"""
+
+import time
+import uuid
+import asyncio
+import argparse
+
+import numpy as np
+
+from config.settings import settings
+from routes import auth
+from utils.token_cache import TokenCache
+
+
+def measure(tokens, requests: int):
+    async def run():
+        latencies = []
+        for i in range(requests):
+            token = tokens[i % len(tokens)]
+            started = time.perf_counter()
+            await auth.get_current_user(token)
+            latencies.append((time.perf_counter() - started) * 1e6)
+        return latencies
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    settings.JWT_SECRET = settings.JWT_SECRET or "bench-secret"
+    settings.JWT_ALGORITHM = settings.JWT_ALGORITHM or "HS256"
+    tokens = [
+        auth.create_access_token({"sub": str(uuid.uuid4()), "role": "user"})
+        for _ in range(args.users)
+    ]
+
+    print(f"{args.requests} requests over {args.users} tokens ({settings.JWT_ALGORITHM})")
+    print(f"{'mode':>10} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+    for label, size in (("uncached", 0), ("cached", 10000)):
+        auth.token_cache = TokenCache(size)
+        latencies = measure(tokens, args.requests)
+        print(
+            f"{label:>10} {np.percentile(latencies, 50):>8.1f} "
+            f"{np.percentile(latencies, 99):>8.1f} {np.mean(latencies):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Latency of the department doctor lookup used by the booking agent.
+
+Compares the previous per-doctor enrichment (a connection per doctor, one
+availability query and one booking check per slot, reproduced below as
+baseline_doctor_availability) with the batched lookup_department_doctors
+for departments of 5, 50 and 500 doctors. Seeds a throwaway hospital in the
+configured Postgres database and deletes it afterwards.
+
+Run from backend/:  python -m benchmarks.bench_department_doctors
+"""
+
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from utils.db import get_db_connection
+from utils.agents import (
+    DAYS_OF_WEEK,
+    get_doctors,
+    lookup_department_doctors,
+)
+
+# Same 30-minute, 09:00-18:00 grid assign_doctor creates.
+SLOTS = []
+for hour in range(9, 18):
+    SLOTS += [
+        (f"{hour:02d}:00", f"{hour:02d}:30"),
+        (f"{hour:02d}:30", f"{hour + 1:02d}:00"),
+    ]
+
+
+def seed(n_doctors: int):
+    conn = get_db_connection()
+    c = conn.cursor()
+    now = datetime.utcnow()
+    hospital_id, department_id = str(uuid.uuid4()), str(uuid.uuid4())
+    c.execute(
+        "INSERT INTO hospitals (id, name, address, lat, lng, created_at) VALUES (%s, %s, %s, %s, %s, %s)",
+        (hospital_id, f"bench_{hospital_id[:8]}", "bench", 0.0, 0.0, now),
+    )
+    c.execute(
+        "INSERT INTO departments (id, hospital_id, name) VALUES (%s, %s, %s)",
+        (department_id, hospital_id, f"Bench {n_doctors}"),
+    )
+    doctor_ids = [str(uuid.uuid4()) for _ in range(n_doctors)]
+    execute_values(
+        c,
+        "INSERT INTO users (id, username, email, password, role, created_at) VALUES %s",
+        [(d, f"bench_{d}", f"{d}@bench.local", "x", "doctor", now) for d in doctor_ids],
+    )
+    execute_values(
+        c,
+        "INSERT INTO doctors (user_id, department_id, specialty, title) VALUES %s",
+        [(d, department_id, "Bench", "Dr. Bench") for d in doctor_ids],
+    )
+    execute_values(
+        c,
+        "INSERT INTO doctor_availability (id, user_id, day_of_week, start_time, end_time) VALUES %s",
+        [
+            (str(uuid.uuid4()), d, day, start, end)
+            for d in doctor_ids
+            for day in DAYS_OF_WEEK[:6]
+            for start, end in SLOTS
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return hospital_id, department_id, doctor_ids
+
+
+def cleanup(hospital_id: str, doctor_ids):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("DELETE FROM users WHERE id = ANY(%s::uuid[])", (doctor_ids,))
+    c.execute("DELETE FROM hospitals WHERE id = %s", (hospital_id,))
+    conn.commit()
+    conn.close()
+
+
+def baseline_doctor_availability(doctor_id: str):
+    """get_doctor_availability as it was before batching: N + 1 queries."""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT id, day_of_week, start_time, end_time
+        FROM doctor_availability
+        WHERE user_id = %s
+        """,
+        (doctor_id,),
+    )
+    availability = [
+        {"id": row[0], "day_of_week": row[1], "start_time": row[2], "end_time": row[3]}
+        for row in c.fetchall()
+    ]
+    today = datetime.now()
+    for slot in availability:
+        days_until_target = (
+            DAYS_OF_WEEK.index(slot["day_of_week"]) - today.weekday() + 7
+        ) % 7 or 7
+        slot_date = (today + timedelta(days=days_until_target)).strftime("%Y-%m-%d")
+        c.execute(
+            """
+            SELECT id FROM appointments
+            WHERE doctor_id = %s AND appointment_date = %s AND start_time = %s AND status != 'cancelled'
+            """,
+            (doctor_id, slot_date, slot["start_time"]),
+        )
+        slot["is_booked"] = bool(c.fetchone())
+    conn.close()
+    return availability
+
+
+def serial_lookup(department_id: str):
+    doctors = get_doctors(department_id=department_id)
+    for doctor in doctors:
+        doctor["availability"] = baseline_doctor_availability(doctor["user_id"])
+    return doctors
+
+
+def timed(function, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'doctors':>8} {'serial p50 ms':>14} {'batched p50 ms':>15} {'speedup':>8}")
+    for size in args.sizes:
+        hospital_id, department_id, doctor_ids = seed(size)
+        try:
+            serial, _ = timed(lambda: serial_lookup(department_id), args.repeats)
+            batched, _ = timed(
+                lambda: asyncio.run(lookup_department_doctors("Bench", department_id)),
+                args.repeats,
+            )
+        finally:
+            cleanup(hospital_id, doctor_ids)
+        print(f"{size:>8} {serial:>14.1f} {batched:>15.1f} {serial / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
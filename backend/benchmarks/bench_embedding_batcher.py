@@ -0,0 +1,90 @@
+"""Upstream calls and latency of query embeddings with and without batching.
+
+Simulates N concurrent /api/general-query requests, each embedding one
+distinct query, against a fake provider that costs a fixed round trip per
+call plus a small per-text cost (roughly the shape of the Gemini embedding
+API). Reports upstream calls and per-caller p50/p99 latency for direct
+embed_query and for BatchingEmbeddings at several window sizes.
+
+Run from backend/:  python -m benchmarks.bench_embedding_batcher
+"""
+
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_batcher import BatchingEmbeddings
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, round_trip_ms: float, per_text_ms: float, dim: int = 768):
+        self.round_trip = round_trip_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.dim = dim
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.round_trip + self.per_text * len(texts))
+        return [[float(len(text))] * self.dim for text in texts]
+
+    def embed_documents(
+        self, texts: List[str], task_type: Optional[str] = None
+    ) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def run(embeddings: Embeddings, requests: int, concurrency: int):
+    def one(i: int) -> float:
+        started = time.perf_counter()
+        embeddings.embed_query(f"query {i}")
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--round-trip-ms", type=float, default=60)
+    parser.add_argument("--per-text-ms", type=float, default=0.5)
+    parser.add_argument("--windows", type=float, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    print(
+        f"{args.requests} queries, {args.concurrency} concurrent callers, "
+        f"{args.round_trip_ms:.0f} ms round trip"
+    )
+    print(f"{'mode':>14} {'calls':>6} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    modes = [("direct", None)] + [(f"window {w:g} ms", w) for w in args.windows]
+    for label, window in modes:
+        fake = FakeEmbeddings(args.round_trip_ms, args.per_text_ms)
+        embeddings = fake
+        if window is not None:
+            embeddings = BatchingEmbeddings(
+                fake, window_ms=window, max_batch=args.max_batch, max_in_flight=8
+            )
+        elapsed, latencies = run(embeddings, args.requests, args.concurrency)
+        print(
+            f"{label:>14} {fake.calls:>6} {args.requests / elapsed:>8.0f} "
+            f"{np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Recall@k and latency of vector-only, BM25-only and hybrid RAG retrieval.
+
+Uses known-item queries: for sampled corpus chunks, the query is the chunk's
+rarest terms (drug and condition names, typically) plus a few common ones,
+and a hit means the source chunk is in the top k. Needs a local vector index
+(python -m utils.ingest with VECTOR_STORE_BACKEND=local) and a BM25 index
+(python -m utils.bm25) over the same corpus. Query embeddings go through the
+embedding cache, so reruns make no embedding calls.
+
+Run from backend/:  python -m benchmarks.bench_hybrid_retrieval
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from config.settings import settings
+from utils.bm25 import BM25Index, tokenize
+from utils.hybrid_retriever import CrossEncoderReranker, HybridRetriever
+from utils.local_vector_store import LocalVectorStore
+from utils.pineconeutils import EMBEDDING_DIMENSION, create_embeddings
+
+
+def known_item_queries(bm25: BM25Index, n: int, rare: int, common: int, seed: int):
+    rng = np.random.default_rng(seed)
+    df = np.diff(bm25.indptr)
+    rows = rng.choice(bm25.n_docs, size=min(n, bm25.n_docs), replace=False)
+    queries = []
+    for row, document in zip(rows, bm25.documents(rows.tolist())):
+        terms = sorted(
+            set(tokenize(document.page_content)), key=lambda t: df[bm25.vocab[t]]
+        )
+        if len(terms) < rare + common:
+            continue
+        words = terms[:rare] + list(
+            rng.choice(terms[rare:], size=common, replace=False)
+        )
+        queries.append((" ".join(words), document.id))
+    return queries
+
+
+def evaluate(search, queries, k: int):
+    hits, latencies = 0, []
+    for query, expected in queries:
+        started = time.perf_counter()
+        documents = search(query)[:k]
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(document.id == expected for document in documents)
+    return (
+        hits / len(queries),
+        np.percentile(latencies, 50),
+        np.percentile(latencies, 99),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=settings.LOCAL_INDEX_PATH)
+    parser.add_argument("--bm25", default=settings.BM25_INDEX_PATH)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rare-terms", type=int, default=2)
+    parser.add_argument("--common-terms", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=settings.RAG_CANDIDATES)
+    parser.add_argument("-k", type=int, default=settings.RAG_TOP_K)
+    parser.add_argument("--reranker", default=settings.RAG_RERANKER_MODEL)
+    args = parser.parse_args()
+
+    bm25 = BM25Index.load(args.bm25)
+    store = LocalVectorStore(args.index, create_embeddings(), dim=EMBEDDING_DIMENSION)
+    queries = known_item_queries(
+        bm25, args.queries, args.rare_terms, args.common_terms, 0
+    )
+    # Embed every query once up front so the timings below compare retrieval,
+    # not the embedding API.
+    for query, _ in queries:
+        store.embeddings.embed_query(query)
+
+    hybrid = HybridRetriever(
+        vector_store=store, bm25=bm25, k=args.k, candidates=args.candidates
+    )
+    systems = {
+        "vector": lambda q: store.similarity_search(q, k=args.k),
+        "bm25": lambda q: bm25.search_documents(q, args.k),
+        "hybrid": hybrid.invoke,
+    }
+    if args.reranker:
+        reranked = HybridRetriever(
+            vector_store=store,
+            bm25=bm25,
+            k=args.k,
+            candidates=args.candidates,
+            reranker=CrossEncoderReranker(args.reranker),
+        )
+        systems["hybrid+rerank"] = reranked.invoke
+
+    print(f"{len(queries)} known-item queries over {bm25.n_docs} chunks")
+    print(f"{'retriever':>14} {f'recall@{args.k}':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, search in systems.items():
+        recall, p50, p99 = evaluate(search, queries, args.k)
+        print(f"{name:>14} {recall:>9.3f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
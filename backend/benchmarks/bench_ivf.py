@@ -0,0 +1,94 @@
+"""nprobe vs recall vs latency for the IVF local vector index.
+
+Builds a LocalVectorStore over clustered synthetic 768-dim vectors, trains
+an IVF index on the first 90% and adds the rest incrementally (exercising
+the tail path), then sweeps nprobe. Recall@k is against exact float64 cosine
+top-k; "scanned" is the mean fraction of rows scored per query. Pass
+--quantization int8|pq to scan codes instead of full vectors.
+
+Run from backend/:  python -m benchmarks.bench_ivf
+"""
+
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.bench_vector_index import exact_top_k, recall, synthetic_vectors
+from utils.local_vector_store import LocalVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, help="Default: 4 * sqrt(size)")
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64]
+    )
+    parser.add_argument("--quantization", choices=["int8", "pq"])
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.size + args.queries, args.dim, args.clusters)
+    vectors, queries = vectors[: args.size], vectors[args.size :]
+    expected = exact_top_k(vectors, queries, args.k)
+    built = int(args.size * 0.9)
+
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(path, None, dim=args.dim)
+        store.add_embeddings([str(i) for i in range(built)], vectors[:built])
+        if args.quantization:
+            store.quantize(args.quantization)
+        started = time.perf_counter()
+        store.build_ivf(args.nlist)
+        build_seconds = time.perf_counter() - started
+        store.add_embeddings([str(i) for i in range(built, args.size)], vectors[built:])
+        print(
+            f"{args.size} vectors, {store.ivf.nlist} lists, built in {build_seconds:.1f}s, "
+            f"{len(store.ivf.tail)} rows in the tail"
+        )
+
+        def sweep(label: str):
+            print(f"{label}")
+            print(
+                f"{'nprobe':>7} {'scanned':>8} {f'recall@{args.k}':>9} {'p50 ms':>8} {'p99 ms':>8}"
+            )
+            for nprobe in args.nprobe:
+                store.nprobe = nprobe
+                probes = store.ivf.probe(queries, nprobe)
+                scanned = np.mean([len(store.ivf.rows(p, len(store))) for p in probes])
+                latencies, found = [], []
+                for query in queries:
+                    started = time.perf_counter()
+                    rows, _ = store.search_vectors(query, args.k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found.append(rows[0])
+                print(
+                    f"{nprobe:>7} {scanned / len(store):>8.2%} "
+                    f"{recall(np.array(found), expected):>9.3f} "
+                    f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f}"
+                )
+
+        sweep("with 10% of rows in the tail")
+        store.compact_ivf()
+        sweep("after compaction")
+
+        ivf, store.ivf = store.ivf, None
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            store.search_vectors(query, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        store.ivf = ivf
+        print(
+            f"brute force: p50 {np.percentile(latencies, 50):.2f} ms, "
+            f"p99 {np.percentile(latencies, 99):.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Login throughput, and latency of other routes while logins are running.
+
+Runs N concurrent password checks on one event loop, the way /api/auth/login
+does, while a probe coroutine stands in for a cheap route and records how
+late each of its 5 ms ticks fires. "inline" calls bcrypt inside the
+coroutine (the old login); "pool" goes through the bounded PasswordHasher.
+No database is needed.
+
+Run from backend/:  python -m benchmarks.bench_login
+"""
+
+import time
+import asyncio
+import argparse
+
+import numpy as np
+from passlib.context import CryptContext
+
+from utils.passwords import PasswordHasher
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append((time.perf_counter() - started - 0.005) * 1000)
+
+
+async def run(mode: str, context: CryptContext, hashed: str, logins: int, workers: int):
+    hasher = PasswordHasher(workers, max_queue=logins, context=context)
+
+    async def login():
+        if mode == "inline":
+            return context.verify("password", hashed)
+        valid, _ = await hasher.verify("password", hashed)
+        return valid
+
+    stop, lags = asyncio.Event(), []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    assert all(results)
+    return logins / elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    context = CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds
+    )
+    hashed = context.hash("password")
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}")
+    print(f"{'mode':>10} {'logins/s':>9} {'probe p50 ms':>13} {'probe max ms':>13}")
+    modes = [("inline", 1)] + [("pool", w) for w in args.workers]
+    for mode, workers in modes:
+        throughput, lags = asyncio.run(run(mode, context, hashed, args.logins, workers))
+        label = mode if mode == "inline" else f"pool x{workers}"
+        print(
+            f"{label:>10} {throughput:>9.1f} {np.percentile(lags, 50):>13.1f} "
+            f"{np.max(lags):>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""SMTP delivery throughput: one session per email vs the pooled sender.
+
+Starts an in-process aiosmtpd sink on localhost whose EHLO answer is
+delayed by --handshake-ms, standing in for the extra round trips of
+STARTTLS and AUTH against a real provider. "per-email" opens,
+greets and quits a session for every message, as the old
+send_confirmation_email did; "pooled" sends through SMTPPool.
+
+With --outbox it also runs end to end against the configured Postgres:
+queues --emails rows in email_outbox (twice, to show the dedupe keys
+hold), drains them with OutboxSender and checks the sink received each
+exactly once. The rows are deleted afterwards.
+
+Needs the dev requirements:  pip install -r requirements-dev.txt
+Run from backend/:  python -m benchmarks.bench_mail_sender
+"""
+
+import time
+import uuid
+import socket
+import logging
+import asyncio
+import smtplib
+import argparse
+import threading
+from collections import Counter
+
+from config.settings import settings
+from utils.email import SMTPPool, build_message, send_message
+
+
+class Sink:
+    def __init__(self, handshake_ms: float):
+        self.handshake = handshake_ms / 1000.0
+        self.received = Counter()
+        self.lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            for recipient in envelope.rcpt_tos:
+                self.received[recipient] += 1
+        return "250 OK"
+
+
+def per_email(host: str, port: int, recipients):
+    for recipient in recipients:
+        with smtplib.SMTP(host, port) as server:
+            server.sendmail(
+                settings.EMAIL_SENDER,
+                recipient,
+                build_message(recipient, "Benchmark", "Hello"),
+            )
+
+
+def pooled(pool: SMTPPool, recipients, threads: int):
+    def worker(share):
+        with pool.connection() as connection:
+            for recipient in share:
+                send_message(connection, recipient, "Benchmark", "Hello")
+
+    shares = [recipients[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(share,)) for share in shares]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def run_outbox(pool: SMTPPool, sink: Sink, emails: int):
+    from utils.db import get_db_connection
+    from utils.email import enqueue_emails
+    from utils.mail_sender import OutboxSender
+
+    run = uuid.uuid4().hex[:8]
+    batch = [
+        {
+            "kind": "bench",
+            "recipient": f"outbox-{run}-{i}@example.com",
+            "subject": "Benchmark",
+            "body": "Hello",
+            "dedupe_key": f"bench:{run}:{i}",
+        }
+        for i in range(emails)
+    ]
+    conn = get_db_connection()
+    c = conn.cursor()
+    queued = enqueue_emails(c, batch)
+    requeued = enqueue_emails(c, batch)
+    conn.commit()
+    print(f"queued {queued} outbox rows, {requeued} on re-run")
+
+    sender = OutboxSender(pool, batch_size=50, retry_base_seconds=1)
+    started = time.perf_counter()
+    while sender.run_once():
+        pass
+    elapsed = time.perf_counter() - started
+    delivered = [sink.received[email["recipient"]] for email in batch]
+    print(
+        f"outbox: {emails} emails in {elapsed:.2f}s ({emails / elapsed:.0f}/s), "
+        f"{sum(1 for n in delivered if n == 1)} delivered exactly once"
+    )
+    c.execute("DELETE FROM email_outbox WHERE dedupe_key LIKE %s", (f"bench:{run}:%",))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=50)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--outbox", action="store_true")
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    logging.getLogger("mail.log").setLevel(logging.WARNING)
+    settings.EMAIL_SENDER = settings.EMAIL_SENDER or "noreply@example.com"
+    sink = Sink(args.handshake_ms)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    host = "127.0.0.1"
+    controller = Controller(sink, hostname=host, port=port)
+    controller.start()
+    pool = SMTPPool(host, port, starttls=False, login=False, size=args.pool_size)
+    try:
+        recipients = [f"user{i}@example.com" for i in range(args.emails)]
+        print(f"{args.emails} emails, {args.handshake_ms:.0f} ms handshake")
+        for label, send in (
+            ("per-email", lambda: per_email(host, port, recipients)),
+            (
+                f"pooled x{args.pool_size}",
+                lambda: pooled(pool, recipients, args.pool_size),
+            ),
+        ):
+            started = time.perf_counter()
+            send()
+            elapsed = time.perf_counter() - started
+            print(f"{label:>10}: {args.emails / elapsed:>7.0f} emails/s")
+        if args.outbox:
+            run_outbox(pool, sink, args.emails)
+    finally:
+        pool.close()
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Recall and latency of the local vector index against exact cosine search.
+
+Builds float32, float16, int8 and PQ LocalVectorStore indexes over clustered
+synthetic 768-dim vectors (or opens an existing index with --index) and
+measures, for single queries, recall@k against exact float64 cosine top-k,
+which is what a Pinecone cosine index returns for the same vectors, plus
+p50/p99 latency, batched query throughput and scanned bytes per vector.
+
+With --min-recall it doubles as a recall regression check: it exits
+non-zero if any variant falls below the threshold.
+
+Run from backend/:  python -m benchmarks.bench_vector_index
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from utils.local_vector_store import LocalVectorStore, normalize, top_k
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Gaussian clusters; closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=n)
+    return (centers[labels] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    matrix = normalize(vectors).astype(np.float64)
+    rows, _ = top_k(normalize(queries).astype(np.float64) @ matrix.T, k)
+    return rows
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found.tolist(), expected.tolist()))
+    return hits / expected.size
+
+
+def measure(store: LocalVectorStore, queries: np.ndarray, expected: np.ndarray, k: int):
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        rows, _ = store.search_vectors(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append(rows[0])
+    started = time.perf_counter()
+    store.search_vectors(queries, k)
+    batch_qps = len(queries) / (time.perf_counter() - started)
+    return (
+        recall(np.array(found), expected),
+        np.percentile(latencies, 50),
+        np.percentile(latencies, 99),
+        batch_qps,
+    )
+
+
+def scanned_bytes(store: LocalVectorStore) -> int:
+    """Bytes per vector read by the candidate scan."""
+    if store.quantizer is None:
+        return store.vectors.dtype.itemsize * store.dim
+    if store.quantizer.kind == "int8":
+        return store.dim + 4
+    return store.quantizer.m
+
+
+def report(name: str, store: LocalVectorStore, queries, expected, k: int) -> float:
+    result = measure(store, queries, expected, k)
+    print(
+        f"{name:>10} {len(store):>9} {scanned_bytes(store):>7} {result[0]:>9.3f} "
+        f"{result[1]:>8.2f} {result[2]:>8.2f} {result[3]:>10.0f}"
+    )
+    return result[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", help="Existing local index directory to benchmark")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--rescore", type=int, help="Default: per quantizer")
+    parser.add_argument("--pq-m", type=int, default=192)
+    parser.add_argument("--min-recall", type=float, default=0.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(
+        f"{'index':>10} {'vectors':>9} {'B/vec':>7} {f'recall@{args.k}':>9} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'batch qps':>10}"
+    )
+
+    recalls = {}
+    if args.index:
+        store = LocalVectorStore(args.index, None, rescore=args.rescore)
+        vectors = np.asarray(store.vectors, dtype=np.float32)
+        # Perturbed stored vectors stand in for real queries.
+        sample = rng.choice(len(vectors), size=args.queries, replace=False)
+        queries = vectors[sample] + 0.1 * rng.normal(size=(args.queries, store.dim))
+        expected = exact_top_k(vectors, queries, args.k)
+        name = store.quantizer.kind if store.quantizer else store.dtype
+        recalls[name] = report(name, store, queries, expected, args.k)
+    else:
+        vectors = synthetic_vectors(args.size + args.queries, args.dim, args.clusters)
+        vectors, queries = vectors[: args.size], vectors[args.size :]
+        expected = exact_top_k(vectors, queries, args.k)
+        texts = [str(i) for i in range(args.size)]
+        for name, dtype, kind in (
+            ("float32", "float32", None),
+            ("float16", "float16", None),
+            ("int8", "float32", "int8"),
+            ("pq", "float32", "pq"),
+        ):
+            with tempfile.TemporaryDirectory() as path:
+                store = LocalVectorStore(
+                    path, None, dim=args.dim, dtype=dtype, rescore=args.rescore
+                )
+                store.add_embeddings(texts, vectors)
+                if kind:
+                    store.quantize(kind, m=args.pq_m)
+                recalls[name] = report(name, store, queries, expected, args.k)
+
+    failed = [name for name, value in recalls.items() if value < args.min_recall]
+    if failed:
+        print(f"Recall below {args.min_recall}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Local stand-ins for the backend's external services, for load tests.
+
+One HTTP server answers, each after a configurable delay:
+
+    Groq        POST /openai/v1/chat/completions   (OpenAI-compatible, with usage)
+    Gemini      POST /v1beta/models/{model}:generateContent, :embedContent,
+                :batchEmbedContents                (REST, as with transport="rest")
+    LlamaParse  POST /api/parsing/upload, GET /api/parsing/job/{id}[/result/...]
+    Overpass    POST /api/interpreter
+
+Replies are canned but shaped like the real ones: agent prompts get the
+JSON the agents parse, report structuring gets a fenced JSON report, and
+embeddings are deterministic unit vectors derived from the text, so equal
+texts embed equally. The SMTP sink is the aiosmtpd one from
+bench_mail_sender. Point the app at them with the environment returned by
+app_environment().
+
+Run on its own from backend/:  python -m benchmarks.fakes --port 8900
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import hashlib
+import argparse
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_mail_sender import Sink
+
+EMBEDDING_DIMENSION = 768
+
+REPORT_TEXT = """# Complete Blood Count
+Age: 34 Y 0 M 0 D
+Gender: Female
+
+## HAEMATOLOGY
+| Test | Result | Unit | Reference |
+| Haemoglobin | 11.2 | g/dL | 12.0-15.5 |
+| WBC Count | 7800 | /uL | 4,000-11,000 |
+| Platelet Count | 260000 | /uL | 150,000-450,000 |
+"""
+
+STRUCTURED_REPORT = {
+    "patient_info": {"age": "34 Y 0 M 0 D", "gender": "Female"},
+    "haematology_results": [
+        {
+            "test": "Haemoglobin",
+            "patient_value": "11.2",
+            "unit": "g/dL",
+            "reference_value": "12.0-15.5",
+            "remark": "Low",
+        },
+        {
+            "test": "WBC Count",
+            "patient_value": "7800",
+            "unit": "/uL",
+            "reference_value": "4,000-11,000",
+            "remark": "Normal",
+        },
+    ],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def fake_embedding(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSION)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _field(prompt: str, name: str) -> str:
+    match = re.search(rf"\*\*{name}:\*\*\s*(.+)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def gemini_reply(prompt: str) -> str:
+    """What the agents expect back from their Gemini prompts."""
+    departments = [
+        d.strip()
+        for d in _field(prompt, "Available Departments").split(",")
+        if d.strip()
+    ]
+    query = _field(prompt, "Query").lower()
+    if "planner agent" in prompt or "router agent" in prompt:
+        if "doctor" in query:
+            plan = {
+                "action": "db_query",
+                "tool": "get_doctors",
+                "parameters": {"condition": "acne"},
+                "department_name": departments[0] if departments else None,
+            }
+        elif "hospital" in query:
+            plan = {
+                "action": "db_query",
+                "tool": "get_hospitals",
+                "parameters": {},
+                "department_name": None,
+            }
+        else:
+            plan = {
+                "action": "rag_query",
+                "tool": None,
+                "parameters": {"query": query},
+                "department_name": None,
+            }
+        if "router agent" in prompt:
+            plan.pop("department_name")
+            plan["parameters"]["tool"] = plan.pop("tool")
+            if plan["action"] == "rag_query":
+                plan["parameters"].pop("tool")
+        return json.dumps(plan)
+    if "database knowledge agent" in prompt:
+        return json.dumps({"department_name": departments[0] if departments else None})
+    return (
+        "Based on the conversations provided, this is usually managed with rest, "
+        "fluids and follow-up with a doctor if symptoms persist."
+    )
+
+
+def groq_reply(messages) -> str:
+    text = " ".join(
+        m["content"] if isinstance(m["content"], str) else json.dumps(m["content"])
+        for m in messages
+    )
+    if "```json" in text:
+        return "```json\n" + json.dumps(STRUCTURED_REPORT) + "\n```"
+    return (
+        "Your haemoglobin is slightly below the reference range, which can point "
+        "to mild anaemia. The other values are within normal limits."
+    )
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(latency: Dict[str, float], jitter: float = 0.2) -> FastAPI:
+    """Fake upstream app; latency maps "groq", "gemini", "embedding",
+    "llamaparse" and "overpass" to seconds per call."""
+    app = FastAPI()
+    jobs: Dict[str, float] = {}
+
+    async def delay(service: str):
+        base = latency.get(service, 0.0)
+        if base:
+            await asyncio.sleep(base * random.uniform(1 - jitter, 1 + jitter))
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await delay("groq")
+        content = groq_reply(body["messages"])
+        prompt_tokens = _tokens(json.dumps(body["messages"]))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _tokens(content),
+                "total_tokens": prompt_tokens + _tokens(content),
+            },
+        }
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str, request: Request):
+        body = await request.json()
+        _, action = model_action.split(":", 1)
+        if action == "embedContent":
+            await delay("embedding")
+            text = " ".join(p.get("text", "") for p in body["content"]["parts"])
+            return {"embedding": {"values": fake_embedding(text)}}
+        if action == "batchEmbedContents":
+            await delay("embedding")
+            return {
+                "embeddings": [
+                    {
+                        "values": fake_embedding(
+                            " ".join(p.get("text", "") for p in r["content"]["parts"])
+                        )
+                    }
+                    for r in body["requests"]
+                ]
+            }
+        if action == "generateContent":
+            await delay("gemini")
+            prompt = " ".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            reply = gemini_reply(prompt)
+            return {
+                "candidates": [
+                    {
+                        "content": {"parts": [{"text": reply}], "role": "model"},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": _tokens(prompt),
+                    "candidatesTokenCount": _tokens(reply),
+                    "totalTokenCount": _tokens(prompt) + _tokens(reply),
+                },
+            }
+        return JSONResponse({"error": {"message": f"Unknown {action}"}}, 404)
+
+    @app.post("/api/parsing/upload")
+    async def llamaparse_upload(request: Request):
+        await request.body()
+        job_id = str(uuid.uuid4())
+        # The job finishes after the configured parse time.
+        jobs[job_id] = time.monotonic() + latency.get("llamaparse", 0.0)
+        return {"id": job_id, "status": "PENDING"}
+
+    @app.get("/api/parsing/job/{job_id}")
+    async def llamaparse_status(job_id: str):
+        if job_id not in jobs:
+            return JSONResponse({"detail": "Job not found"}, 404)
+        done = time.monotonic() >= jobs[job_id]
+        return {"id": job_id, "status": "SUCCESS" if done else "PENDING"}
+
+    @app.get("/api/parsing/job/{job_id}/result/{result_type}")
+    async def llamaparse_result(job_id: str, result_type: str):
+        jobs.pop(job_id, None)
+        return {result_type: REPORT_TEXT, "job_metadata": {"job_pages": 1}}
+
+    @app.post("/api/interpreter")
+    async def overpass(request: Request):
+        query = (await request.body()).decode()
+        await delay("overpass")
+        center = re.search(r"around:\d+,(-?[\d.]+),(-?[\d.]+)", query)
+        lat, lng = (float(g) for g in center.groups()) if center else (0.0, 0.0)
+        return {
+            "elements": [
+                {
+                    "type": "node",
+                    "id": i,
+                    "lat": lat + 0.01 * i,
+                    "lon": lng + 0.01 * i,
+                    "tags": {"amenity": "hospital", "name": f"Hospital {i}"},
+                }
+                for i in range(1, 6)
+            ]
+        }
+
+    return app
+
+
+class FakeServices:
+    """Starts the fake HTTP services and an SMTP sink on free local ports."""
+
+    def __init__(
+        self,
+        latency: Optional[Dict[str, float]] = None,
+        smtp_handshake_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        http_port: Optional[int] = None,
+    ):
+        self.host = host
+        self.http_port = http_port or free_port()
+        self.smtp_port = free_port()
+        self.sink = Sink(smtp_handshake_ms)
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                create_app(latency or {}),
+                host=host,
+                port=self.http_port,
+                log_level="warning",
+            )
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._smtp = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.http_port}"
+
+    def start(self):
+        from aiosmtpd.controller import Controller
+
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        self._smtp = Controller(self.sink, hostname=self.host, port=self.smtp_port)
+        self._smtp.start()
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._smtp is not None:
+            self._smtp.stop()
+
+    def app_environment(self) -> Dict[str, str]:
+        """Settings that point the backend at these services."""
+        return {
+            "GROQ_API_KEY": "fake",
+            "GROQ_BASE_URL": self.url,
+            "GOOGLE_API_KEY": "fake",
+            "GOOGLE_API_ENDPOINT": self.url,
+            "LLAMA_PARSER_API_KEY": "fake",
+            "LLAMA_PARSE_BASE_URL": self.url,
+            "OVERPASS_URL": f"{self.url}/api/interpreter",
+            "SMTP_SERVER": self.host,
+            "SMTP_PORT": str(self.smtp_port),
+            "SMTP_STARTTLS": "false",
+            "SMTP_LOGIN": "false",
+            "EMAIL_SENDER": "noreply@example.com",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake external services.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-ms", type=float, default=400)
+    parser.add_argument("--embedding-ms", type=float, default=40)
+    parser.add_argument("--parse-ms", type=float, default=1500)
+    parser.add_argument("--overpass-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    services = FakeServices(
+        {
+            "groq": args.llm_ms / 1000,
+            "gemini": args.llm_ms / 1000,
+            "embedding": args.embedding_ms / 1000,
+            "llamaparse": args.parse_ms / 1000,
+            "overpass": args.overpass_ms / 1000,
+        },
+        http_port=args.port,
+    ).start()
+    for key, value in services.app_environment().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
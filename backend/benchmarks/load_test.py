@@ -0,0 +1,501 @@
+"""Load test of the API against local fakes of its external services.
+
+Starts benchmarks.fakes (Groq, Gemini chat and embeddings, LlamaParse,
+Overpass, SMTP) with the given latencies, a small local vector index, and
+the app under uvicorn pointed at them. It then replays a weighted mix of
+user journeys from --concurrency virtual users for --duration seconds:
+
+    login       POST /api/auth/login
+    slots       GET /api/doctors, GET /api/doctor/{doctor_id}/slots
+    booking     slots, then POST /api/appointments for a free slot
+    chatbot     POST /chatbot (doctor, hospital and general questions)
+    general     POST /api/general-query
+    report      POST /api/medical-query (async job), poll the job
+    emergency   GET /api/emergency/hospitals
+
+Throughput, p50/p95/p99 latency, 4xx and errors are printed per endpoint
+(route template). 4xx are expected in small numbers, e.g. 400 for a slot
+booked by another user in the meantime. --json saves the results, and
+--baseline compares them with a saved run and exits 1 when p95 or
+throughput regress by more than --max-regression.
+
+The database is the only real dependency: the app uses the PostgreSQL from
+the DB_* settings, as it does in development, and creates test users there.
+Use --app-url to drive an app that is already running (start the fakes with
+python -m benchmarks.fakes and point the app at them).
+
+Run from backend/:
+    python -m benchmarks.load_test --concurrency 20 --duration 60 --json run.json
+    python -m benchmarks.load_test --baseline run.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fakes import (
+    EMBEDDING_DIMENSION,
+    REPORT_TEXT,
+    FakeServices,
+    fake_embedding,
+    free_port,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "load-test-password"
+
+DEFAULT_MIX = {
+    "login": 10,
+    "slots": 25,
+    "booking": 10,
+    "chatbot": 25,
+    "general": 10,
+    "report": 5,
+    "emergency": 15,
+}
+
+CHATBOT_QUERIES = [
+    "List doctors for acne",
+    "Which doctors can help with chest pain?",
+    "List hospitals",
+    "What is acne?",
+    "How is high blood pressure treated?",
+    "What are the symptoms of diabetes?",
+]
+
+CONVERSATIONS = [
+    "Patient: I have red spots on my face. Doctor: This looks like acne; "
+    "keep the skin clean and use a benzoyl peroxide wash.",
+    "Patient: My blood pressure is 150/95. Doctor: Reduce salt, exercise "
+    "and we will review the need for medication.",
+    "Patient: I am always thirsty and tired. Doctor: These can be signs of "
+    "diabetes; we should check your fasting glucose.",
+    "Patient: I have had a cough for two weeks. Doctor: Rest, fluids, and "
+    "come back if it gets worse or you develop a fever.",
+    "Patient: My knee hurts after running. Doctor: Ice it, rest for a week "
+    "and then return to running gradually.",
+]
+
+
+def build_local_index(path: str):
+    """A small local vector index, embedded the way the fake embeds queries."""
+    from utils.local_vector_store import LocalVectorStore
+
+    store = LocalVectorStore(path, None, dim=EMBEDDING_DIMENSION)
+    texts = [f"{text} ({i})" for i in range(40) for text in CONVERSATIONS]
+    store.add_embeddings(
+        texts,
+        [fake_embedding(text) for text in texts],
+        [{"source": "load_test"} for _ in texts],
+    )
+
+
+def start_app(env: Dict[str, str], port: int, workers: int, log_path: str):
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{url}/api/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"App did not start within 120s; see {log_path}")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.client_errors: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    def add(self, name: str, seconds: float, status: Optional[int]):
+        if not self.recording:
+            return
+        self.latencies[name].append(seconds)
+        if status is None or status >= 500:
+            self.errors[name] += 1
+        elif status >= 400:
+            self.client_errors[name] += 1
+
+    async def request(
+        self, client: httpx.AsyncClient, method: str, url: str, name: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.add(f"{method} {name}", time.perf_counter() - started, None)
+            return None
+        self.add(
+            f"{method} {name}", time.perf_counter() - started, response.status_code
+        )
+        return response
+
+    def results(self, seconds: float) -> Dict[str, dict]:
+        results = {}
+        for name, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+            results[name] = {
+                "count": len(latencies),
+                "rps": len(latencies) / seconds,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "4xx": self.client_errors[name],
+                "errors": self.errors[name],
+            }
+        return results
+
+
+class LoadTest:
+    def __init__(self, url: str, recorder: Recorder, mix: Dict[str, int]):
+        self.url = url
+        self.recorder = recorder
+        self.mix = mix
+        self.doctors: List[dict] = []
+        self.hospital_of_department: Dict[str, str] = {}
+
+    def _headers(self, user: dict) -> dict:
+        return {"Authorization": f"Bearer {user['token']}"}
+
+    async def signup(self, client: httpx.AsyncClient, run_id: str, i: int) -> dict:
+        user = {
+            "username": f"load_{run_id}_{i}",
+            "email": f"load_{run_id}_{i}@example.com",
+            "password": PASSWORD,
+        }
+        response = await client.post("/api/auth/signup", json=user)
+        response.raise_for_status()
+        user["token"] = response.json()["token"]
+        return user
+
+    async def discover(self, client: httpx.AsyncClient, user: dict):
+        headers = self._headers(user)
+        doctors = await client.get("/api/doctors", headers=headers)
+        departments = await client.get("/api/departments", headers=headers)
+        doctors.raise_for_status()
+        departments.raise_for_status()
+        self.doctors = doctors.json()
+        self.hospital_of_department = {
+            d["id"]: d["hospital_id"] for d in departments.json()
+        }
+        if not self.doctors:
+            raise RuntimeError("No doctors in the database to book with")
+
+    # --- Journeys ---
+    async def login(self, client, user):
+        response = await self.recorder.request(
+            client,
+            "POST",
+            "/api/auth/login",
+            "/api/auth/login",
+            json={"username": user["username"], "password": PASSWORD},
+        )
+        if response is not None and response.status_code == 200:
+            user["token"] = response.json()["token"]
+
+    async def slots(self, client, user):
+        await self.recorder.request(
+            client, "GET", "/api/doctors", "/api/doctors", headers=self._headers(user)
+        )
+        doctor = random.choice(self.doctors)
+        # Spread over a year so concurrent bookings rarely collide.
+        day = date.today() + timedelta(days=random.randint(1, 365))
+        response = await self.recorder.request(
+            client,
+            "GET",
+            f"/api/doctor/{doctor['user_id']}/slots",
+            "/api/doctor/{doctor_id}/slots",
+            params={"date": day.isoformat()},
+            headers=self._headers(user),
+        )
+        if response is None or response.status_code != 200:
+            return doctor, day, []
+        return doctor, day, response.json()
+
+    async def booking(self, client, user):
+        doctor, day, free_slots = await self.slots(client, user)
+        if not free_slots:
+            return
+        slot = random.choice(free_slots)
+        await self.recorder.request(
+            client,
+            "POST",
+            "/api/appointments",
+            "/api/appointments",
+            json={
+                "doctor_id": doctor["user_id"],
+                "department_id": doctor["department_id"],
+                "hospital_id": self.hospital_of_department.get(
+                    doctor["department_id"], ""
+                ),
+                "appointment_date": day.isoformat(),
+                "start_time": slot["start_time"],
+                "end_time": slot["end_time"],
+            },
+            headers=self._headers(user),
+        )
+
+    async def chatbot(self, client, user):
+        await self.recorder.request(
+            client,
+            "POST",
+            "/chatbot",
+            "/chatbot",
+            json={"query": random.choice(CHATBOT_QUERIES)},
+            headers=self._headers(user),
+        )
+
+    async def general(self, client, user):
+        await self.recorder.request(
+            client,
+            "POST",
+            "/api/general-query",
+            "/api/general-query",
+            json={"query": random.choice(CHATBOT_QUERIES)},
+            headers=self._headers(user),
+        )
+
+    async def report(self, client, user):
+        started = time.perf_counter()
+        response = await self.recorder.request(
+            client,
+            "POST",
+            "/api/medical-query",
+            "/api/medical-query",
+            data={"query": "Explain my blood test results", "async_job": "true"},
+            files={"file": ("report.pdf", REPORT_TEXT.encode(), "application/pdf")},
+            headers=self._headers(user),
+        )
+        if response is None or response.status_code != 202:
+            return
+        job_id = response.json()["job_id"]
+        status = None
+        while status not in ("succeeded", "failed"):
+            response = await self.recorder.request(
+                client,
+                "GET",
+                f"/api/medical-query/jobs/{job_id}",
+                "/api/medical-query/jobs/{job_id}",
+                params={"wait": 10},
+                headers=self._headers(user),
+            )
+            if response is None or response.status_code != 200:
+                return
+            status = response.json()["status"]
+        # Upload to answer, as the user waits for it.
+        self.recorder.add(
+            "report job (end to end)",
+            time.perf_counter() - started,
+            200 if status == "succeeded" else 500,
+        )
+
+    async def emergency(self, client, user):
+        await self.recorder.request(
+            client,
+            "GET",
+            "/api/emergency/hospitals",
+            "/api/emergency/hospitals",
+            params={
+                "lat": 24.86 + random.uniform(-0.1, 0.1),
+                "lng": 67.0 + random.uniform(-0.1, 0.1),
+            },
+            headers=self._headers(user),
+        )
+
+    async def virtual_user(self, client, user, deadline: float):
+        journeys = list(self.mix)
+        weights = [self.mix[j] for j in journeys]
+        while time.monotonic() < deadline:
+            journey = random.choices(journeys, weights)[0]
+            await getattr(self, journey)(client, user)
+
+    async def run(self, concurrency: int, duration: float, warmup: float) -> float:
+        limits = httpx.Limits(max_connections=concurrency * 2)
+        async with httpx.AsyncClient(
+            base_url=self.url, timeout=120, limits=limits
+        ) as client:
+            run_id = uuid.uuid4().hex[:8]
+            users = await asyncio.gather(
+                *(self.signup(client, run_id, i) for i in range(concurrency))
+            )
+            await self.discover(client, users[0])
+
+            deadline = time.monotonic() + warmup + duration
+            tasks = [
+                asyncio.create_task(self.virtual_user(client, user, deadline))
+                for user in users
+            ]
+            await asyncio.sleep(warmup)
+            self.recorder.recording = True
+            started = time.monotonic()
+            await asyncio.gather(*tasks)
+            return time.monotonic() - started
+
+
+def print_results(results: Dict[str, dict], seconds: float):
+    print(
+        f"{'endpoint':<42} {'count':>6} {'req/s':>7} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'4xx':>5} {'errors':>6}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<42} {r['count']:>6} {r['rps']:>7.1f} {r['p50_ms']:>8.1f} "
+            f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['4xx']:>5} {r['errors']:>6}"
+        )
+    total = sum(r["count"] for r in results.values())
+    print(f"\n{total} requests in {seconds:.1f}s, {total / seconds:.1f} req/s")
+
+
+def regressions(
+    results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float
+) -> List[str]:
+    found = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            found.append(f"{name}: no requests in this run")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            found.append(
+                f"{name}: p95 {current['p95_ms']:.1f} ms vs {base['p95_ms']:.1f} ms"
+            )
+        if current["rps"] < base["rps"] * (1 - max_regression):
+            found.append(f"{name}: {current['rps']:.1f} req/s vs {base['rps']:.1f}")
+        if current["errors"] > base["errors"]:
+            found.append(f"{name}: {current['errors']} errors vs {base['errors']}")
+    return found
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        journey, weight = part.split("=")
+        if journey not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown journey: {journey}")
+        mix[journey] = int(weight)
+    return {journey: weight for journey, weight in mix.items() if weight > 0}
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. chatbot=50,report=0"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--app-url", help="drive an already running app instead")
+    parser.add_argument("--llm-ms", type=float, default=400)
+    parser.add_argument("--embedding-ms", type=float, default=40)
+    parser.add_argument("--parse-ms", type=float, default=1500)
+    parser.add_argument("--overpass-ms", type=float, default=200)
+    parser.add_argument("--smtp-ms", type=float, default=50)
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    services = app = None
+    recorder = Recorder()
+    try:
+        if args.app_url:
+            url = args.app_url
+        else:
+            services = FakeServices(
+                {
+                    "groq": args.llm_ms / 1000,
+                    "gemini": args.llm_ms / 1000,
+                    "embedding": args.embedding_ms / 1000,
+                    "llamaparse": args.parse_ms / 1000,
+                    "overpass": args.overpass_ms / 1000,
+                },
+                smtp_handshake_ms=args.smtp_ms,
+            ).start()
+            workdir = tempfile.mkdtemp(prefix="load_test_")
+            index_path = os.path.join(workdir, "vector_index")
+            build_local_index(index_path)
+            env = {
+                **services.app_environment(),
+                "VECTOR_STORE_BACKEND": "local",
+                "LOCAL_INDEX_PATH": index_path,
+                "RAG_RETRIEVAL_MODE": "vector",
+                "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+                "ROUTER_DECISION_LOG": os.path.join(workdir, "router.jsonl"),
+                "SLOW_QUERY_SINK": "file",
+                "SLOW_QUERY_LOG_PATH": os.path.join(workdir, "slow_queries.jsonl"),
+                "TRACING_EXPORTER": "",
+            }
+            log_path = os.path.join(workdir, "app.log")
+            app, url = start_app(env, free_port(), args.workers, log_path)
+            print(f"App at {url} against fakes at {services.url}; log {log_path}")
+
+        load_test = LoadTest(url, recorder, args.mix)
+        seconds = asyncio.run(
+            load_test.run(args.concurrency, args.duration, args.warmup)
+        )
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(timeout=30)
+        if services is not None:
+            services.stop()
+
+    results = recorder.results(seconds)
+    print_results(results, seconds)
+    if services is not None:
+        print(
+            f"Emails delivered to the SMTP sink: {sum(services.sink.received.values())}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
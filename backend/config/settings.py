@@ -12,6 +12,15 @@ class Settings:
     JWT_SECRET = os.getenv("JWT_SECRET")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+    # bcrypt cost; stored hashes with another cost are re-hashed at login
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    # Threads running bcrypt, and calls allowed to wait for one before 503
+    PASSWORD_HASH_WORKERS = int(
+        os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+    )
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+    # Verified tokens cached per process until they expire (0 disables)
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
     ALLOWED_ORIGINS = ["http://localhost:3000"]
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -21,8 +30,125 @@ class Settings:
     EMAIL_PASSWORD: str = os.getenv("EMAIL_PASSWORD")
     SMTP_SERVER: str = os.getenv("SMTP_SERVER")
     SMTP_PORT: int = os.getenv("SMTP_PORT")
+    # Set both to false to deliver to a plain local SMTP sink in development
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_LOGIN = os.getenv("SMTP_LOGIN", "true").lower() == "true"
+    SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))
+    # Email outbox sender: batch size, idle poll interval, retries with
+    # exponential backoff from EMAIL_RETRY_BASE_SECONDS
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+    EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", 1))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    # Run the sender inside the API process (false: run python -m utils.mail_sender)
+    EMAIL_SENDER_IN_PROCESS = (
+        os.getenv("EMAIL_SENDER_IN_PROCESS", "true").lower() == "true"
+    )
+    # Appointment reminders: daily UTC run times for the next day's
+    # appointments, and this process's shard of the hospitals
+    REMINDER_SCHEDULER_ENABLED = (
+        os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true"
+    )
+    REMINDER_TIMES = os.getenv("REMINDER_TIMES", "09:00")
+    REMINDER_SHARD_INDEX = int(os.getenv("REMINDER_SHARD_INDEX", 0))
+    REMINDER_SHARD_COUNT = int(os.getenv("REMINDER_SHARD_COUNT", 1))
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
+    # Upstream service URLs, overridden to run against local fakes
+    # (benchmarks/fakes.py); empty means each client's default
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "")
+    GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT", "")
+    LLAMA_PARSE_BASE_URL = os.getenv("LLAMA_PARSE_BASE_URL", "")
+    OVERPASS_URL = os.getenv("OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+
+    # Router intent classifier
+    INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "data/intent_classifier.npz")
+    INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.9))
+    ROUTER_DECISION_LOG = os.getenv("ROUTER_DECISION_LOG", "data/router_decisions.jsonl")
+    # Single-call planner (routing + department inference); falls back to two-step routing
+    AGENT_PLANNER_MODE = os.getenv("AGENT_PLANNER_MODE", "true").lower() == "true"
+
+    # Condition -> department mapping cache
+    CONDITION_MAP_CACHE_SIZE = int(os.getenv("CONDITION_MAP_CACHE_SIZE", 1024))
+
+    # Cross-worker department catalog invalidation via Postgres LISTEN/NOTIFY
+    DEPARTMENT_CATALOG_LISTEN = (
+        os.getenv("DEPARTMENT_CATALOG_LISTEN", "false").lower() == "true"
+    )
+    # Without the listener, a lookup miss reloads the catalog at most this often
+    DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS = float(
+        os.getenv("DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS", 5)
+    )
+
+    # Agent tool execution: per-call timeout (seconds) and concurrent calls per tool
+    TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", 10))
+    RAG_TOOL_TIMEOUT_SECONDS = float(os.getenv("RAG_TOOL_TIMEOUT_SECONDS", 60))
+    TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", 8))
+
+    # RAG vector store: "pinecone" or "local" (memory-mapped NumPy index)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+    LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "data/vector_index")
+    LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+    # Candidates per result re-scored at full precision by quantized indexes
+    # (unset: 10 for int8, 50 for PQ)
+    LOCAL_INDEX_RESCORE = int(os.getenv("LOCAL_INDEX_RESCORE", 0)) or None
+    # Inverted lists scanned per query when the local index has an IVF index
+    LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", 8))
+
+    # Embedding cache: in-memory LRU plus SQLite file ("" disables the disk tier)
+    EMBEDDING_CACHE_PATH = os.getenv(
+        "EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite"
+    )
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+    # Query embedding micro-batching: collection window (0 disables) and
+    # maximum texts per upstream call
+    EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+
+    # RAG retrieval: "vector" or "hybrid" (BM25 + vector with rank fusion)
+    RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "vector").lower()
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25_index")
+    RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", 20))
+    RAG_TOP_K = int(os.getenv("RAG_TOP_K", 3))
+    # Optional CPU cross-encoder, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+    RAG_RERANKER_MODEL = os.getenv("RAG_RERANKER_MODEL", "")
+
+    # RAG initialization: start in the background at startup, or on first use
+    RAG_INIT_ON_STARTUP = os.getenv("RAG_INIT_ON_STARTUP", "true").lower() == "true"
+    RAG_INIT_WAIT_SECONDS = float(os.getenv("RAG_INIT_WAIT_SECONDS", 30))
+
+    # General chat history write-behind: flush after this many rows or seconds
+    CHAT_HISTORY_FLUSH_ROWS = int(os.getenv("CHAT_HISTORY_FLUSH_ROWS", 100))
+    CHAT_HISTORY_FLUSH_SECONDS = float(os.getenv("CHAT_HISTORY_FLUSH_SECONDS", 1))
+    # Recent turns kept in memory per user
+    CHAT_HISTORY_RING_SIZE = int(os.getenv("CHAT_HISTORY_RING_SIZE", 10))
+
+    # Asynchronous report analysis jobs: workers inside each API process
+    # (0: run python -m utils.report_jobs separately), in-place retries per
+    # stage, attempts per job, and the long-poll check interval
+    REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))
+    REPORT_JOB_STAGE_RETRIES = int(os.getenv("REPORT_JOB_STAGE_RETRIES", 3))
+    REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", 3))
+    REPORT_JOB_POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", 0.5))
+
+    # Span tracing: exporter ("" disables, "json" or "otlp"), the JSON lines
+    # file, the OTLP/HTTP collector and the fraction of requests traced
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()
+    TRACING_FILE = os.getenv("TRACING_FILE", "data/traces.jsonl")
+    TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318")
+    TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", 1.0))
+
+    # Slow-query log: threshold (0 disables), share of slow SELECTs explained
+    # with EXPLAIN (ANALYZE, BUFFERS) and minimum seconds between plans of
+    # one statement, and where entries go ("table" or "file")
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+    SLOW_QUERY_EXPLAIN_RATIO = float(os.getenv("SLOW_QUERY_EXPLAIN_RATIO", 0.1))
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(
+        os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300)
+    )
+    SLOW_QUERY_SINK = os.getenv("SLOW_QUERY_SINK", "table").lower()
+    SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH", "data/slow_queries.jsonl")
+
     # PostgreSQL database connection settings
     DB_NAME = os.getenv("DB_NAME")
     DB_USER = os.getenv("DB_USER")
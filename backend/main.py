@@ -11,10 +11,10 @@ from fastapi import (
     File,
     Form,
     Request,
-    BackgroundTasks,
 )
 import asyncio
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
 import psycopg2
 from models.schemas import *
@@ -23,7 +23,7 @@ from datetime import datetime, timedelta, date
 from typing import Optional, List
 import requests
 from config.settings import settings
-from utils.db import init_db
+from utils.db import get_db_connection, init_db
 from utils.parser import *
 from routes.auth import *
 from routes import auth
@@ -31,6 +31,24 @@ from utils.pineconeutils import *
 from utils.email import *
 from utils.agents import *
 from utils.populate_dummy_data import populate_dummy_data
+from utils.condition_map import invalidate_condition_map
+from utils.chat_history import chat_history
+from utils.mail_sender import create_outbox_sender
+from utils.reminders import create_reminder_scheduler
+from utils.report_jobs import (
+    create_job,
+    create_report_job_worker,
+    latest_report,
+    wait_for_job,
+)
+from utils.metrics import CONTENT_TYPE_LATEST, render_latest
+from utils.http_metrics import MetricsMiddleware
+from utils.tracing import TracingMiddleware, tracer
+from utils.department_catalog import (
+    department_catalog,
+    notify_department_change,
+    start_department_listener,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,20 +67,71 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.include_router(auth.router)
 
+# Email outbox sender and report job workers, when they run inside the API process
+mail_sender = None
+report_job_worker = None
+
+
+@app.on_event("startup")
+async def start_background_listeners():
+    start_department_listener()
+    if settings.RAG_INIT_ON_STARTUP:
+        start_rag_initialization()
+
+
+@app.on_event("shutdown")
+async def flush_chat_history():
+    await asyncio.to_thread(chat_history.close)
+
+
+@app.on_event("shutdown")
+async def flush_traces():
+    await asyncio.to_thread(tracer.flush)
+
+
+@app.on_event("startup")
+async def start_mail_sender():
+    global mail_sender
+    if settings.EMAIL_SENDER_IN_PROCESS:
+        mail_sender = create_outbox_sender()
+        mail_sender.start()
+
+
+@app.on_event("shutdown")
+async def stop_mail_sender():
+    if mail_sender is not None:
+        await asyncio.to_thread(mail_sender.stop)
+
+
+@app.on_event("startup")
+async def start_report_job_workers():
+    global report_job_worker
+    if settings.REPORT_JOB_WORKERS > 0:
+        report_job_worker = create_report_job_worker(settings.REPORT_JOB_WORKERS)
+        report_job_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_report_job_workers():
+    if report_job_worker is not None:
+        report_job_worker.stop()
+
+
+@app.on_event("startup")
+async def start_reminder_scheduler():
+    if settings.REMINDER_SCHEDULER_ENABLED:
+        create_reminder_scheduler().start()
+
 
 @app.on_event("startup")
 async def initialize_users():
     logger.info("Checking for default Super Admin and Admin users...")
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Super Admin
@@ -79,7 +148,7 @@ async def initialize_users():
     )
     if not c.fetchone():
         user_id = str(uuid.uuid4())
-        hashed_password = pwd_context.hash(super_admin_data["password"])
+        hashed_password = await password_hasher.hash(super_admin_data["password"])
         created_at = datetime.utcnow()
         try:
             c.execute(
@@ -116,7 +185,7 @@ async def initialize_users():
     c.execute("SELECT id FROM users WHERE username = %s", (admin_data["username"],))
     if not c.fetchone():
         user_id = str(uuid.uuid4())
-        hashed_password = pwd_context.hash(admin_data["password"])
+        hashed_password = await password_hasher.hash(admin_data["password"])
         created_at = datetime.utcnow()
         try:
             c.execute(
@@ -150,13 +219,7 @@ async def create_hospital(
 ):
     if current_user["role"] != "super_admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     hospital_id = str(uuid.uuid4())
     c.execute(
@@ -182,13 +245,7 @@ async def assign_hospital_admin(
     if current_user["role"] != "super_admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Check if any admins exist
@@ -239,13 +296,7 @@ async def get_admins(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "super_admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id, username, email, role FROM users WHERE role = 'admin'")
     admins = [
@@ -260,13 +311,7 @@ async def get_admins(current_user: dict = Depends(get_current_user)):
 
 @app.get("/api/hospitals", response_model=list[HospitalResponse])
 async def list_hospitals(current_user: dict = Depends(get_current_user)):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id, name, address, lat, lng FROM hospitals")
     hospitals = [
@@ -286,13 +331,7 @@ async def update_hospital(
     hospital: HospitalCreate,
     current_user: dict = Depends(require_role("super_admin")),
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id FROM hospitals WHERE id = %s", (hospital_id,))
     if not c.fetchone():
@@ -325,13 +364,7 @@ async def update_hospital(
 async def delete_hospital(
     hospital_id: str, current_user: dict = Depends(require_role("super_admin"))
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id FROM hospitals WHERE id = %s", (hospital_id,))
     if not c.fetchone():
@@ -340,6 +373,9 @@ async def delete_hospital(
     c.execute("DELETE FROM hospitals WHERE id = %s", (hospital_id,))
     conn.commit()
     conn.close()
+    department_catalog.remove_hospital(hospital_id)
+    invalidate_condition_map(persistent=False)
+    notify_department_change()
     logger.info(
         f"Hospital deleted: {hospital_id} by super_admin: {current_user['user_id']}"
     )
@@ -352,13 +388,7 @@ async def assign_hospital_admin(
     assignment: HospitalAdminAssign,
     current_user: dict = Depends(require_role("super_admin")),
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     # Verify hospital exists
     c.execute("SELECT id FROM hospitals WHERE id = %s", (hospital_id,))
@@ -419,13 +449,12 @@ async def get_nearby_hospitals(
         logger.info(
             f"Fetching hospitals for lat: {lat}, lng: {lng}, user: {current_user['user_id']}"
         )
-        overpass_url = "http://overpass-api.de/api/interpreter"
         query = f"""
         [out:json];
         node["amenity"="hospital"](around:10000,{lat},{lng});
         out body;
         """
-        response = requests.post(overpass_url, data=query)
+        response = requests.post(settings.OVERPASS_URL, data=query)
         response.raise_for_status()
         data = response.json()
         hospitals = []
@@ -457,14 +486,71 @@ async def debug_version(current_user: dict = Depends(get_current_user)):
     return {"version": "7a8c3e9d-2b1f-4e7c-9f2a-5c3d8e6f9012", "file": "main.py"}
 
 
+@app.get("/api/health")
+async def health():
+    """Liveness plus RAG readiness; non-RAG endpoints serve while RAG loads."""
+    return {"status": "ok", "rag": get_rag_status()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose process metrics in the Prometheus text format."""
+    return PlainTextResponse(render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def stored_report(user_id: str) -> Optional[dict]:
+    """The user's latest structured report: this worker's history, else the job table."""
+    history = get_chat_history(user_id)
+    if history and any(h["report_json"] for h in history):
+        logger.info(f"Retrieving stored report for user: {user_id}")
+        return json.loads(history[-1]["report_json"])
+    return latest_report(user_id)
+
+
+async def submit_medical_query_job(
+    query: Optional[str], file: Optional[UploadFile], user_id: str
+) -> JSONResponse:
+    if file:
+        document = await file.read()
+        effective_query = query.strip() if query else "Explain my blood test results"
+        job_id = await asyncio.to_thread(
+            create_job, user_id, effective_query, document, file.filename
+        )
+    else:
+        if query is None or query.strip() == "":
+            raise HTTPException(
+                status_code=400,
+                detail="A non-empty query is required when no file is uploaded.",
+            )
+        json_output = await asyncio.to_thread(stored_report, user_id)
+        job_id = await asyncio.to_thread(
+            create_job, user_id, query.strip(), structured_report=json_output
+        )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/medical-query/jobs/{job_id}",
+        },
+    )
+
+
 @app.post("/api/medical-query")
 async def medical_query(
     query: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
+    async_job: bool = Form(False),
     current_user: dict = Depends(get_current_user),
     request: Request = None,
 ):
-    """Process blood report and/or answer query using Groq API."""
+    """Process blood report and/or answer query using Groq API.
+
+    With async_job=true the work is queued and a job id is returned at once
+    (202); poll GET /api/medical-query/jobs/{job_id} for the result.
+    """
+    if async_job:
+        return await submit_medical_query_job(query, file, current_user["user_id"])
     try:
         form_data = await request.form()
         logger.info(
@@ -482,22 +568,7 @@ async def medical_query(
                 f.write(await file.read())
             report_text = await parse_blood_report(file_path)
 
-            # Enhanced JSON parsing with error handling
-            try:
-                json_output, raw_json = await structure_report(report_text)
-                logger.info(
-                    f"Raw JSON from structure_report: {raw_json[:200]}..."
-                )  # Log raw JSON for debugging
-                # Validate JSON structure
-                if not isinstance(json_output, dict):
-                    logger.error("structure_report returned invalid JSON structure")
-                    json_output = None  # Fallback to None if JSON is invalid
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON parsing error in structure_report: {str(json_err)}")
-                json_output = None  # Fallback to None if JSON parsing fails
-            except Exception as e:
-                logger.error(f"Error in structure_report: {str(e)}")
-                json_output = None  # Fallback to None for other errors
+            json_output = await structure_report_or_none(report_text)
 
             os.remove(file_path)
             logger.info(f"File processed and deleted: {file_path}")
@@ -514,93 +585,18 @@ async def medical_query(
                     detail="A non-empty query is required when no file is uploaded.",
                 )
 
-            history = get_chat_history(current_user["user_id"])
-            if history and any(h["report_json"] for h in history):
-                logger.info(
-                    f"Retrieving stored report for user: {current_user['user_id']}"
-                )
-                json_output = json.loads(history[-1]["report_json"])
-            else:
+            json_output = await asyncio.to_thread(
+                stored_report, current_user["user_id"]
+            )
+            if json_output is None:
                 logger.info("No stored report, proceeding with query only")
-                json_output = None
 
             effective_query = query.strip()
             logger.info(f"Effective query for follow-up: {effective_query}")
 
-        prompt = f"""
-            You are a friendly medical AI assistant who analyzes Complete Blood Count (CBC) results and answers medical questions in simple, kind words for non-experts. Follow these guidelines:
-            1. Keep answers 100-150 words, clear, and focused.
-            2. Use analogies (e.g., "Red blood cells are like delivery trucks carrying oxygen").
-            3. Avoid medical jargon; explain terms simply.
-            4. Suggest 1-2 next steps (e.g., "Discuss with your doctor about possible iron supplements").
-            5. Highlight urgency (e.g., "If you feel very weak or dizzy, see a doctor right away").
-            6. Emphasize this is not a diagnosis and recommend consulting a doctor.
-            7. Output only the answer text, without labels like "assistant:" or code blocks.
-
-            For CBC analysis, focus on:
-            - Red blood cell count (RBC), hemoglobin, hematocrit (normal ranges: males 4.5-6.1 million/mcL, 13-17 g/dL, 40-55%; females 4.0-5.4 million/mcL, 11.5-15.5 g/dL, 36-48%).
-            - White blood cell count (WBC, normal 4,000-10,000/mcL) and differential (e.g., neutrophils, lymphocytes).
-            - Platelet count (normal 150,000-400,000/mcL).
-            - If available, mean corpuscular volume (MCV, normal 80-100 fL), mean corpuscular hemoglobin (MCH, normal 27-31 pg), and red cell distribution width (RDW, normal 12-15%).
-            - Compare results to normal ranges, explain abnormalities, and suggest possible causes (e.g., anemia, infection).
-
-            Current Query: {effective_query}
-        """
-
-        if json_output:
-            patient_age = json_output.get("patient_info", {}).get("age", "Unknown")
-            patient_gender = json_output.get("patient_info", {}).get(
-                "gender", "Unknown"
-            )
-            prompt += f"""
-                Patient Age: {patient_age}
-                Patient Gender: {patient_gender}
-                Blood Test Results (JSON):
-                {json.dumps(json_output, indent=2)}
-            """
-        else:
-            prompt += "\nNo blood test results available."
-
-        logger.info(f"Sending prompt to Groq API: {prompt[:100]}...")
-        # Call Groq API
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
-        )
-
-        # Extract the response
-        raw_response = chat_completion.choices[0].message.content
-        if not raw_response:
-            logger.error("No content in Groq API response")
-            raise HTTPException(
-                status_code=500, detail="No content in Groq API response"
-            )
-
-        # Clean the response
-        cleaned_response = raw_response.strip()
-        cleaned_response = re.sub(
-            r"^(assistant:|[\[\{]?(ANSWER|RESPONSE)[\]\}]?:?\s*)",
-            "",
-            cleaned_response,
-            flags=re.IGNORECASE,
-        )
-        cleaned_response = re.sub(
-            r"```(?:json)?\s*(.*?)\s*```", r"\1", cleaned_response, flags=re.DOTALL
+        response = await asyncio.to_thread(
+            answer_medical_query, effective_query, json_output
         )
-        cleaned_response = re.sub(r"\s*(</s>|[EOT]|\[.*?\])$", "", cleaned_response)
-        if not cleaned_response.strip():
-            logger.error("Cleaned response is empty")
-            raise HTTPException(status_code=500, detail="Cleaned response is empty")
-
-        response = cleaned_response.strip()
-        logger.info(f"Parsed Groq API response: {response[:100]}...")
 
         store_chat_history(
             user_id=current_user["user_id"],
@@ -617,6 +613,29 @@ async def medical_query(
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+@app.get("/api/medical-query/jobs/{job_id}")
+async def medical_query_job(
+    job_id: str,
+    wait: float = 0,
+    current_user: dict = Depends(get_current_user),
+):
+    """Status and result of a queued medical query.
+
+    With wait > 0 (seconds, at most 30) the request is held until the job
+    finishes or the wait runs out.
+    """
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await wait_for_job(
+        job_id, current_user["user_id"], max(0.0, min(wait, 30.0))
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.post("/api/acne-analysis")
 async def acne_analysis(
     image: UploadFile = File(...),
@@ -660,13 +679,7 @@ async def get_admin_hospital(current_user: dict = Depends(get_current_user)):
 
     logger.info(f"Current user: {current_user}")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         "SELECT h.id, h.name, h.address, h.lat, h.lng FROM hospitals h JOIN hospital_admins ha ON h.id = ha.hospital_id WHERE ha.user_id = %s",
@@ -694,13 +707,7 @@ async def create_department(
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     c.execute(
@@ -721,6 +728,9 @@ async def create_department(
 
     conn.commit()
     conn.close()
+    department_catalog.add(department_id, hospital_id, department.name)
+    invalidate_condition_map()
+    notify_department_change()
 
     logger.info(f"Department created: {department.name} in hospital {hospital_id}")
     return DepartmentResponse(
@@ -739,13 +749,7 @@ async def assign_doctor(
         f"Assigning doctor: username={doctor.username}, department_id={doctor.department_id}, email={doctor.email}"
     )
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Get admin's hospital
@@ -787,7 +791,7 @@ async def assign_doctor(
     else:
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = pwd_context.hash(doctor.password)
+        hashed_password = await password_hasher.hash(doctor.password)
         created_at = datetime.utcnow()
         try:
             c.execute(
@@ -888,13 +892,7 @@ async def assign_doctor(
 async def get_departments(
     hospital_id: Optional[str] = None, current_user: dict = Depends(get_current_user)
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     query = """
         SELECT d.id, d.hospital_id, d.name, h.name
@@ -923,13 +921,7 @@ async def get_departments(
 async def get_doctors(
     department_id: Optional[str] = None, current_user: dict = Depends(get_current_user)
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     query = """
         SELECT doc.user_id, u.username, u.email, doc.department_id, d.name,
@@ -970,13 +962,7 @@ async def get_doctors(
 async def get_doctor_availability(
     doctor_id: str, current_user: dict = Depends(get_current_user)
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -1006,18 +992,11 @@ async def get_doctor_availability(
 async def book_appointment(
     appointment: AppointmentCreate,
     current_user: dict = Depends(get_current_user),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
     if current_user["role"] not in ["user", "admin"]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Verify doctor exists and get username
@@ -1120,13 +1099,11 @@ async def book_appointment(
         ),
     )
 
-    conn.commit()
-    conn.close()
-
-    # Send confirmation email in the background
+    # Queue the confirmation in the same transaction as the booking
     if patient_email:
-        background_tasks.add_task(
-            send_confirmation_email,
+        enqueue_confirmation_email(
+            c,
+            appointment_id=appointment_id,
             recipient_email=patient_email,
             patient_username=patient_username,
             doctor_username=doctor_username,
@@ -1136,6 +1113,9 @@ async def book_appointment(
             hospital_id=appointment.hospital_id,
         )
 
+    conn.commit()
+    conn.close()
+
     logger.info(
         f"Booked appointment for user {current_user['user_id']} with doctor {appointment.doctor_id}"
     )
@@ -1172,13 +1152,7 @@ async def get_doctor_slots(
             status_code=400, detail="Invalid date format. Use YYYY-MM-DD"
         )
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Verify doctor exists
@@ -1218,17 +1192,12 @@ async def get_doctor_slots(
 
 @app.get("/api/appointments", response_model=List[AppointmentResponse])
 async def get_appointments(current_user: dict = Depends(get_current_user)):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     if current_user["role"] == "admin":
         c.execute(
             """
+            /* name: admin_appointments */
             SELECT a.id, a.user_id, a.doctor_id, a.department_id, a.appointment_date, a.start_time, a.end_time, a.status, a.created_at
             FROM appointments a
             JOIN doctors d ON a.doctor_id = d.user_id
@@ -1280,13 +1249,7 @@ async def get_doctor_department(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -1319,16 +1282,11 @@ async def get_todays_appointments(current_user: dict = Depends(get_current_user)
         raise HTTPException(status_code=403, detail="Not authorized")
 
     today = date.today().isoformat()
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
+        /* name: todays_appointments */
         SELECT a.id, a.user_id, u.username, u.email, a.doctor_id, du.username, a.department_id,
                d.name, a.appointment_date, a.start_time, a.end_time, a.status, a.created_at,
                a.hospital_id
@@ -1378,16 +1336,11 @@ async def get_weekly_appointments(current_user: dict = Depends(get_current_user)
     start_date = start_of_week.isoformat()
     end_date = end_of_week.isoformat()
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
+        /* name: weekly_appointments */
         SELECT a.id, a.user_id, u.username, u.email, a.doctor_id, du.username, a.department_id,
                d.name, a.appointment_date, a.start_time, a.end_time, a.status, a.created_at,
                a.hospital_id
@@ -1439,13 +1392,7 @@ async def get_patient_medical_history(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Verify doctor has an appointment with this patient
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -1502,13 +1449,7 @@ async def get_admins(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "superadmin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -1536,16 +1477,11 @@ async def get_all_appointments(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "superadmin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
+        /* name: all_appointments */
         SELECT a.id, a.user_id, u.username, a.doctor_id, du.username, a.department_id,
                d.name, a.appointment_date, a.start_time, a.end_time, a.status, a.created_at
         FROM appointments a
@@ -1586,13 +1522,7 @@ async def create_admin(
     if current_user["role"] != "super_admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Check if username or email already exists
@@ -1613,7 +1543,7 @@ async def create_admin(
 
     # Generate user ID and hash password
     user_id = str(uuid.uuid4())
-    hashed_password = pwd_context.hash(admin.password)
+    hashed_password = await password_hasher.hash(admin.password)
     created_at = datetime.utcnow()
 
     # Insert user
@@ -1662,13 +1592,7 @@ async def create_admin(
 async def delete_admin(
     admin_id: str, current_user: dict = Depends(require_role("super_admin"))
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Verify user exists and is an admin
@@ -1702,13 +1626,7 @@ async def delete_admin(
 async def delete_doctor(
     doctor_id: str, current_user: dict = Depends(require_role("admin"))
 ):
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
 
     # Get admin's hospital
@@ -1809,13 +1727,7 @@ async def get_medical_history(current_user: dict = Depends(get_current_user)):
     if not user_id:
         raise HTTPException(status_code=400, detail="Invalid user data")
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -1853,13 +1765,7 @@ async def create_medical_history(
     record_id = str(uuid.uuid4())
     updated_at = datetime.utcnow()
 
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
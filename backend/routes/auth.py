@@ -1,43 +1,66 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+import time
 import logging
 import psycopg2
 from config.settings import settings
+from utils.db import get_db_connection
+from utils.passwords import password_hasher
+from utils.token_cache import TokenCache
 from models.schemas import UserCreate, Token, LoginRequest, UserResponse
 import uuid
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 logger = logging.getLogger(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create a JWT access token."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    # Fractional iat, so revoke_user() can tell tokens issued in the same second apart.
+    to_encode.update({"exp": expire, "iat": time.time()})
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Retrieve the current user from a JWT token."""
-    try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(
+                token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
+            )
+        except JWTError as e:
+            logger.error(f"JWT error: {str(e)}")
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
         user_id = payload.get("sub")
         role = payload.get("role")
         if not user_id or not role:
             raise HTTPException(status_code=401, detail="Invalid token")
-        logger.info(f"Authenticated user: {user_id}, role: {role}")
-        return {"user_id": user_id, "role": role}
-    except JWTError as e:
-        logger.error(f"JWT error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+        token_cache.put(token, payload)
+    if token_cache.is_revoked(token, payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    logger.debug(f"Authenticated user: {payload['sub']}, role: {payload['role']}")
+    return {"user_id": payload["sub"], "role": payload["role"]}
+
+
+def revoke_token(token: str):
+    """Reject this token from now on (in this process) and drop it from the cache."""
+    try:
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        return
+    token_cache.revoke(token, float(claims.get("exp", time.time())))
+
+
+def revoke_user_tokens(user_id: str):
+    """Reject every token issued to the user before now, e.g. after a password or role change."""
+    token_cache.revoke_user(user_id)
 
 
 def require_role(role: str):
@@ -53,13 +76,7 @@ def require_role(role: str):
 async def signup(user: UserCreate):
     """Register a new user."""
     logger.info(f"Attempting signup for username: {user.username}")
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         "SELECT username, email FROM users WHERE username = %s OR email = %s",
@@ -69,7 +86,7 @@ async def signup(user: UserCreate):
         conn.close()
         raise HTTPException(status_code=400, detail="Username or email already exists")
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     user_id = str(uuid.uuid4())
     created_at = datetime.utcnow()  # Use TIMESTAMP directly
     role = "user"  # Restrict to 'user' role
@@ -105,13 +122,7 @@ async def signup(user: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(login_data: LoginRequest):
     """Authenticate a user and return a JWT token."""
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         "SELECT id, username, email, password, role FROM users WHERE username = %s",
@@ -120,12 +131,23 @@ async def login(login_data: LoginRequest):
     user = c.fetchone()
     conn.close()
 
-    if not user or not pwd_context.verify(
-        login_data.password, user[3]
-    ):  # user[3] is password
+    valid, new_hash = await password_hasher.verify(
+        login_data.password, user[3] if user else None
+    )  # user[3] is password
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
     user_id, username, email, _, role = user
+    if new_hash:
+        # The stored hash uses an old bcrypt cost; upgrade it now that we
+        # have the plaintext.
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute("UPDATE users SET password = %s WHERE id = %s", (new_hash, user_id))
+        conn.commit()
+        conn.close()
+        logger.info(f"Re-hashed password for user {username} with the current cost")
+
     access_token = create_access_token(
         data={"sub": user_id, "role": role},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
@@ -138,3 +160,14 @@ async def login(login_data: LoginRequest):
     conn.close()
     logger.debug(f"Login response: {response}")
     return response
+
+
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user),
+):
+    """Revoke the caller's token."""
+    revoke_token(token)
+    logger.info(f"User logged out: {current_user['user_id']}")
+    return {"message": "Logged out"}
@@ -0,0 +1,5 @@
+import os
+
+# The LLM clients are built at import time and need keys, even unused ones.
+for key in ("GOOGLE_API_KEY", "GROQ_API_KEY", "LLAMA_PARSER_API_KEY"):
+    os.environ.setdefault(key, "test")
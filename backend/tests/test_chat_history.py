@@ -0,0 +1,77 @@
+import psycopg2
+import pytest
+
+import utils.chat_history as chat_history_module
+from utils.chat_history import ChatHistoryBuffer
+
+
+class FakeConnection:
+    def __init__(self, table, fail_with=None):
+        self.table = table
+        self.fail_with = fail_with
+        self.staged = []
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        self.table.extend(self.staged)
+        self.staged = []
+
+    def rollback(self):
+        self.staged = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """general_chat_history as a list; rows of user "deleted" violate the FK."""
+    table = []
+    state = {"fail_with": None}
+
+    def execute_values(conn, query, rows, page_size):
+        if conn.fail_with:
+            raise conn.fail_with
+        if any(row[1] == "deleted" for row in rows):
+            raise psycopg2.IntegrityError("violates foreign key constraint")
+        conn.staged.extend(rows)
+
+    monkeypatch.setattr(chat_history_module, "execute_values", execute_values)
+    monkeypatch.setattr(
+        chat_history_module,
+        "get_db_connection",
+        lambda: FakeConnection(table, state["fail_with"]),
+    )
+    return table, state
+
+
+def test_rejected_rows_are_dropped_and_the_rest_written(database):
+    table, _ = database
+    buffer = ChatHistoryBuffer(flush_rows=1000)
+    for i in range(10):
+        buffer.store("deleted" if i in (3, 7) else f"user{i}", f"q{i}", f"r{i}")
+    buffer.flush()
+
+    assert sorted(row[2] for row in table) == [
+        f"q{i}" for i in range(10) if i not in (3, 7)
+    ]
+    assert buffer._pending == []
+
+    buffer.store("user1", "later", "r")
+    buffer.flush()
+    assert table[-1][2] == "later"
+
+
+def test_transient_errors_keep_rows_for_the_next_flush(database):
+    table, state = database
+    buffer = ChatHistoryBuffer(flush_rows=1000)
+    buffer.store("user1", "q1", "r1")
+    state["fail_with"] = psycopg2.OperationalError("server closed the connection")
+    buffer.flush()
+    assert table == [] and len(buffer._pending) == 1
+
+    state["fail_with"] = None
+    buffer.flush()
+    assert [row[2] for row in table] == ["q1"]
@@ -0,0 +1,62 @@
+import pytest
+
+import utils.department_catalog as department_catalog_module
+from utils.department_catalog import DepartmentCatalog
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        self.database["loads"] += 1
+
+    def fetchall(self):
+        return list(self.database["rows"])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """The departments table, as created by this and other workers."""
+    database = {"rows": [("d1", "h1", "Cardiology")], "loads": 0}
+    monkeypatch.setattr(
+        department_catalog_module,
+        "get_db_connection",
+        lambda: FakeConnection(database),
+    )
+    monkeypatch.setattr(
+        department_catalog_module.settings, "DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS", 0
+    )
+    return database
+
+
+def test_miss_finds_department_created_by_another_worker(database):
+    catalog = DepartmentCatalog()
+    assert catalog.id_by_name("cardiology") == "d1"
+
+    database["rows"].append(("d2", "h1", "Neurology"))
+
+    assert catalog.id_by_name("Neurology") == "d2"
+    assert catalog.hospital_id("d2") == "h1"
+    assert "Neurology" in catalog.names()
+
+
+def test_misses_reload_at_most_once_per_interval(database, monkeypatch):
+    monkeypatch.setattr(
+        department_catalog_module.settings, "DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS", 60
+    )
+    catalog = DepartmentCatalog()
+    catalog.load()
+    catalog._loaded_at -= 61
+
+    for _ in range(5):
+        assert catalog.id_by_name("Astrology") is None
+        assert catalog.name("unknown") is None
+
+    assert database["loads"] == 2
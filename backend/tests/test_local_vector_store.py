@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from utils.local_vector_store import VECTORS_FILE, LocalVectorStore
+
+
+def unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_append_after_crashed_append(tmp_path):
+    path = str(tmp_path / "index")
+    vectors = unit_vectors(11, 8)
+    store = LocalVectorStore(path, None, dim=8)
+    store.add_embeddings(["a", "b"], vectors[:2].tolist(), ids=["a", "b"])
+
+    # A crash after writing a vector but before the document and the count.
+    with open(os.path.join(path, VECTORS_FILE), "ab") as f:
+        f.write(vectors[2].tobytes())
+    with open(os.path.join(path, "docs.jsonl"), "ab") as f:
+        f.write(b'{"id": "orph')
+
+    store = LocalVectorStore(path, None, dim=8)
+    assert len(store) == 2
+    store.add_embeddings(["d"], [vectors[10].tolist()], ids=["d"])
+
+    [(document, score)] = store.similarity_search_by_vector_with_score(
+        vectors[10].tolist(), k=1
+    )
+    assert document.id == "d"
+    assert abs(score - 1.0) < 1e-5
+
+    reopened = LocalVectorStore(path, None, dim=8)
+    assert reopened.ids == ["a", "b", "d"]
+    [(document, _)] = reopened.similarity_search_by_vector_with_score(
+        vectors[1].tolist(), k=1
+    )
+    assert document.id == "b"
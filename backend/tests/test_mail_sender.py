@@ -0,0 +1,37 @@
+import contextlib
+
+import utils.mail_sender as mail_sender
+from utils.mail_sender import OutboxSender
+
+
+class FakePool:
+    size = 1
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield object()
+
+
+def test_unexpected_errors_are_retried_and_sent_rows_recorded(monkeypatch):
+    def send_message(connection, recipient, subject, body):
+        if recipient == "bad@example.com":
+            raise ValueError("could not build message")
+
+    monkeypatch.setattr(mail_sender, "send_message", send_message)
+    sender = OutboxSender(FakePool())
+    recorded = {}
+    sender.record = lambda sent, retries, failed: recorded.update(
+        sent=sent, retries=retries, failed=failed
+    )
+
+    rows = [
+        (f"id{i}", "key", recipient, "Subject", "Body", 1)
+        for i, recipient in enumerate(
+            ["a@example.com", "bad@example.com", "c@example.com"]
+        )
+    ]
+    sender.send_batch(rows)
+
+    assert [row[0] for row in recorded["sent"]] == ["id0", "id2"]
+    assert [row[0] for row, _ in recorded["retries"]] == ["id1"]
+    assert recorded["failed"] == []
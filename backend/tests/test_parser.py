@@ -0,0 +1,38 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import utils.parser as parser
+
+REPORT = {"patient_info": {"age": "34 Y", "gender": "Female"}, "haematology_results": []}
+
+
+def slow_create(**kwargs):
+    time.sleep(0.2)
+    content = "```json\n" + json.dumps(REPORT) + "\n```"
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+def test_structuring_does_not_block_the_event_loop(monkeypatch):
+    monkeypatch.setattr(
+        parser,
+        "client",
+        SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=slow_create))
+        ),
+    )
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(parser.structure_report("Age: 34 Y\nGender: Female") for _ in range(4))
+        )
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+
+    assert [output for output, _ in results] == [REPORT] * 4
+    assert elapsed < 0.6
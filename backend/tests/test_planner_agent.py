@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import utils.agents as agents
+
+DEPARTMENTS = {"Cardiology": "dep-cardiology", "Department of Dermatology": "dep-derm"}
+
+
+@pytest.fixture
+def plan(monkeypatch):
+    """Makes the planner's LLM return the given plan."""
+    monkeypatch.setattr(agents, "get_all_department_names", lambda: list(DEPARTMENTS))
+    monkeypatch.setattr(agents, "get_department_id_by_name", DEPARTMENTS.get)
+
+    def set_plan(reply):
+        monkeypatch.setattr(
+            agents,
+            "llm",
+            SimpleNamespace(invoke=lambda _: SimpleNamespace(content=json.dumps(reply))),
+        )
+
+    return set_plan
+
+
+def test_department_without_condition_is_passed_on(plan):
+    plan(
+        {
+            "action": "db_query",
+            "tool": "get_doctors",
+            "parameters": {},
+            "department_name": "Cardiology",
+        }
+    )
+
+    routing = agents.planner_agent("List doctors in Cardiology")
+
+    assert routing.parameters["department_name"] == "Cardiology"
+    assert routing.parameters["department_id"] == "dep-cardiology"
+    assert "department_resolved" not in routing.parameters
+
+
+def test_condition_marks_department_resolved(plan):
+    plan(
+        {
+            "action": "db_query",
+            "tool": "get_doctors",
+            "parameters": {"condition": "acne"},
+            "department_name": "Department of Dermatology",
+        }
+    )
+
+    routing = agents.planner_agent("List doctors for acne")
+
+    assert routing.parameters["department_id"] == "dep-derm"
+    assert routing.parameters["department_resolved"] is True
+
+
+def test_unknown_department_falls_back(plan):
+    plan(
+        {
+            "action": "db_query",
+            "tool": "get_doctors",
+            "parameters": {},
+            "department_name": "Astrology",
+        }
+    )
+
+    assert agents.planner_agent("List doctors in Astrology") is None
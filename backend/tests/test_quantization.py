@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils.local_vector_store import LocalVectorStore
+from utils.quantization import ScalarQuantizer
+
+DIM = 64
+K = 10
+
+
+def clustered_vectors(n: int, seed: int) -> np.ndarray:
+    """Unit vectors around 50 random centers, closer to real embeddings than noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((50, DIM))
+    vectors = centers[rng.integers(0, 50, n)] + 0.5 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = clustered_vectors(3000, seed=0)
+    queries = clustered_vectors(50, seed=1)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :K]
+    return vectors, queries, exact
+
+
+def build(path: str, vectors: np.ndarray) -> LocalVectorStore:
+    store = LocalVectorStore(path, None, dim=DIM)
+    texts = [str(i) for i in range(len(vectors))]
+    store.add_embeddings(texts, vectors.tolist(), ids=texts)
+    return store
+
+
+def recall(store: LocalVectorStore, queries: np.ndarray, exact: np.ndarray) -> float:
+    rows, _ = store.search_vectors(queries, K)
+    return np.mean([len(set(r) & set(e)) / K for r, e in zip(rows, exact)])
+
+
+@pytest.mark.parametrize("kind,m,minimum", [("int8", None, 0.99), ("pq", 16, 0.95)])
+def test_recall_against_exact_search(tmp_path, data, kind, m, minimum):
+    vectors, queries, exact = data
+    store = build(str(tmp_path / "index"), vectors)
+    assert recall(store, queries, exact) == 1.0
+
+    store.quantize(kind, **({"m": m} if m else {}))
+    assert recall(store, queries, exact) >= minimum
+
+    # Quantization survives reopening the index.
+    reopened = LocalVectorStore(str(tmp_path / "index"), None)
+    assert recall(reopened, queries, exact) >= minimum
+
+
+def test_codes_aligned_after_crashed_append(tmp_path, data):
+    vectors, queries, exact = data
+    path = str(tmp_path / "index")
+    store = build(path, vectors[:2000])
+    store.quantize("int8")
+
+    # A crash after the codes were written but before the vectors' count.
+    store.quantizer.append(vectors[2000:2010])
+
+    store = LocalVectorStore(path, None)
+    assert os.path.getsize(os.path.join(path, ScalarQuantizer.CODES_FILE)) == (
+        2000 * DIM
+    )
+    texts = [str(i) for i in range(2000, 3000)]
+    store.add_embeddings(texts, vectors[2000:].tolist(), ids=texts)
+    assert recall(store, queries, exact) >= 0.99
+
+
+def test_ivf_tail_aligned_after_crashed_append(tmp_path, data):
+    vectors, queries, exact = data
+    path = str(tmp_path / "index")
+    store = build(path, vectors[:2000])
+    store.build_ivf(nlist=20)
+    store.nprobe = 20
+
+    # A crash after the tail entries (and half of one more) were written.
+    store.ivf.add(vectors[2000:2010], first_row=2000)
+    with open(os.path.join(path, "ivf_tail.bin"), "ab") as f:
+        f.write(b"\x00" * 12)
+
+    store = LocalVectorStore(path, None, nprobe=20)
+    assert len(store.ivf.tail) == 0
+    texts = [str(i) for i in range(2000, 3000)]
+    store.add_embeddings(texts, vectors[2000:].tolist(), ids=texts)
+    assert recall(LocalVectorStore(path, None, nprobe=20), queries, exact) == 1.0
@@ -1,12 +1,16 @@
 import psycopg2
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Literal, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError, model_validator
 import re
 from config.settings import settings
+from utils.db import get_db_connection
+from utils.llm_metrics import llm_metrics
+from utils.tracing import current_span, span, traced
 from utils.pineconeutils import (
-    retrieval_chain,
+    gemini_client_kwargs,
+    get_retrieval_chain,
     get_general_chat_history,
     store_general_chat_history,
 )
@@ -15,26 +19,36 @@ import uuid
 import logging
 import json
 import asyncio
+import functools
+import contextvars
+import time
+from utils.fast_router import fast_route
+from utils.tool_registry import Tool, ToolRegistry
+from utils.department_catalog import department_catalog
+from utils.condition_map import (
+    lookup_condition_department,
+    remember_condition_department,
+)
+from utils.intent_classifier import (
+    SELF_CONTAINED_LABELS,
+    load_intent_classifier,
+    log_router_decision,
+)
 
-# Assuming send_confirmation_email is defined elsewhere and imported
-from utils.email import (
-    send_confirmation_email,
-)  # Adjust import based on your project structure
+from utils.email import enqueue_confirmation_email
 
 logger = logging.getLogger(__name__)
 
 # Initialize LLM
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.3)
-
-
-# Define tools
-class Tool(BaseModel):
-    name: str
-    description: str
-    function: callable
+llm = ChatGoogleGenerativeAI(
+    model="gemini-1.5-flash-latest",
+    temperature=0.3,
+    callbacks=[llm_metrics],
+    **gemini_client_kwargs(),
+)
 
-    class Config:
-        arbitrary_types_allowed = True
+# Local intent classifier consulted before the LLM router (None until trained)
+intent_classifier = load_intent_classifier(settings.INTENT_MODEL_PATH)
 
 
 class RouterResponse(BaseModel):
@@ -42,6 +56,26 @@ class RouterResponse(BaseModel):
     parameters: Dict
 
 
+class PlannerResponse(BaseModel):
+    action: Literal["rag_query", "db_query"]
+    tool: Optional[
+        Literal[
+            "get_hospitals",
+            "get_doctors",
+            "get_doctor_availability",
+            "book_appointment",
+        ]
+    ] = None
+    parameters: Dict = {}
+    department_name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_tool(self):
+        if self.action == "db_query" and not self.tool:
+            raise ValueError("db_query requires a tool")
+        return self
+
+
 class DatabaseKnowledgeResponse(BaseModel):
     department_name: Optional[str]
     department_id: Optional[str]
@@ -49,16 +83,6 @@ class DatabaseKnowledgeResponse(BaseModel):
     error: Optional[str]
 
 
-def get_db_connection():
-    return psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
-
-
 def get_hospitals() -> List[Dict]:
     conn = get_db_connection()
     c = conn.cursor()
@@ -109,86 +133,104 @@ def get_doctors(
     return doctors
 
 
-def get_doctor_availability(doctor_id: str, date: Optional[str] = None) -> List[Dict]:
-    conn = get_db_connection()
-    c = conn.cursor()
-    query = """
-        SELECT id, day_of_week, start_time, end_time
-        FROM doctor_availability
-        WHERE user_id = %s
+DAYS_OF_WEEK = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+# Availability slots joined with their booking status. Slots are matched to
+# the date they would be booked on via the unnest()ed (day_of_week, slot_date)
+# pairs, so booking status costs no extra round trips.
+AVAILABILITY_QUERY = """
+    SELECT da.user_id, da.id, da.day_of_week, da.start_time, da.end_time,
+           EXISTS (
+               SELECT 1 FROM appointments a
+               WHERE a.doctor_id = da.user_id
+               AND a.appointment_date = s.slot_date
+               AND a.start_time = da.start_time
+               AND a.status != 'cancelled'
+           )
+    FROM doctor_availability da
+    JOIN unnest(%s::text[], %s::text[]) AS s(day_of_week, slot_date)
+        ON s.day_of_week = da.day_of_week
+"""
+
+
+def get_slot_dates(date: Optional[str] = None) -> Tuple[List[str], List[str]]:
+    """Days of week and the date each is booked on.
+
+    With a date, only that date's weekday. Otherwise every weekday mapped to
+    its next occurrence, where today's weekday means a week from today.
     """
-    params = [doctor_id]
     if date:
-        day_of_week = datetime.strptime(date, "%Y-%m-%d").strftime("%A")
-        query += " AND day_of_week = %s"
-        params.append(day_of_week)
-    c.execute(query, params)
-    availability = [
-        {"id": row[0], "day_of_week": row[1], "start_time": row[2], "end_time": row[3]}
-        for row in c.fetchall()
-    ]
+        return [datetime.strptime(date, "%Y-%m-%d").strftime("%A")], [date]
+    today = datetime.now()
+    slot_dates = []
+    for day_index in range(len(DAYS_OF_WEEK)):
+        days_until_target = (day_index - today.weekday() + 7) % 7 or 7
+        slot_dates.append(
+            (today + timedelta(days=days_until_target)).strftime("%Y-%m-%d")
+        )
+    return list(DAYS_OF_WEEK), slot_dates
 
-    # Add booking status
-    for slot in availability:
-        slot_date = date
-        if not slot_date:
-            today = datetime.now()
-            days_of_week = [
-                "Monday",
-                "Tuesday",
-                "Wednesday",
-                "Thursday",
-                "Friday",
-                "Saturday",
-                "Sunday",
-            ]
-            target_day_index = days_of_week.index(slot["day_of_week"])
-            current_day_index = today.weekday()
-            days_until_target = (target_day_index - current_day_index + 7) % 7
-            if days_until_target == 0:
-                days_until_target = 7
-            slot_date = (today + timedelta(days=days_until_target)).strftime("%Y-%m-%d")
 
-        c.execute(
-            """
-            SELECT id FROM appointments
-            WHERE doctor_id = %s AND appointment_date = %s AND start_time = %s AND status != 'cancelled'
-            """,
-            (doctor_id, slot_date, slot["start_time"]),
-        )
-        slot["is_booked"] = bool(c.fetchone())
+def _availability_row(row) -> Dict:
+    return {
+        "id": row[1],
+        "day_of_week": row[2],
+        "start_time": row[3],
+        "end_time": row[4],
+        "is_booked": row[5],
+    }
 
+
+def get_doctor_availability(doctor_id: str, date: Optional[str] = None) -> List[Dict]:
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        AVAILABILITY_QUERY + " WHERE da.user_id = %s",
+        (*get_slot_dates(date), doctor_id),
+    )
+    availability = [_availability_row(row) for row in c.fetchall()]
     conn.close()
     return availability
 
 
-async def async_send_confirmation_email(
-    recipient_email: str,
-    patient_username: str,
-    doctor_username: str,
-    department_name: str,
-    appointment_date: str,
-    start_time: str,
-    hospital_id: str,
-):
-    loop = asyncio.get_event_loop()
-    try:
-        await loop.run_in_executor(
-            None,
-            send_confirmation_email,
-            recipient_email,
-            patient_username,
-            doctor_username,
-            department_name,
-            appointment_date,
-            start_time,
-            hospital_id,
-        )
-        logger.info(f"Confirmation email sent to {recipient_email}")
-    except Exception as e:
-        logger.error(
-            f"Failed to send confirmation email to {recipient_email}: {str(e)}"
-        )
+def get_department_availability(
+    department_id: str, date: Optional[str] = None
+) -> Dict[str, List[Dict]]:
+    """Availability for every doctor in a department in one query, keyed by doctor id."""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        AVAILABILITY_QUERY
+        + """
+        JOIN doctors d ON d.user_id = da.user_id
+        WHERE d.department_id = %s
+        """,
+        (*get_slot_dates(date), department_id),
+    )
+    availability: Dict[str, List[Dict]] = {}
+    for row in c.fetchall():
+        availability.setdefault(row[0], []).append(_availability_row(row))
+    conn.close()
+    return availability
+
+
+async def run_tool(function, *args, **kwargs):
+    """Run a blocking tool function in the default executor."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry contextvars; copy them so spans opened
+    # in the function nest under the caller's.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        None, functools.partial(context.run, function, *args, **kwargs)
+    )
 
 
 def book_appointment(
@@ -339,20 +381,11 @@ def book_appointment(
                 created_at,
             ),
         )
-        conn.commit()
-    except psycopg2.IntegrityError as e:
-        conn.rollback()
-        logger.error(f"Failed to insert appointment: {str(e)}")
-        conn.close()
-        raise ValueError("Error booking appointment")
-
-    conn.close()
-
-    # Send confirmation email in the background
-    if patient_email:
-        logger.debug(f"Scheduling confirmation email to {patient_email}")
-        asyncio.create_task(
-            async_send_confirmation_email(
+        # Queued in the booking transaction; utils.mail_sender delivers it.
+        if patient_email:
+            enqueue_confirmation_email(
+                c,
+                appointment_id=appointment_id,
                 recipient_email=patient_email,
                 patient_username=patient_username,
                 doctor_username=doctor_username,
@@ -361,7 +394,14 @@ def book_appointment(
                 start_time=start_time,
                 hospital_id=hospital_id,
             )
-        )
+        conn.commit()
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        logger.error(f"Failed to insert appointment: {str(e)}")
+        conn.close()
+        raise ValueError("Error booking appointment")
+
+    conn.close()
 
     booking = {
         "id": appointment_id,
@@ -383,46 +423,36 @@ def book_appointment(
 
 
 def rag_query(query: str, user_id: str) -> str:
-    history = get_general_chat_history(user_id)
+    with span("chat_history.read") as history_span:
+        history = get_general_chat_history(user_id)
+        history_span.set_attribute("turns", len(history))
     history_text = "".join(
         [
             f"User: {entry['query']}\nAssistant: {entry['response']}\n\n"
             for entry in history
         ]
     )
-    response = retrieval_chain.invoke({"input": query, "history": history_text})
+    # Retrieval (vector_search) and generation (llm) are child spans.
+    with span("rag.chain"):
+        response = get_retrieval_chain().invoke(
+            {"input": query, "history": history_text}
+        )
     answer = response.get("answer", "No answer found.")
-    store_general_chat_history(user_id, query, answer)
+    with span("chat_history.store"):
+        store_general_chat_history(user_id, query, answer)
     return answer
 
 
 def get_department_id_by_name(department_name: str) -> Optional[str]:
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        "SELECT id FROM departments WHERE LOWER(name) = LOWER(%s)", (department_name,)
-    )
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    return department_catalog.id_by_name(department_name)
 
 
 def get_all_department_names() -> List[str]:
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT name FROM departments")
-    departments = [row[0] for row in c.fetchall()]
-    conn.close()
-    return departments
+    return department_catalog.names()
 
 
 def get_hospital_id_by_department(department_id: str) -> Optional[str]:
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT hospital_id FROM departments WHERE id = %s", (department_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    return department_catalog.hospital_id(department_id)
 
 
 def get_doctor_id_by_username(username: str) -> Optional[str]:
@@ -461,7 +491,47 @@ def get_doctor_id_by_username(username: str) -> Optional[str]:
     return doctor_id
 
 
-def database_knowledge_agent(condition: str) -> DatabaseKnowledgeResponse:
+@traced()
+async def lookup_department_doctors(
+    department_name: str, department_id: str
+) -> DatabaseKnowledgeResponse:
+    # Doctors and their availability are independent queries; run them together.
+    doctors, availability = await TOOLS.execute_many(
+        [
+            ("get_doctors", {"department_id": department_id}),
+            ("get_department_availability", {"department_id": department_id}),
+        ]
+    )
+    if not doctors:
+        return DatabaseKnowledgeResponse(
+            department_name=department_name,
+            department_id=department_id,
+            doctors=[],
+            error=f"No doctors found in the {department_name} department.",
+        )
+
+    for doctor in doctors:
+        doctor["availability"] = availability.get(doctor["user_id"], [])
+
+    return DatabaseKnowledgeResponse(
+        department_name=department_name,
+        department_id=department_id,
+        doctors=doctors,
+        error=None,
+    )
+
+
+@traced()
+async def database_knowledge_agent(condition: str) -> DatabaseKnowledgeResponse:
+    cached = await run_tool(lookup_condition_department, condition)
+    current_span().set_attributes(condition=condition, cache_hit=bool(cached))
+    if cached:
+        department_id, department_name = cached
+        logger.info(
+            f"DatabaseKnowledgeAgent mapping cache hit: '{condition}' -> {department_name}"
+        )
+        return await lookup_department_doctors(department_name, department_id)
+
     departments = get_all_department_names()
 
     prompt = ChatPromptTemplate.from_template(
@@ -489,7 +559,7 @@ def database_knowledge_agent(condition: str) -> DatabaseKnowledgeResponse:
         """
     )
     try:
-        response = llm.invoke(
+        response = await llm.ainvoke(
             prompt.format(condition=condition, departments=", ".join(departments))
         )
         logger.debug(f"DatabaseKnowledgeAgent LLM raw response: {response.content}")
@@ -530,62 +600,238 @@ def database_knowledge_agent(condition: str) -> DatabaseKnowledgeResponse:
             ),
         )
 
-    doctors = get_doctors(department_id=department_id)
-    if not doctors:
+    await run_tool(
+        remember_condition_department, condition, department_id, department_name
+    )
+    return await lookup_department_doctors(department_name, department_id)
+
+
+@traced()
+async def resolved_department_doctors(
+    condition: str, department_name: Optional[str], department_id: Optional[str]
+) -> DatabaseKnowledgeResponse:
+    """Doctors for a department the planner already inferred, skipping the LLM."""
+    if not department_id:
         return DatabaseKnowledgeResponse(
-            department_name=department_name,
-            department_id=department_id,
+            department_name=None,
+            department_id=None,
             doctors=[],
-            error=f"No doctors found in the {department_name} department.",
+            error=(
+                f"Could not determine department for condition '{condition}'. "
+                f"Available departments: {', '.join(get_all_department_names())}."
+            ),
         )
+    await run_tool(
+        remember_condition_department, condition, department_id, department_name
+    )
+    return await lookup_department_doctors(department_name, department_id)
 
-    for doctor in doctors:
-        availability = get_doctor_availability(doctor["user_id"])
-        doctor["availability"] = availability
 
-    return DatabaseKnowledgeResponse(
-        department_name=department_name,
-        department_id=department_id,
-        doctors=doctors,
-        error=None,
+class GetDoctorsArgs(BaseModel):
+    department_id: Optional[str] = None
+    hospital_id: Optional[str] = None
+
+
+class DoctorAvailabilityArgs(BaseModel):
+    doctor_id: str
+    date: Optional[str] = Field(default=None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+
+
+class DepartmentAvailabilityArgs(BaseModel):
+    department_id: str
+    date: Optional[str] = Field(default=None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+
+
+class BookAppointmentArgs(BaseModel):
+    user_id: str
+    doctor_id: str
+    department_id: str
+    hospital_id: str
+    appointment_date: str = Field(pattern=r"^\d{4}-\d{2}-\d{2}$")
+    start_time: str = Field(pattern=r"^\d{2}:\d{2}$")
+    end_time: str = Field(pattern=r"^\d{2}:\d{2}$")
+
+
+class RagQueryArgs(BaseModel):
+    query: str
+    user_id: str
+
+
+TOOLS = ToolRegistry(
+    [
+        Tool(
+            name="get_hospitals",
+            description="Retrieve a list of hospitals with their details.",
+            function=get_hospitals,
+        ),
+        Tool(
+            name="get_doctors",
+            description="Retrieve a list of doctors, optionally filtered by department or hospital.",
+            function=get_doctors,
+            args_model=GetDoctorsArgs,
+        ),
+        Tool(
+            name="get_doctor_availability",
+            description="Retrieve a doctor's availability, optionally for a specific date.",
+            function=get_doctor_availability,
+            args_model=DoctorAvailabilityArgs,
+        ),
+        Tool(
+            name="get_department_availability",
+            description="Retrieve availability for every doctor in a department.",
+            function=get_department_availability,
+            args_model=DepartmentAvailabilityArgs,
+        ),
+        Tool(
+            name="book_appointment",
+            description="Book an appointment with a doctor.",
+            function=book_appointment,
+            args_model=BookAppointmentArgs,
+            # Not idempotent: never report a failure while the booking (and
+            # its confirmation email) may still commit.
+            timeout=None,
+        ),
+        Tool(
+            name="rag_query",
+            description="Query the RAG system for general medical information.",
+            function=rag_query,
+            args_model=RagQueryArgs,
+            timeout=settings.RAG_TOOL_TIMEOUT_SECONDS,
+        ),
+    ]
+)
+
+
+@traced()
+def planner_agent(query: str) -> Optional[RouterResponse]:
+    """Route the query and resolve its department in a single LLM call.
+
+    Returns None when the response does not validate against PlannerResponse
+    or names an unknown department, so the caller can fall back to the
+    two-step router + database knowledge agent flow.
+    """
+    departments = get_all_department_names()
+    prompt = ChatPromptTemplate.from_template(
+        """
+        You are a planner agent for a hospital assistant. Analyze the user's query and return a JSON object describing how to handle it, including the medical department when a condition is mentioned.
+
+        **Available Departments:** {departments}
+
+        **Query:** {query}
+
+        **Instructions:**
+        - Return a JSON object with exactly four fields: "action", "tool", "parameters" and "department_name".
+        - Set "action" to "rag_query" for general medical questions (e.g., about diseases, symptoms, treatments), with "tool" null and "parameters" {{"query": <original query>}}.
+        - Set "action" to "db_query" for queries about hospitals, doctors, availability, or appointments, with "tool" one of "get_hospitals", "get_doctors", "get_doctor_availability", "book_appointment".
+        - For "get_doctors", include "condition" in "parameters" if a condition is mentioned, and set "department_name" to the most relevant available department for that condition, or null if none matches.
+        - For "get_doctors" in a named department without a condition, set "department_name" to that department and leave "parameters" empty.
+        - For "book_appointment", "parameters" must contain "doctor_username", "appointment_date" (YYYY-MM-DD), "start_time" and "end_time" (HH:MM); set missing details to null.
+        - "department_name" must be copied exactly from the available departments, or null.
+        - Output ONLY valid JSON, enclosed in curly braces {{}}, with double-quoted keys and values.
+        - Do NOT wrap the JSON in markdown code blocks or include any other text.
+
+        **Examples:**
+        - Query: "What is acne?" → {{"action": "rag_query", "tool": null, "parameters": {{"query": "What is acne?"}}, "department_name": null}}
+        - Query: "List hospitals" → {{"action": "db_query", "tool": "get_hospitals", "parameters": {{}}, "department_name": null}}
+        - Query: "List available doctors for acne?" → {{"action": "db_query", "tool": "get_doctors", "parameters": {{"condition": "acne"}}, "department_name": "Department of Dermatology"}}
+        - Query: "List doctors for fatigue" → {{"action": "db_query", "tool": "get_doctors", "parameters": {{"condition": "fatigue"}}, "department_name": null}}
+        - Query: "List doctors in Cardiology" → {{"action": "db_query", "tool": "get_doctors", "parameters": {{}}, "department_name": "Cardiology"}}
+        - Query: "Book my slot for Monday: 09:00 - 09:30" → {{"action": "db_query", "tool": "book_appointment", "parameters": {{"doctor_username": null, "appointment_date": null, "start_time": "09:00", "end_time": "09:30"}}, "department_name": null}}
+
+        **Output (valid JSON only, no markdown):**
+        """
     )
+    cleaned_response = None
+    try:
+        response = llm.invoke(
+            prompt.format(query=query, departments=", ".join(departments))
+        )
+        logger.debug(f"PlannerAgent LLM raw response: {response.content}")
+        cleaned_response = re.sub(r"```json\s*|\s*```", "", response.content).strip()
+        plan = PlannerResponse(**json.loads(cleaned_response))
+    except (json.JSONDecodeError, ValidationError, TypeError) as e:
+        logger.error(
+            f"PlannerAgent returned an invalid plan: {cleaned_response}, error: {e}"
+        )
+        return None
+    except Exception as e:
+        logger.error(f"PlannerAgent error: {e}, LLM response: {cleaned_response}")
+        return None
 
+    if plan.action == "rag_query":
+        return RouterResponse(
+            action="rag_query", parameters={"query": plan.parameters.get("query", query)}
+        )
 
-TOOLS = [
-    Tool(
-        name="get_hospitals",
-        description="Retrieve a list of hospitals with their details.",
-        function=get_hospitals,
-    ),
-    Tool(
-        name="get_doctors",
-        description="Retrieve a list of doctors, optionally filtered by department or hospital.",
-        function=get_doctors,
-    ),
-    Tool(
-        name="get_doctor_availability",
-        description="Retrieve a doctor's availability, optionally for a specific date.",
-        function=get_doctor_availability,
-    ),
-    Tool(
-        name="book_appointment",
-        description="Book an appointment with a doctor.",
-        function=book_appointment,
-    ),
-    Tool(
-        name="rag_query",
-        description="Query the RAG system for general medical information.",
-        function=rag_query,
-    ),
-]
+    parameters = dict(plan.parameters)
+    parameters["tool"] = plan.tool
+    if plan.tool == "get_doctors":
+        department_id = None
+        if plan.department_name:
+            department_id = get_department_id_by_name(plan.department_name)
+            if not department_id:
+                logger.warning(
+                    f"PlannerAgent named unknown department '{plan.department_name}'"
+                )
+                return None
+        if plan.department_name or parameters.get("condition"):
+            parameters["department_name"] = plan.department_name
+            parameters["department_id"] = department_id
+        if parameters.get("condition"):
+            # Tells appointment_booking_agent the department was already inferred.
+            parameters["department_resolved"] = True
+    return RouterResponse(action="db_query", parameters=parameters)
 
 
+@traced()
 def router_agent(query: str, user_id: str) -> RouterResponse:
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT name FROM departments")
-    departments = [row[0] for row in c.fetchall()]
-    conn.close()
+    started = time.perf_counter()
+    fast_result = fast_route(query, get_all_department_names)
+    if fast_result:
+        current_span().set_attribute("path", "fast")
+        logger.info(
+            f"RouterAgent fast path used: tool={fast_result['parameters'].get('tool')}, "
+            f"elapsed_ms={(time.perf_counter() - started) * 1000:.2f}"
+        )
+        return RouterResponse(**fast_result)
+
+    if intent_classifier:
+        label, confidence = intent_classifier.predict(query)
+        if (
+            label in SELF_CONTAINED_LABELS
+            and confidence >= settings.INTENT_CONFIDENCE_THRESHOLD
+        ):
+            current_span().set_attribute("path", "classifier")
+            logger.info(
+                f"RouterAgent classifier path used: label={label}, confidence={confidence:.3f}, "
+                f"elapsed_ms={(time.perf_counter() - started) * 1000:.2f}"
+            )
+            if label == "rag_query":
+                return RouterResponse(action="rag_query", parameters={"query": query})
+            return RouterResponse(action="db_query", parameters={"tool": label})
+
+    if settings.AGENT_PLANNER_MODE:
+        routing = planner_agent(query)
+        if routing:
+            current_span().set_attribute("path", "planner")
+            logger.info(
+                f"RouterAgent planner path used: tool={routing.parameters.get('tool')}, "
+                f"elapsed_ms={(time.perf_counter() - started) * 1000:.2f}"
+            )
+            log_router_decision(
+                settings.ROUTER_DECISION_LOG,
+                query,
+                (
+                    "rag_query"
+                    if routing.action == "rag_query"
+                    else routing.parameters.get("tool")
+                ),
+                source="planner",
+            )
+            return routing
+        logger.info("RouterAgent planner failed; falling back to two-step routing")
+
+    departments = get_all_department_names()
 
     prompt = ChatPromptTemplate.from_template(
         """
@@ -632,7 +878,23 @@ def router_agent(query: str, user_id: str) -> RouterResponse:
         logger.debug(f"RouterAgent LLM raw response: {response.content}")
         cleaned_response = re.sub(r"```json\s*|\s*```", "", response.content).strip()
         result = json.loads(cleaned_response)
-        return RouterResponse(**result)
+        current_span().set_attribute("path", "llm")
+        logger.info(
+            f"RouterAgent LLM path used: action={result.get('action')}, "
+            f"elapsed_ms={(time.perf_counter() - started) * 1000:.2f}"
+        )
+        routing = RouterResponse(**result)
+        log_router_decision(
+            settings.ROUTER_DECISION_LOG,
+            query,
+            (
+                "rag_query"
+                if routing.action == "rag_query"
+                else routing.parameters.get("tool")
+            ),
+            source="llm",
+        )
+        return routing
     except json.JSONDecodeError as e:
         logger.error(
             f"RouterAgent failed to parse LLM response: {cleaned_response}, error: {e}"
@@ -643,6 +905,7 @@ def router_agent(query: str, user_id: str) -> RouterResponse:
         return RouterResponse(action="rag_query", parameters={"query": query})
 
 
+@traced()
 async def appointment_booking_agent(query: str, user_id: str) -> Dict:
     try:
         logger.debug(
@@ -660,7 +923,10 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                 "response": f"Internal error: Invalid user_id type: {type(user_id)}"
             }
 
-        routing = router_agent(query, user_id)
+        routing = await run_tool(router_agent, query, user_id)
+        current_span().set_attributes(
+            action=routing.action, tool=routing.parameters.get("tool") or ""
+        )
         logger.info(f"Routing decision: {routing}, type={type(routing)}")
         logger.debug(
             f"Routing parameters: {routing.parameters}, type={type(routing.parameters)}"
@@ -681,7 +947,11 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
             }
 
         if routing.action == "rag_query":
-            result = rag_query(routing.parameters.get("query", query), user_id)
+            result = await TOOLS.execute(
+                "rag_query",
+                query=routing.parameters.get("query", query),
+                user_id=user_id,
+            )
             logger.info(f"RAG query result: {result[:100]}...")
             return {"response": result}
 
@@ -703,7 +973,14 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                 }
 
             if tool_name == "get_doctors" and condition:
-                db_response = database_knowledge_agent(condition)
+                if routing.parameters.get("department_resolved"):
+                    db_response = await resolved_department_doctors(
+                        condition,
+                        department_name,
+                        routing.parameters.get("department_id"),
+                    )
+                else:
+                    db_response = await database_knowledge_agent(condition)
                 if db_response.error:
                     return {"response": db_response.error}
                 return {"response": db_response.doctors}
@@ -738,7 +1015,7 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                     }
 
                 # Get doctor ID
-                doctor_id = get_doctor_id_by_username(doctor_username)
+                doctor_id = await run_tool(get_doctor_id_by_username, doctor_username)
                 logger.debug(f"Doctor ID: {doctor_id}, type={type(doctor_id)}")
                 if not doctor_id:
                     return {
@@ -783,37 +1060,20 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                         "response": f"Internal error: Invalid department query result type: {type(department_result)}"
                     }
                 department_id = department_result[0]
+                conn.close()
                 logger.debug(
                     f"Department ID: {department_id}, type={type(department_id)}"
                 )
 
-                # Fetch hospital_id from departments table
-                c.execute(
-                    """
-                    SELECT hospital_id
-                    FROM departments
-                    WHERE id = %s
-                    """,
-                    (department_id,),
-                )
-                hospital_result = c.fetchone()
+                # Resolve hospital_id from the department catalog
+                hospital_id = get_hospital_id_by_department(department_id)
                 logger.debug(
-                    f"Hospital query: department_id={department_id}, result={hospital_result}, type={type(hospital_result)}"
+                    f"Hospital lookup: department_id={department_id}, hospital_id={hospital_id}"
                 )
-                conn.close()
-                if not hospital_result:
+                if not hospital_id:
                     return {
                         "response": f"No hospital found for department ID '{department_id}'."
                     }
-                if not isinstance(hospital_result, tuple):
-                    logger.error(
-                        f"Expected tuple for hospital_result, got {type(hospital_result)}: {hospital_result}"
-                    )
-                    return {
-                        "response": f"Internal error: Invalid hospital query result type: {type(hospital_result)}"
-                    }
-                hospital_id = hospital_result[0]
-                logger.debug(f"Hospital ID: {hospital_id}, type={type(hospital_id)}")
 
                 # Validate IDs
                 if not all(isinstance(x, str) for x in [department_id, hospital_id]):
@@ -832,7 +1092,8 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                         f"appointment_date={appointment_date}, start_time={start_time}, "
                         f"end_time={end_time}"
                     )
-                    booking = book_appointment(
+                    booking = await TOOLS.execute(
+                        "book_appointment",
                         user_id=user_id,
                         doctor_id=doctor_id,
                         department_id=department_id,
@@ -843,6 +1104,11 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                     )
                     logger.debug(f"Booking successful: {booking}")
                     return {"response": booking}
+                except ValidationError as e:
+                    logger.debug(f"Invalid booking arguments: {str(e)}")
+                    return {
+                        "response": "Please provide the date as YYYY-MM-DD and times as HH:MM."
+                    }
                 except ValueError as e:
                     logger.debug(f"Booking failed: {str(e)}")
                     return {"response": str(e)}
@@ -859,24 +1125,22 @@ async def appointment_booking_agent(query: str, user_id: str) -> Dict:
                         )
                     }
 
-            for tool in TOOLS:
-                if tool.name == tool_name:
-                    if tool_name == "get_doctors" and department_id:
-                        doctors = tool.function(department_id=department_id)
-                        if not doctors:
-                            return {
-                                "response": f"No doctors found in the {department_name} department."
-                            }
-                        for doctor in doctors:
-                            availability = get_doctor_availability(doctor["user_id"])
-                            doctor["availability"] = availability
-                        return {"response": doctors}
-                    elif tool_name == "get_doctor_availability":
-                        result = tool.function(**routing.parameters.get("params", {}))
-                        return {"response": result}
-                    else:
-                        result = tool.function(**routing.parameters.get("params", {}))
-                        return {"response": result}
+            if tool_name == "get_doctors" and department_id:
+                db_response = await lookup_department_doctors(
+                    department_name, department_id
+                )
+                if db_response.error:
+                    return {"response": db_response.error}
+                return {"response": db_response.doctors}
+            if tool_name in TOOLS:
+                try:
+                    result = await TOOLS.execute(
+                        tool_name, **routing.parameters.get("params", {})
+                    )
+                except ValidationError as e:
+                    logger.error(f"Invalid arguments for tool {tool_name}: {e}")
+                    return {"response": f"Invalid parameters for {tool_name}."}
+                return {"response": result}
 
             return {"response": f"Tool {tool_name} not found."}
 
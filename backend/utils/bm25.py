@@ -0,0 +1,233 @@
+"""Local BM25 index over the conversation corpus.
+
+Postings are stored as a CSR matrix of precomputed BM25 term weights
+(term -> documents), so a query is a handful of slice-and-add operations
+over NumPy arrays. Document ids match the ingestion chunk ids, which lets
+lexical hits be fused with vector hits by id.
+
+Build from backend/:
+    python -m utils.bm25 --csv path/to/conversations.csv
+    python -m utils.bm25 --from-local-index data/vector_index
+"""
+
+import os
+import re
+import json
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.local_vector_store import top_k
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Common words that carry no lexical signal in patient-doctor conversations.
+STOPWORDS = frozenset(
+    """a an and are as at be but by do does for from has have hi hello i if in is
+    it its me my no not of on or so thanks thank that the their them there this
+    to was were what when which who will with you your""".split()
+)
+
+POSTINGS_FILE = "postings.npz"
+VOCAB_FILE = "vocab.json"
+DOCS_FILE = "docs.jsonl"
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        n_docs: int,
+        docs_path: Optional[str] = None,
+    ):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+        self.docs_path = docs_path
+        self._offsets: List[int] = []
+        self.ids: List[str] = []
+        if docs_path and os.path.exists(docs_path):
+            with open(docs_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    self.ids.append(json.loads(line)["id"])
+                    self._offsets.append(offset)
+                    offset += len(line)
+
+    @classmethod
+    def build(
+        cls, documents: Iterable[Document], path: str, k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        """Tokenize documents, write them and their BM25 postings under path."""
+        os.makedirs(path, exist_ok=True)
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs, lengths = [], [], [], []
+        with open(os.path.join(path, DOCS_FILE), "w") as f:
+            for row, document in enumerate(documents):
+                record = {
+                    "id": document.id,
+                    "text": document.page_content,
+                    "metadata": document.metadata,
+                }
+                f.write(json.dumps(record) + "\n")
+                counts = Counter(tokenize(document.page_content))
+                lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    rows.append(vocab.setdefault(term, len(vocab)))
+                    cols.append(row)
+                    tfs.append(count)
+
+        n_docs = len(lengths)
+        terms = np.asarray(rows, dtype=np.int64)
+        doc_ids = np.asarray(cols, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.float32)
+
+        df = np.bincount(terms, minlength=len(vocab)).astype(np.float32)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * lengths[doc_ids] / max(lengths.mean(), 1.0))
+        weights = (idf[terms] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+        order = np.argsort(terms, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=indptr[1:])
+        np.savez(
+            os.path.join(path, POSTINGS_FILE),
+            indptr=indptr,
+            doc_ids=doc_ids[order],
+            weights=weights[order],
+            n_docs=np.asarray(n_docs),
+        )
+        with open(os.path.join(path, VOCAB_FILE), "w") as f:
+            json.dump(vocab, f)
+        logger.info(
+            f"Built BM25 index at {path}: {n_docs} documents, {len(vocab)} terms"
+        )
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        postings = np.load(os.path.join(path, POSTINGS_FILE))
+        with open(os.path.join(path, VOCAB_FILE)) as f:
+            vocab = json.load(f)
+        return cls(
+            vocab,
+            postings["indptr"],
+            postings["doc_ids"],
+            postings["weights"],
+            int(postings["n_docs"]),
+            os.path.join(path, DOCS_FILE),
+        )
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k document rows and BM25 scores; rows with no matching term are dropped."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # A document appears at most once per term, so fancy-index add is safe.
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        rows, top = top_k(scores[np.newaxis, :], k)
+        keep = top[0] > 0
+        return rows[0][keep], top[0][keep]
+
+    def documents(self, rows: Iterable[int]) -> List[Document]:
+        documents = []
+        with open(self.docs_path, "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                record = json.loads(f.readline())
+                documents.append(
+                    Document(
+                        id=record["id"],
+                        page_content=record["text"],
+                        metadata=record["metadata"],
+                    )
+                )
+        return documents
+
+    def search_documents(self, query: str, k: int) -> List[Document]:
+        rows, _ = self.search(query, k)
+        return self.documents(rows.tolist())
+
+
+def csv_documents(csv_path: str) -> Iterable[Document]:
+    """Chunks with the same ids the ingestion command writes to the vector store."""
+    import pandas as pd
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from utils.ingest import rows_to_documents, split_documents
+    from utils.pineconeutils import (
+        PATIENT_COL,
+        DOCTOR_COL,
+        DESCRIPTION_COL,
+        BATCH_SIZE,
+        TOTAL_ROWS,
+        START_ROW,
+    )
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    reader = pd.read_csv(
+        csv_path,
+        usecols=[PATIENT_COL, DOCTOR_COL, DESCRIPTION_COL],
+        skiprows=range(1, START_ROW + 1),
+        nrows=TOTAL_ROWS - START_ROW,
+        chunksize=BATCH_SIZE,
+    )
+    source = os.path.basename(csv_path)
+    next_row = START_ROW
+    for frame in reader:
+        frame.index = range(next_row, next_row + len(frame))
+        next_row += len(frame)
+        frame = frame.dropna(subset=[DESCRIPTION_COL])
+        yield from split_documents(splitter, rows_to_documents(frame, source))
+
+
+def local_index_documents(index_path: str) -> Iterable[Document]:
+    with open(os.path.join(index_path, DOCS_FILE)) as f:
+        for line in f:
+            record = json.loads(line)
+            yield Document(
+                id=record["id"],
+                page_content=record["text"],
+                metadata=record["metadata"],
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local BM25 index.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Conversation CSV, chunked as in ingestion")
+    source.add_argument("--from-local-index", help="Local vector index directory")
+    parser.add_argument("--output", default="data/bm25_index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.csv:
+        documents = csv_documents(args.csv)
+    else:
+        documents = local_index_documents(args.from_local_index)
+    BM25Index.build(documents, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config.settings import settings
+from utils.db import get_db_connection
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+chat_history_rows_flushed = REGISTRY.counter(
+    "chat_history_rows_flushed_total", "General chat history rows written."
+)
+chat_history_flush_failures = REGISTRY.counter(
+    "chat_history_flush_failures_total", "Failed general chat history flushes."
+)
+chat_history_rows_rejected = REGISTRY.counter(
+    "chat_history_rows_rejected_total",
+    "General chat history rows dropped because the database rejected them.",
+)
+chat_history_flush_seconds = REGISTRY.histogram(
+    "chat_history_flush_seconds", "Duration of one general chat history flush."
+)
+chat_history_pending = REGISTRY.gauge(
+    "chat_history_pending_rows", "General chat history rows waiting to be written."
+)
+chat_history_reads = REGISTRY.counter(
+    "chat_history_reads_total",
+    "General chat history reads by source (memory, database).",
+    ["source"],
+)
+
+Row = Tuple[str, str, str, str, datetime]
+
+# Errors caused by the rows themselves (e.g. a deleted user's foreign key);
+# retrying the same rows cannot succeed.
+DATA_ERRORS = (psycopg2.IntegrityError, psycopg2.DataError)
+
+
+class ChatHistoryBuffer:
+    """Write-behind buffer for general_chat_history.
+
+    store() appends the row to a pending list and to the user's in-memory
+    ring of recent turns, and returns without touching the database. A
+    background thread writes pending rows with one multi-row INSERT when
+    `flush_rows` are queued or `flush_seconds` have passed, and close()
+    flushes whatever is left. When the database rejects the batch's data,
+    the batch is bisected so only the offending rows are dropped. Other
+    failures (connection lost, database down) keep the rows for the next
+    attempt, up to `max_pending`; beyond that the oldest are dropped.
+
+    recent() answers from the ring once it has been loaded from the database
+    for that user, so a user always sees their own latest turns even before
+    they are flushed. Rings are per process: with several workers, a user's
+    turns are only guaranteed visible to the worker that served them.
+    """
+
+    def __init__(
+        self,
+        flush_rows: int = 100,
+        flush_seconds: float = 1.0,
+        ring_size: int = 10,
+        max_users: int = 10000,
+        max_pending: int = 100000,
+    ):
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.ring_size = ring_size
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self._pending: List[Row] = []
+        # user_id -> recent rows, oldest first; LRU over users.
+        self._rings: "OrderedDict[str, Deque[Row]]" = OrderedDict()
+        self._loaded: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="chat-history-writer", daemon=True
+            )
+            self._worker.start()
+
+    def _ring(self, user_id: str) -> Deque[Row]:
+        ring = self._rings.get(user_id)
+        if ring is None:
+            ring = self._rings[user_id] = deque(maxlen=self.ring_size)
+            while len(self._rings) > self.max_users:
+                evicted, _ = self._rings.popitem(last=False)
+                self._loaded.pop(evicted, None)
+        self._rings.move_to_end(user_id)
+        return ring
+
+    def store(self, user_id: str, query: str, response: str):
+        row = (str(uuid.uuid4()), user_id, query, response, datetime.utcnow())
+        with self._lock:
+            self._ensure_worker()
+            self._pending.append(row)
+            self._ring(user_id).append(row)
+            chat_history_pending.set(len(self._pending))
+            if len(self._pending) >= self.flush_rows:
+                self._wakeup.set()
+
+    def recent(self, user_id: str, limit: int = 2) -> List[dict]:
+        with self._lock:
+            loaded = self._loaded.get(user_id, False)
+            if loaded:
+                rows = list(self._ring(user_id))
+        if not loaded:
+            rows = self._load(user_id)
+            chat_history_reads.inc(source="database")
+        else:
+            chat_history_reads.inc(source="memory")
+        return [
+            {"query": row[2], "response": row[3], "created_at": row[4]}
+            for row in reversed(rows[-limit:])
+        ]
+
+    def _load(self, user_id: str) -> List[Row]:
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT id, user_id, query, response, created_at
+            FROM general_chat_history
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+            """,
+            (user_id, self.ring_size),
+        )
+        stored = [tuple(row) for row in c.fetchall()]
+        conn.close()
+        with self._lock:
+            ring = self._ring(user_id)
+            # Rows stored meanwhile are in the ring but maybe not yet in the
+            # database; merge by id.
+            merged = {row[0]: row for row in stored}
+            merged.update((row[0], row) for row in ring)
+            ring.clear()
+            ring.extend(sorted(merged.values(), key=lambda row: row[4]))
+            self._loaded[user_id] = True
+            return list(ring)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def _insert(self, conn, rows: List[Row]):
+        c = conn.cursor()
+        execute_values(
+            c,
+            """
+            INSERT INTO general_chat_history (id, user_id, query, response, created_at)
+            VALUES %s
+            ON CONFLICT (id) DO NOTHING
+            """,
+            rows,
+            page_size=1000,
+        )
+        conn.commit()
+
+    def _insert_valid(self, conn, rows: List[Row]) -> int:
+        """Insert rows, bisecting around rows the database rejects.
+
+        Returns the number of rejected rows, which are dropped. Other errors
+        propagate; rows already committed are skipped on retry by id.
+        """
+        try:
+            self._insert(conn, rows)
+            return 0
+        except DATA_ERRORS as e:
+            conn.rollback()
+            if len(rows) == 1:
+                chat_history_rows_rejected.inc()
+                logger.error(
+                    f"Dropped chat history row {rows[0][0]} of user {rows[0][1]}: {e}"
+                )
+                return 1
+        middle = len(rows) // 2
+        return self._insert_valid(conn, rows[:middle]) + self._insert_valid(
+            conn, rows[middle:]
+        )
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            started = time.perf_counter()
+            try:
+                conn = get_db_connection()
+                try:
+                    rejected = self._insert_valid(conn, rows)
+                finally:
+                    conn.close()
+            except Exception as e:
+                chat_history_flush_failures.inc()
+                with self._lock:
+                    self._pending = rows + self._pending
+                    dropped = len(self._pending) - self.max_pending
+                    if dropped > 0:
+                        del self._pending[:dropped]
+                        logger.error(
+                            f"Dropped {dropped} chat history rows: buffer full"
+                        )
+                    chat_history_pending.set(len(self._pending))
+                logger.error(f"Failed to flush {len(rows)} chat history rows: {e}")
+                return
+            chat_history_flush_seconds.observe(time.perf_counter() - started)
+            chat_history_rows_flushed.inc(len(rows) - rejected)
+            with self._lock:
+                chat_history_pending.set(len(self._pending))
+            logger.debug(f"Flushed {len(rows)} chat history rows")
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout=self.flush_seconds + 5)
+        self.flush()
+
+
+chat_history = ChatHistoryBuffer(
+    flush_rows=settings.CHAT_HISTORY_FLUSH_ROWS,
+    flush_seconds=settings.CHAT_HISTORY_FLUSH_SECONDS,
+    ring_size=settings.CHAT_HISTORY_RING_SIZE,
+)
@@ -0,0 +1,116 @@
+import re
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config.settings import settings
+from utils.db import get_db_connection
+from utils.department_catalog import department_catalog
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# In-process LRU in front of the condition_department_map table:
+# normalized condition -> (department_id, department_name)
+_cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+condition_cache_lookups = REGISTRY.counter(
+    "condition_map_cache_lookups_total",
+    "Condition -> department cache lookups by result (hit, miss).",
+    ["result"],
+)
+
+
+def normalize_condition(condition: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace ("Acne!" -> "acne")."""
+    return " ".join(re.sub(r"[^\w\s-]", " ", condition.lower()).split())
+
+
+def _cache_put(key: str, value: Tuple[str, str]):
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > settings.CONDITION_MAP_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def lookup_condition_department(condition: str) -> Optional[Tuple[str, str]]:
+    """Return (department_id, department_name) for a previously mapped condition."""
+    key = normalize_condition(condition)
+    if not key:
+        return None
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached:
+            _cache.move_to_end(key)
+            condition_cache_lookups.inc(result="hit")
+            return cached
+    condition_cache_lookups.inc(result="miss")
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        "SELECT department_id FROM condition_department_map WHERE condition = %s",
+        (key,),
+    )
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    department_name = department_catalog.name(row[0])
+    if not department_name:
+        return None
+    value = (str(row[0]), department_name)
+    _cache_put(key, value)
+    return value
+
+
+def remember_condition_department(
+    condition: str, department_id: str, department_name: str
+):
+    """Persist an LLM-inferred condition -> department mapping."""
+    key = normalize_condition(condition)
+    if not key:
+        return
+    try:
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(
+            """
+            INSERT INTO condition_department_map (condition, department_id, created_at)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (condition) DO UPDATE
+            SET department_id = EXCLUDED.department_id,
+                created_at = EXCLUDED.created_at
+            """,
+            (key, department_id, datetime.utcnow()),
+        )
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Failed to store condition mapping '{key}': {e}")
+        return
+    _cache_put(key, (department_id, department_name))
+    logger.info(f"Stored condition mapping: '{key}' -> {department_name}")
+
+
+def invalidate_condition_map(persistent: bool = True):
+    """Drop cached mappings after departments change.
+
+    A new or renamed department may be a better match for existing conditions,
+    so creation/rename clears the table too; deletes only need the LRU cleared
+    because the foreign key already cascades.
+    """
+    with _cache_lock:
+        _cache.clear()
+    if not persistent:
+        return
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("DELETE FROM condition_department_map")
+    conn.commit()
+    conn.close()
+    logger.info("Condition -> department mappings invalidated")
@@ -1,20 +1,106 @@
 import psycopg2
+import psycopg2.extensions
 import logging
+import re
+import time
 from config.settings import settings
+from utils.metrics import REGISTRY
+from utils.slow_queries import slow_query_log
+from utils.tracing import child_span
 import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+db_query_seconds = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by statement name.",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+db_query_errors = REGISTRY.counter(
+    "db_query_errors_total", "Database statements that raised.", ["statement"]
+)
+db_connections_opened = REGISTRY.counter(
+    "db_connections_opened_total", "Database connections opened."
+)
+
+# "/* name: claim_outbox */ UPDATE ..." names a statement explicitly;
+# otherwise it is named after its verb and first table, e.g. select_users.
+_NAME_HINT = re.compile(r"^\s*/\*\s*name:\s*([\w.-]+)\s*\*/")
+_VERB = re.compile(r"^\s*(?:/\*.*?\*/\s*)?(\w+)", re.S)
+_TABLE = {
+    "select": re.compile(r"\bFROM\s+([\w.]+)", re.I),
+    "delete": re.compile(r"\bFROM\s+([\w.]+)", re.I),
+    "insert": re.compile(r"\bINTO\s+([\w.]+)", re.I),
+    "update": re.compile(r"^\s*(?:/\*.*?\*/\s*)?UPDATE\s+([\w.]+)", re.I | re.S),
+    "create": re.compile(
+        r"\b(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)", re.I
+    ),
+}
+_statement_names = {}
+
+
+def statement_name(query: str) -> str:
+    """Low-cardinality metric label for a SQL statement."""
+    name = _statement_names.get(query)
+    if name is not None:
+        return name
+    hint = _NAME_HINT.match(query)
+    if hint:
+        name = hint.group(1)
+    else:
+        verb = _VERB.match(query)
+        verb = verb.group(1).lower() if verb else "unknown"
+        table = _TABLE.get(verb)
+        table = table.search(query) if table else None
+        name = f"{verb}_{table.group(1).lower()}" if table else verb
+    # Statements are literals in the code, so this stays small; the bound
+    # only guards against SQL built with inlined values.
+    if len(_statement_names) >= 4096:
+        _statement_names.clear()
+    _statement_names[query] = name
+    return name
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Cursor that records each statement's latency in db_query_duration_seconds.
+
+    Statements slower than SLOW_QUERY_THRESHOLD_MS also go to the slow-query
+    log (utils.slow_queries).
+    """
+
+    def _timed(self, method, query, args, many=False):
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        elif not isinstance(query, str):
+            query = query.as_string(self)
+        name = statement_name(query)
+        with child_span("db.query", statement=name) as query_span:
+            started = time.perf_counter()
+            try:
+                result = method(query, args)
+            except Exception:
+                db_query_errors.inc(statement=name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                db_query_seconds.observe(elapsed, statement=name)
+            query_span.set_attribute("rows", self.rowcount)
+            if slow_query_log.enabled and elapsed >= slow_query_log.threshold:
+                slow_query_log.record(name, query, args, elapsed, self.rowcount, many)
+            return result
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        # A list, so the slow-query log can still see the rows afterwards.
+        return self._timed(super().executemany, query, list(vars_list), many=True)
+
 
 def init_db():
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     conn.set_session(autocommit=True)
     c = conn.cursor()
 
@@ -168,18 +254,117 @@ def init_db():
         """
     )
 
+    # Condition -> department mapping learned from the database knowledge agent
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS condition_department_map (
+            condition TEXT PRIMARY KEY,
+            department_id UUID NOT NULL,
+            created_at TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # Asynchronous /api/medical-query report analysis (utils.report_jobs)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            query TEXT NOT NULL,
+            filename TEXT,
+            document BYTEA,
+            report_text TEXT,
+            structured_report TEXT,
+            response TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS report_jobs_ready_idx
+        ON report_jobs (created_at) WHERE status IN ('queued', 'running')
+        """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS report_jobs_user_idx
+        ON report_jobs (user_id, created_at)
+        """
+    )
+
+    # Next-day reminder lookup (utils.reminders)
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS appointments_reminder_idx
+        ON appointments (appointment_date, hospital_id) WHERE status <> 'cancelled'
+        """
+    )
+
+    # Outgoing email, written in the same transaction as the change that
+    # triggers it and delivered by utils.mail_sender
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id UUID PRIMARY KEY,
+            kind TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL,
+            sent_at TIMESTAMP
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS email_outbox_pending_idx
+        ON email_outbox (next_attempt_at) WHERE status = 'pending'
+        """
+    )
+
+    # Statements over SLOW_QUERY_THRESHOLD_MS (utils.slow_queries)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS slow_queries (
+            id UUID PRIMARY KEY,
+            statement TEXT NOT NULL,
+            normalized_sql TEXT NOT NULL,
+            params_shape TEXT,
+            rows INTEGER,
+            duration_ms DOUBLE PRECISION NOT NULL,
+            plan TEXT,
+            created_at TIMESTAMP NOT NULL
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS slow_queries_created_idx
+        ON slow_queries (created_at)
+        """
+    )
+
     conn.close()
     logger.info("Database initialized successfully")
 
 
 def insert_dummy_medical_history():
-    conn = psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
+    conn = get_db_connection()
     c = conn.cursor()
     user_id = "0d3074c3-12e5-4517-b661-08c7e390296e"
     dummy_records = [
@@ -233,14 +418,17 @@ def insert_dummy_medical_history():
 
 
 def get_db_connection():
-    """Create a new database connection."""
-    return psycopg2.connect(
+    """Create a new database connection with instrumented cursors."""
+    conn = psycopg2.connect(
         dbname=settings.DB_NAME,
         user=settings.DB_USER,
         password=settings.DB_PASSWORD,
         host=settings.DB_HOST,
         port=settings.DB_PORT,
+        cursor_factory=InstrumentedCursor,
     )
+    db_connections_opened.inc()
+    return conn
 
 
 async def get_user(username: str):
@@ -0,0 +1,186 @@
+import select
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from config.settings import settings
+from utils.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "department_catalog"
+
+
+class DepartmentCatalog:
+    """In-process copy of the departments table.
+
+    Loaded lazily on first use and kept current by write-through updates from
+    this worker plus (optionally) Postgres NOTIFY messages from other workers.
+    A lookup miss reloads the catalog, at most once per
+    DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS, so departments created elsewhere
+    are found without the listener.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._names: List[str] = []
+        self._id_by_name: Dict[str, str] = {}
+        self._departments: Dict[str, Dict[str, str]] = {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute("SELECT id, hospital_id, name FROM departments")
+        rows = c.fetchall()
+        conn.close()
+
+        names, id_by_name, departments = [], {}, {}
+        for department_id, hospital_id, name in rows:
+            department_id, hospital_id = str(department_id), str(hospital_id)
+            names.append(name)
+            id_by_name.setdefault(name.lower(), department_id)
+            departments[department_id] = {"name": name, "hospital_id": hospital_id}
+
+        with self._lock:
+            self._names = names
+            self._id_by_name = id_by_name
+            self._departments = departments
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+        logger.info(f"Department catalog loaded: {len(departments)} departments")
+
+    def _reload_after_miss(self) -> bool:
+        """Reload unless the catalog is more recent than the miss interval."""
+        with self._lock:
+            age = time.monotonic() - self._loaded_at
+            if age < settings.DEPARTMENT_CATALOG_MISS_RELOAD_SECONDS:
+                return False
+            # Claim the reload so concurrent misses do not all hit the database.
+            self._loaded_at = time.monotonic()
+        self.load()
+        return True
+
+    def _department(self, department_id: str) -> Optional[Dict[str, str]]:
+        self._ensure_loaded()
+        department = self._departments.get(str(department_id))
+        if department is None and self._reload_after_miss():
+            department = self._departments.get(str(department_id))
+        return department
+
+    def invalidate(self):
+        """Force a reload on next access."""
+        with self._lock:
+            self._loaded = False
+
+    def names(self) -> List[str]:
+        self._ensure_loaded()
+        return list(self._names)
+
+    def id_by_name(self, name: str) -> Optional[str]:
+        self._ensure_loaded()
+        department_id = self._id_by_name.get(name.lower())
+        if department_id is None and self._reload_after_miss():
+            department_id = self._id_by_name.get(name.lower())
+        return department_id
+
+    def name(self, department_id: str) -> Optional[str]:
+        department = self._department(department_id)
+        return department["name"] if department else None
+
+    def hospital_id(self, department_id: str) -> Optional[str]:
+        department = self._department(department_id)
+        return department["hospital_id"] if department else None
+
+    def add(self, department_id: str, hospital_id: str, name: str):
+        """Write-through after a department is created."""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._names.append(name)
+            self._id_by_name.setdefault(name.lower(), department_id)
+            self._departments[department_id] = {
+                "name": name,
+                "hospital_id": hospital_id,
+            }
+
+    def remove_hospital(self, hospital_id: str):
+        """Write-through after a hospital (and its departments) is deleted."""
+        with self._lock:
+            if not self._loaded:
+                return
+            removed = {
+                department_id
+                for department_id, department in self._departments.items()
+                if department["hospital_id"] == hospital_id
+            }
+            if not removed:
+                return
+            self._departments = {
+                department_id: department
+                for department_id, department in self._departments.items()
+                if department_id not in removed
+            }
+            self._names = [d["name"] for d in self._departments.values()]
+            self._id_by_name = {}
+            for department_id, department in self._departments.items():
+                self._id_by_name.setdefault(department["name"].lower(), department_id)
+
+
+department_catalog = DepartmentCatalog()
+
+
+def notify_department_change():
+    """Tell other workers to reload their catalog."""
+    if not settings.DEPARTMENT_CATALOG_LISTEN:
+        return
+    try:
+        conn = get_db_connection()
+        conn.set_session(autocommit=True)
+        conn.cursor().execute(f"NOTIFY {NOTIFY_CHANNEL}")
+        conn.close()
+    except psycopg2.Error as e:
+        logger.error(f"Failed to notify department change: {e}")
+
+
+def _listen_for_changes():
+    from utils.condition_map import invalidate_condition_map
+
+    while True:
+        try:
+            conn = get_db_connection()
+            conn.set_session(autocommit=True)
+            conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+            logger.info(f"Listening for department changes on '{NOTIFY_CHANNEL}'")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    department_catalog.invalidate()
+                    invalidate_condition_map(persistent=False)
+                    logger.info("Department catalog invalidated by NOTIFY")
+        except Exception as e:
+            logger.error(f"Department change listener error: {e}; reconnecting")
+            # Changes may have been missed while disconnected.
+            department_catalog.invalidate()
+            time.sleep(5)
+
+
+def start_department_listener():
+    """Start the cross-worker invalidation listener if enabled."""
+    if not settings.DEPARTMENT_CATALOG_LISTEN:
+        return
+    thread = threading.Thread(
+        target=_listen_for_changes, name="department-catalog-listener", daemon=True
+    )
+    thread.start()
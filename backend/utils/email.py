@@ -1,32 +1,41 @@
+import time
+import uuid
 import smtplib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import logging
+from typing import List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
 from config.settings import settings
+from utils.metrics import REGISTRY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+smtp_connections_opened = REGISTRY.counter(
+    "smtp_connections_opened_total", "SMTP connections opened (connect, TLS, login)."
+)
+smtp_connections_in_use = REGISTRY.gauge(
+    "smtp_connections_in_use", "Pooled SMTP connections currently lent out."
+)
 
-def send_confirmation_email(
-    recipient_email: str,
+
+def render_confirmation_email(
     patient_username: str,
     doctor_username: str,
     department_name: str,
     appointment_date: str,
     start_time: str,
     hospital_id: str,
-):
-    try:
-        # Create email message
-        msg = MIMEMultipart()
-        msg["From"] = settings.EMAIL_SENDER
-        msg["To"] = recipient_email
-        msg["Subject"] = "Appointment Confirmation"
-
-        # Email body
-        body = f"""
+) -> Tuple[str, str]:
+    """Subject and plain-text body of an appointment confirmation."""
+    body = f"""
         Dear {patient_username},
 
         Your appointment has been successfully booked!
@@ -43,14 +52,227 @@ def send_confirmation_email(
         Best regards,
         Your Healthcare Team
         """
-        msg.attach(MIMEText(body, "plain"))
+    return "Appointment Confirmation", body
+
+
+def build_message(recipient: str, subject: str, body: str) -> str:
+    msg = MIMEMultipart()
+    msg["From"] = settings.EMAIL_SENDER
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg.as_string()
+
+
+# --- Outbox ---
+def enqueue_emails(cursor, emails: List[dict]) -> int:
+    """Queue emails in the caller's transaction; returns how many were new.
+
+    Each email is a dict with kind, recipient, subject, body and optionally
+    dedupe_key. A row whose dedupe_key is already in the outbox is skipped,
+    so re-running whatever produced it never sends twice. Nothing is sent
+    until the transaction commits and utils.mail_sender picks the rows up.
+    """
+    if not emails:
+        return 0
+    now = datetime.utcnow()
+    rows = [
+        (
+            str(uuid.uuid4()),
+            email["kind"],
+            email["recipient"],
+            email["subject"],
+            email["body"],
+            email.get("dedupe_key"),
+            now,
+            now,
+        )
+        for email in emails
+    ]
+    inserted = execute_values(
+        cursor,
+        """
+        INSERT INTO email_outbox (
+            id, kind, recipient, subject, body, dedupe_key, next_attempt_at, created_at
+        ) VALUES %s
+        ON CONFLICT (dedupe_key) DO NOTHING
+        RETURNING id
+        """,
+        rows,
+        page_size=1000,
+        fetch=True,
+    )
+    return len(inserted)
+
+
+def enqueue_confirmation_email(
+    cursor,
+    appointment_id: str,
+    recipient_email: str,
+    patient_username: str,
+    doctor_username: str,
+    department_name: str,
+    appointment_date: str,
+    start_time: str,
+    hospital_id: str,
+):
+    subject, body = render_confirmation_email(
+        patient_username,
+        doctor_username,
+        department_name,
+        appointment_date,
+        start_time,
+        hospital_id,
+    )
+    enqueue_emails(
+        cursor,
+        [
+            {
+                "kind": "confirmation",
+                "recipient": recipient_email,
+                "subject": subject,
+                "body": body,
+                "dedupe_key": f"confirmation:{appointment_id}",
+            }
+        ],
+    )
+    logger.debug(f"Queued confirmation email to {recipient_email}")
+
+
+# --- SMTP connection pool ---
+def session_broken(error: Exception) -> bool:
+    """A refused recipient leaves the session usable; a dropped connection or a non-SMTP error does not."""
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(
+        error, smtplib.SMTPException
+    )
+
+
+class _PooledConnection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPPool:
+    """Reuses authenticated SMTP sessions across messages.
+
+    At most `size` connections are open at a time. A connection idle for
+    more than `max_idle` seconds is checked with NOOP before reuse, and one
+    is retired after `max_messages` messages, since many servers cap the
+    messages per session. A connection whose session broke is never
+    returned to the pool. STARTTLS and login are configurable so the pool can talk to a
+    plain local SMTP sink in development.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        login: bool = True,
+        size: int = 2,
+        max_idle: float = 30.0,
+        max_messages: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.login = login
+        self.size = size
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle: List[_PooledConnection] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _open(self) -> _PooledConnection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.login:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        smtp_connections_opened.inc()
+        return _PooledConnection(smtp)
+
+    def _discard(self, connection: _PooledConnection):
+        try:
+            connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    def _take(self) -> _PooledConnection:
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._open()
+            if time.monotonic() - connection.last_used <= self.max_idle:
+                return connection
+            try:
+                if connection.smtp.noop()[0] == 250:
+                    return connection
+            except OSError:  # includes smtplib.SMTPException
+                pass
+            self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """Lend a connection: `with pool.connection() as conn: send_message(conn, ...)`."""
+        self._slots.acquire()
+        smtp_connections_in_use.inc()
+        try:
+            connection = self._take()
+            healthy = True
+            try:
+                yield connection
+            except Exception as e:
+                healthy = not session_broken(e)
+                raise
+            finally:
+                connection.last_used = time.monotonic()
+                if healthy and connection.messages < self.max_messages:
+                    with self._lock:
+                        self._idle.append(connection)
+                else:
+                    self._discard(connection)
+        finally:
+            smtp_connections_in_use.dec()
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
+
+
+def send_message(
+    connection: _PooledConnection, recipient: str, subject: str, body: str
+):
+    connection.smtp.sendmail(
+        settings.EMAIL_SENDER, recipient, build_message(recipient, subject, body)
+    )
+    connection.messages += 1
 
-        # Connect to SMTP server
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
-            server.sendmail(settings.EMAIL_SENDER, recipient_email, msg.as_string())
 
-        logger.info(f"Confirmation email sent to {recipient_email}")
-    except Exception as e:
-        logger.error(f"Failed to send email to {recipient_email}: {str(e)}")
+def create_smtp_pool() -> SMTPPool:
+    return SMTPPool(
+        settings.SMTP_SERVER,
+        settings.SMTP_PORT,
+        username=settings.EMAIL_SENDER,
+        password=settings.EMAIL_PASSWORD,
+        starttls=settings.SMTP_STARTTLS,
+        login=settings.SMTP_LOGIN,
+        size=settings.SMTP_POOL_SIZE,
+    )
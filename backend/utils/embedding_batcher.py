@@ -0,0 +1,124 @@
+import time
+import queue
+import inspect
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+embedding_batch_size = REGISTRY.histogram(
+    "embedding_batch_texts",
+    "Distinct query texts per batched upstream embedding call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+embedding_batch_wait = REGISTRY.histogram(
+    "embedding_batch_wait_seconds",
+    "Time a query embedding waited in the batching window before dispatch.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+
+class BatchingEmbeddings(Embeddings):
+    """Coalesces concurrent embed_query calls into batched upstream requests.
+
+    The first query to arrive opens a window of `window_ms`; queries arriving
+    within it (up to `max_batch`) are sent as one embed_documents call and each
+    caller's future is resolved with its own vector. Identical texts in a
+    batch are embedded once. Up to `max_in_flight` batches are outstanding at
+    a time, so a slow upstream call does not hold back the next window.
+
+    Gemini embeds queries with the "retrieval_query" task type; when the
+    provider's embed_documents accepts `task_type` the batch is sent with it,
+    otherwise each text falls back to its own embed_query call.
+    embed_documents is passed straight through: ingestion already batches.
+    """
+
+    QUERY_TASK_TYPE = "retrieval_query"
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        window_ms: float = 5.0,
+        max_batch: int = 32,
+        max_in_flight: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="embed-batch"
+        )
+        self._worker = None
+        self._lock = threading.Lock()
+        try:
+            parameters = inspect.signature(embeddings.embed_documents).parameters
+            self._supports_task_type = "task_type" in parameters
+        except (TypeError, ValueError):
+            self._supports_task_type = False
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._collect, name="embed-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._dispatch, batch)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1:
+            return [self.embeddings.embed_query(texts[0])]
+        if self._supports_task_type:
+            return self.embeddings.embed_documents(
+                texts, task_type=self.QUERY_TASK_TYPE
+            )
+        return [self.embeddings.embed_query(text) for text in texts]
+
+    def _dispatch(self, batch: List[Tuple[str, Future, float]]):
+        now = time.monotonic()
+        for _, _, enqueued in batch:
+            embedding_batch_wait.observe(now - enqueued)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        embedding_batch_size.observe(len(texts))
+        try:
+            vectors = dict(zip(texts, self._embed_batch(texts)))
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(texts)} queries failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            future.set_result(vectors[text])
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.embeddings.embed_query(text)
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.monotonic()))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
@@ -0,0 +1,134 @@
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+embedding_cache_lookups = REGISTRY.counter(
+    "embedding_cache_lookups_total",
+    "Embedding cache lookups by result (memory_hit, disk_hit, miss).",
+    ["result"],
+)
+embedding_upstream_texts = REGISTRY.counter(
+    "embedding_upstream_texts_total", "Texts sent to the embedding provider."
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """Two-tier cache in front of an embeddings provider.
+
+    Keys are (model, task, sha256(text)): Gemini embeds queries and documents
+    with different task types, so the same text has two distinct vectors.
+    Hits are served from an in-process LRU, then from a SQLite table; only
+    the remaining misses are sent upstream, in a single batch.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        path: Optional[str] = None,
+        max_memory_items: int = 10000,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, task: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{task}:{digest}"
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            embedding_cache_lookups.inc(len(found), result="memory_hit")
+
+            missing = [key for key in keys if key not in found]
+            if missing and self._db is not None:
+                # Stay under SQLite's bound-parameter limit.
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        embedding_cache_lookups.inc(result="disk_hit")
+            embedding_cache_lookups.inc(len(set(keys) - set(found)), result="miss")
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [
+                        (key, np.asarray(vector, dtype=np.float32).tobytes())
+                        for key, vector in items.items()
+                    ],
+                )
+                self._db.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(keys)
+
+        # Send each distinct missing text upstream once.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            embedding_upstream_texts.inc(len(missing))
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        embedding_upstream_texts.inc()
+        vector = self.embeddings.embed_query(text)
+        self._store({key: vector})
+        return vector
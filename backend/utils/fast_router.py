@@ -0,0 +1,96 @@
+import re
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Deterministic pre-router for queries whose intent is unambiguous. Anything
+# that does not fully match one of these patterns falls through to the LLM.
+_POLITE_PREFIX = r"(?:please\s+|can\s+you\s+|could\s+you\s+)?"
+_LIST_VERB = r"(?:list|show|get|display|give)(?:\s+me)?"
+_QUALIFIERS = r"(?:\s+(?:all|the|available|registered))*"
+
+HOSPITAL_LIST_PATTERN = re.compile(
+    rf"^{_POLITE_PREFIX}(?:{_LIST_VERB}{_QUALIFIERS}\s+hospitals"
+    rf"|(?:which|what)\s+hospitals\s+(?:are\s+)?(?:available|there))"
+    r"\s*[?.!]*$",
+    re.IGNORECASE,
+)
+
+DOCTOR_LIST_PATTERNS = [
+    # "List doctors in Cardiology", "Show available doctors from the dermatology department"
+    re.compile(
+        rf"^{_POLITE_PREFIX}{_LIST_VERB}{_QUALIFIERS}\s+doctors\s+(?:in|from|at|of)"
+        r"(?:\s+the)?\s+(?P<department>.+?)(?:\s+department)?\s*[?.!]*$",
+        re.IGNORECASE,
+    ),
+    # "List cardiology doctors", "Show all neurology department doctors"
+    re.compile(
+        rf"^{_POLITE_PREFIX}{_LIST_VERB}{_QUALIFIERS}\s+(?P<department>.+?)"
+        r"(?:\s+department)?\s+doctors\s*[?.!]*$",
+        re.IGNORECASE,
+    ),
+]
+
+BOOKING_PATTERN = re.compile(
+    r"^book\s+(?:an?\s+)?appointment\s+with\s+(?:dr\.?\s+)?(?P<doctor_username>[\w.\-]+)"
+    r"\s+on\s+(?:[a-z]+,?\s+)?(?P<appointment_date>\d{4}-\d{2}-\d{2})"
+    r"\s+from\s+(?P<start_time>\d{2}:\d{2})\s+to\s+(?P<end_time>\d{2}:\d{2})\s*[.!]*$",
+    re.IGNORECASE,
+)
+
+
+def _match_department(candidate: str, departments: List[str]) -> Optional[str]:
+    """Return the canonical department name matching the user's wording, if any."""
+    candidate = candidate.strip().lower()
+    if not candidate:
+        return None
+    for name in departments:
+        lowered = name.lower()
+        short = re.sub(r"^department\s+of\s+", "", lowered)
+        if candidate in (lowered, short, f"department of {short}"):
+            return name
+    return None
+
+
+def fast_route(
+    query: str, get_departments: Callable[[], List[str]]
+) -> Optional[Dict]:
+    """Route a query without the LLM when its intent is unambiguous.
+
+    Returns a dict with "action" and "parameters" in the same shape the LLM
+    router produces, or None if the query needs the LLM. `get_departments` is
+    only called for doctor-listing queries, so hospital and booking queries
+    never touch the database.
+    """
+    text = " ".join(query.split())
+
+    if HOSPITAL_LIST_PATTERN.match(text):
+        return {"action": "db_query", "parameters": {"tool": "get_hospitals"}}
+
+    booking = BOOKING_PATTERN.match(text)
+    if booking:
+        parameters = {"tool": "book_appointment"}
+        parameters.update(booking.groupdict())
+        return {"action": "db_query", "parameters": parameters}
+
+    for pattern in DOCTOR_LIST_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        department_name = _match_department(
+            match.group("department"), get_departments()
+        )
+        if department_name:
+            return {
+                "action": "db_query",
+                "parameters": {
+                    "tool": "get_doctors",
+                    "department_name": department_name,
+                },
+            }
+        # The department wording may be a condition ("doctors for acne"),
+        # which needs the LLM to infer a department.
+        return None
+
+    return None
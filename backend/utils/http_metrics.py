@@ -0,0 +1,66 @@
+import time
+
+from starlette.routing import Match
+
+from utils.metrics import REGISTRY
+
+http_request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+http_requests_in_flight = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served by this process.",
+    ["method", "route"],
+)
+
+
+def route_template(scope) -> str:
+    """Path template of the route serving this request, or "unmatched"."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight requests per route.
+
+    Requests are labelled with the matched route's path template
+    (/api/appointments/{appointment_id}), not the raw path, so the label
+    set stays bounded; unmatched paths share the "unmatched" label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method, route=route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method=method, route=route)
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=method,
+                route=route,
+                status=str(status),
+            )
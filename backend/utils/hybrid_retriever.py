@@ -0,0 +1,76 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+
+def document_key(document: Document) -> str:
+    return document.id or document.page_content
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], rrf_k: int = 60
+) -> List[Document]:
+    """Merge ranked lists by summing 1 / (rrf_k + rank) per document."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs with a small cross-encoder on CPU.
+
+    Needs the optional sentence-transformers package; the model is loaded on
+    first use.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        if not documents:
+            return documents
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            self._model = CrossEncoder(self.model_name, device="cpu")
+            logger.info(f"Loaded reranker model {self.model_name}")
+        scores = self._model.predict([(query, d.page_content) for d in documents])
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in order]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector retrieval fused with reciprocal rank fusion.
+
+    Both retrievers fetch `candidates` documents; the fused list is
+    optionally reranked and only the best `k` are returned, so the prompt
+    sent to the LLM is the same size as with plain similarity search.
+    """
+
+    vector_store: Any
+    bm25: Any
+    k: int = 3
+    candidates: int = 20
+    rrf_k: int = 60
+    reranker: Optional[Any] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        lexical = self.bm25.search_documents(query, self.candidates)
+        semantic = self.vector_store.similarity_search(query, k=self.candidates)
+        fused = reciprocal_rank_fusion([semantic, lexical], self.rrf_k)
+        if self.reranker is not None:
+            fused = self.reranker.rerank(query, fused[: self.candidates])
+        return fused[: self.k]
@@ -0,0 +1,264 @@
+"""Stream the patient-doctor conversation CSV into the RAG vector store.
+
+Reads the CSV in BATCH_SIZE-row chunks, turns each row into a Document,
+splits it, embeds the chunks in SUB_BATCH_SIZE batches on a bounded pool
+with retry/backoff, and upserts them in parallel. Progress is checkpointed
+after every fully upserted batch, so a rerun resumes where the last one
+stopped. Chunk ids are derived from the CSV row, which makes re-running a
+partially written batch idempotent.
+
+Run from backend/:  python -m utils.ingest --csv path/to/conversations.csv
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pinecone import Pinecone
+
+from config.settings import settings
+from utils.local_vector_store import LocalVectorStore
+from utils.pineconeutils import (
+    PATIENT_COL,
+    DOCTOR_COL,
+    DESCRIPTION_COL,
+    PINECONE_INDEX_NAME,
+    BATCH_SIZE,
+    SUB_BATCH_SIZE,
+    TOTAL_ROWS,
+    START_ROW,
+    create_embeddings,
+    create_vector_store,
+)
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 100
+
+
+def with_retries(function: Callable, *args, attempts: int = 5, base_delay: float = 1.0):
+    """Call function, retrying with exponential backoff and jitter."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return function(*args)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1) * (0.5 + random.random())
+            logger.warning(
+                f"{getattr(function, '__name__', 'call')} failed ({e}); "
+                f"retry {attempt}/{attempts - 1} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def load_checkpoint(path: str, csv_path: str) -> int:
+    if not os.path.exists(path):
+        return START_ROW
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("csv") != os.path.abspath(csv_path):
+        logger.warning(f"Checkpoint {path} is for {checkpoint.get('csv')}; ignoring it")
+        return START_ROW
+    return checkpoint["next_row"]
+
+
+def save_checkpoint(path: str, csv_path: str, next_row: int):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(
+            {
+                "csv": os.path.abspath(csv_path),
+                "next_row": next_row,
+                "updated_at": time.time(),
+            },
+            f,
+        )
+    os.replace(tmp, path)
+
+
+def rows_to_documents(chunk: pd.DataFrame, source: str) -> List[Document]:
+    documents = []
+    for row, record in chunk.iterrows():
+        content = (
+            f"Description: {record[DESCRIPTION_COL]}\n"
+            f"Patient: {record[PATIENT_COL]}\n"
+            f"Doctor: {record[DOCTOR_COL]}"
+        )
+        documents.append(
+            Document(page_content=content, metadata={"row": int(row), "source": source})
+        )
+    return documents
+
+
+def split_documents(
+    splitter: RecursiveCharacterTextSplitter, documents: List[Document]
+) -> List[Document]:
+    chunks = []
+    for document in documents:
+        for i, chunk in enumerate(splitter.split_documents([document])):
+            chunk.id = f"conv-{document.metadata['row']}-{i}"
+            chunks.append(chunk)
+    return chunks
+
+
+class Upserter:
+    """Writes precomputed vectors to the configured vector store."""
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.local = isinstance(vector_store, LocalVectorStore)
+        if self.local:
+            self.existing = set(vector_store.ids)
+        else:
+            self.index = Pinecone(api_key=settings.PINECONE_API_KEY).Index(
+                PINECONE_INDEX_NAME
+            )
+
+    def upsert(self, chunks: List[Document], vectors: List[List[float]]):
+        if self.local:
+            fresh = [
+                (chunk, vector)
+                for chunk, vector in zip(chunks, vectors)
+                if chunk.id not in self.existing
+            ]
+            if fresh:
+                self.vector_store.add_embeddings(
+                    [chunk.page_content for chunk, _ in fresh],
+                    [vector for _, vector in fresh],
+                    [chunk.metadata for chunk, _ in fresh],
+                    [chunk.id for chunk, _ in fresh],
+                )
+                self.existing.update(chunk.id for chunk, _ in fresh)
+            return
+        # Same layout as PineconeVectorStore: document text under "text".
+        self.index.upsert(
+            vectors=[
+                {
+                    "id": chunk.id,
+                    "values": vector,
+                    "metadata": {**chunk.metadata, "text": chunk.page_content},
+                }
+                for chunk, vector in zip(chunks, vectors)
+            ]
+        )
+
+
+def ingest(
+    csv_path: str,
+    checkpoint_path: str,
+    total_rows: int = TOTAL_ROWS,
+    batch_size: int = BATCH_SIZE,
+    sub_batch_size: int = SUB_BATCH_SIZE,
+    concurrency: int = 4,
+) -> Dict:
+    start_row = load_checkpoint(checkpoint_path, csv_path)
+    if start_row >= total_rows:
+        logger.info(f"Nothing to do: checkpoint is at row {start_row} of {total_rows}")
+        return {"rows": 0, "chunks": 0, "seconds": 0.0}
+
+    embeddings = create_embeddings()
+    upserter = Upserter(create_vector_store(embeddings))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    source = os.path.basename(csv_path)
+
+    reader = pd.read_csv(
+        csv_path,
+        usecols=[PATIENT_COL, DOCTOR_COL, DESCRIPTION_COL],
+        skiprows=range(1, start_row + 1),
+        nrows=total_rows - start_row,
+        chunksize=batch_size,
+    )
+    logger.info(f"Ingesting {csv_path} from row {start_row} to {total_rows}")
+
+    started = time.perf_counter()
+    rows_done = chunks_done = 0
+    next_row = start_row
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for frame in reader:
+            batch_started = time.perf_counter()
+            # pandas numbers rows from 0 after the skipped ones.
+            frame.index = range(next_row, next_row + len(frame))
+            batch_rows = len(frame)
+            frame = frame.dropna(subset=[DESCRIPTION_COL])
+            chunks = split_documents(splitter, rows_to_documents(frame, source))
+
+            sub_batches = [
+                chunks[i : i + sub_batch_size]
+                for i in range(0, len(chunks), sub_batch_size)
+            ]
+            embedded = pool.map(
+                lambda batch: with_retries(
+                    embeddings.embed_documents, [c.page_content for c in batch]
+                ),
+                sub_batches,
+            )
+            vectors = [vector for batch in embedded for vector in batch]
+
+            upserts = [
+                pool.submit(
+                    with_retries,
+                    upserter.upsert,
+                    chunks[i : i + UPSERT_BATCH_SIZE],
+                    vectors[i : i + UPSERT_BATCH_SIZE],
+                )
+                for i in range(0, len(chunks), UPSERT_BATCH_SIZE)
+            ]
+            for future in upserts:
+                future.result()
+
+            next_row += batch_rows
+            save_checkpoint(checkpoint_path, csv_path, next_row)
+
+            rows_done += batch_rows
+            chunks_done += len(chunks)
+            elapsed = time.perf_counter() - batch_started
+            logger.info(
+                f"Rows up to {next_row}: {batch_rows} rows, {len(chunks)} chunks in "
+                f"{elapsed:.1f}s ({batch_rows / elapsed:.0f} rows/s)"
+            )
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        f"Ingested {rows_done} rows ({chunks_done} chunks) in {seconds:.1f}s "
+        f"({rows_done / seconds if seconds else 0:.0f} rows/s)"
+    )
+    return {"rows": rows_done, "chunks": chunks_done, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--checkpoint", default="data/ingest_checkpoint.json")
+    parser.add_argument("--total-rows", type=int, default=TOTAL_ROWS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--sub-batch-size", type=int, default=SUB_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and start over"
+    )
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    ingest(
+        args.csv,
+        args.checkpoint,
+        total_rows=args.total_rows,
+        batch_size=args.batch_size,
+        sub_batch_size=args.sub_batch_size,
+        concurrency=args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import zlib
+import argparse
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Router labels: "rag_query" or the db_query tool name.
+LABELS = [
+    "rag_query",
+    "get_hospitals",
+    "get_doctors",
+    "get_doctor_availability",
+    "book_appointment",
+]
+
+# Labels whose router parameters are fully determined by the query text, so a
+# confident prediction can be returned without asking the LLM for parameters.
+SELF_CONTAINED_LABELS = {"rag_query", "get_hospitals"}
+
+# The examples embedded in router_agent's prompt.
+SEED_EXAMPLES = [
+    ("What is acne?", "rag_query"),
+    ("List hospitals", "get_hospitals"),
+    ("List available doctors for acne?", "get_doctors"),
+    (
+        "Book appointment with doctorderma on Monday, 2025-05-05 from 09:00 to 09:30",
+        "book_appointment",
+    ),
+    ("Book my slot for Monday: 09:00 - 09:30", "book_appointment"),
+    ("List doctors for fatigue", "get_doctors"),
+]
+
+DEFAULT_N_FEATURES = 2**16
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_decision_log_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased unigrams and bigrams, with digits collapsed so dates and times share features."""
+    words = _TOKEN_PATTERN.findall(re.sub(r"\d", "0", text.lower()))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(text: str, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (indices, term counts) of the hashed bag of n-grams, plus a bias feature at index 0."""
+    counts: Dict[int, float] = {0: 1.0}
+    for token in tokenize(text):
+        index = 1 + zlib.crc32(token.encode("utf-8")) % (n_features - 1)
+        counts[index] = counts.get(index, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+class IntentClassifier:
+    """Hashing TF-IDF + multinomial logistic regression, trained and served with NumPy."""
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        idf: np.ndarray,
+        labels: List[str],
+    ):
+        self.weights = weights
+        self.bias = bias
+        self.idf = idf
+        self.labels = labels
+        self.n_features = idf.shape[0]
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        indices, values = hash_features(text, self.n_features)
+        values = values * self.idf[indices]
+        values /= np.linalg.norm(values)
+        return indices, values
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely label and its probability."""
+        indices, values = self._vectorize(text)
+        logits = self.weights[:, indices] @ values + self.bias
+        logits -= logits.max()
+        probs = np.exp(logits)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    @classmethod
+    def train(
+        cls,
+        examples: List[Tuple[str, str]],
+        n_features: int = DEFAULT_N_FEATURES,
+        epochs: int = 300,
+        learning_rate: float = 2.0,
+        l2: float = 1e-4,
+    ) -> "IntentClassifier":
+        labels = [label for label in LABELS if any(y == label for _, y in examples)]
+        label_index = {label: i for i, label in enumerate(labels)}
+        n_samples, n_classes = len(examples), len(labels)
+
+        # Build a CSR matrix of raw term counts.
+        rows = [hash_features(text, n_features) for text, _ in examples]
+        indptr = np.zeros(n_samples + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(idx) for idx, _ in rows])
+        indices = np.concatenate([idx for idx, _ in rows])
+        data = np.concatenate([vals for _, vals in rows])
+        row_of = np.repeat(np.arange(n_samples), np.diff(indptr))
+
+        document_frequency = np.bincount(indices, minlength=n_features)
+        idf = (
+            np.log((1.0 + n_samples) / (1.0 + document_frequency)) + 1.0
+        ).astype(np.float32)
+        data = data * idf[indices]
+        norms = np.sqrt(np.bincount(row_of, weights=data**2, minlength=n_samples))
+        data = (data / norms[row_of]).astype(np.float32)
+
+        targets = np.zeros((n_samples, n_classes), dtype=np.float32)
+        targets[np.arange(n_samples), [label_index[y] for _, y in examples]] = 1.0
+
+        weights = np.zeros((n_classes, n_features), dtype=np.float32)
+        bias = np.zeros(n_classes, dtype=np.float32)
+        for _ in range(epochs):
+            logits = np.add.reduceat(weights[:, indices] * data, indptr[:-1], axis=1).T
+            logits += bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            error = (probs - targets) / n_samples
+            for k in range(n_classes):
+                gradient = np.bincount(
+                    indices, weights=error[row_of, k] * data, minlength=n_features
+                )
+                weights[k] -= learning_rate * (gradient + l2 * weights[k])
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(weights, bias, idf, labels)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            idf=self.idf,
+            labels=np.array(self.labels),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with np.load(path) as model:
+            return cls(
+                model["weights"],
+                model["bias"],
+                model["idf"],
+                [str(label) for label in model["labels"]],
+            )
+
+
+def load_intent_classifier(path: str) -> Optional[IntentClassifier]:
+    """Load the trained classifier, or return None if no model has been trained yet."""
+    if not path or not os.path.exists(path):
+        logger.info(f"No intent classifier model at {path}; LLM routing only.")
+        return None
+    try:
+        classifier = IntentClassifier.load(path)
+        logger.info(f"Intent classifier loaded from {path}: labels={classifier.labels}")
+        return classifier
+    except Exception as e:
+        logger.error(f"Failed to load intent classifier from {path}: {e}")
+        return None
+
+
+def log_router_decision(path: str, query: str, label: str, source: str):
+    """Append a routing decision to the JSONL log used as training data."""
+    if not path or label not in LABELS:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        line = json.dumps({"query": query, "label": label, "source": source})
+        with _decision_log_lock, open(path, "a") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.error(f"Failed to log router decision to {path}: {e}")
+
+
+def load_examples(log_path: Optional[str]) -> List[Tuple[str, str]]:
+    """Seed examples plus every logged router decision."""
+    examples = list(SEED_EXAMPLES)
+    if log_path and os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("query") and record.get("label") in LABELS:
+                    examples.append((record["query"], record["label"]))
+    return examples
+
+
+def evaluate(
+    examples: List[Tuple[str, str]], threshold: float = 0.9, folds: int = 5, seed: int = 0
+) -> Dict:
+    """K-fold accuracy and per-prediction latency of the classifier."""
+    order = np.random.default_rng(seed).permutation(len(examples))
+    folds = max(2, min(folds, len(examples)))
+    correct, total, confident, confident_correct = 0, 0, 0, 0
+    latencies = []
+    for fold in range(folds):
+        test_idx = order[fold::folds]
+        train_idx = np.setdiff1d(order, test_idx)
+        classifier = IntentClassifier.train([examples[i] for i in train_idx])
+        for i in test_idx:
+            text, label = examples[i]
+            started = time.perf_counter()
+            predicted, confidence = classifier.predict(text)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            total += 1
+            correct += predicted == label
+            if confidence >= threshold:
+                confident += 1
+                confident_correct += predicted == label
+    latencies = np.array(latencies)
+    return {
+        "examples": len(examples),
+        "folds": folds,
+        "accuracy": correct / total,
+        "threshold": threshold,
+        "coverage_at_threshold": confident / total,
+        "accuracy_at_threshold": confident_correct / confident if confident else None,
+        "latency_us_p50": float(np.percentile(latencies, 50)),
+        "latency_us_p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    from config.settings import settings
+
+    parser = argparse.ArgumentParser(description="Train or evaluate the router intent classifier.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train and save the classifier.")
+    train_parser.add_argument("--log", default=settings.ROUTER_DECISION_LOG)
+    train_parser.add_argument("--out", default=settings.INTENT_MODEL_PATH)
+    train_parser.add_argument("--epochs", type=int, default=300)
+
+    report_parser = subparsers.add_parser("report", help="Offline accuracy/latency report.")
+    report_parser.add_argument("--log", default=settings.ROUTER_DECISION_LOG)
+    report_parser.add_argument("--folds", type=int, default=5)
+    report_parser.add_argument(
+        "--threshold", type=float, default=settings.INTENT_CONFIDENCE_THRESHOLD
+    )
+
+    args = parser.parse_args()
+    examples = load_examples(args.log)
+    if args.command == "train":
+        classifier = IntentClassifier.train(examples, epochs=args.epochs)
+        classifier.save(args.out)
+        print(f"Trained on {len(examples)} examples, saved to {args.out}")
+    else:
+        report = evaluate(examples, threshold=args.threshold, folds=args.folds)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,184 @@
+"""Inverted-file (IVF) coarse quantizer for the local vector index.
+
+k-means centroids partition the vectors into `nlist` inverted lists; a query
+scans only the rows in its `nprobe` nearest lists. List contents are stored
+as one memory-mapped array of row numbers grouped by list, plus an offsets
+array. Rows added after the build are assigned to their nearest centroid and
+appended to a small tail file, so adds never retrain or rewrite the lists;
+`compact` folds the tail back in.
+
+Build from backend/:
+    python -m utils.ivf_index build --index data/vector_index --nlist 1024
+    python -m utils.ivf_index compact --index data/vector_index
+    python -m utils.ivf_index drop --index data/vector_index
+"""
+
+import os
+import logging
+import argparse
+from typing import Iterable, Optional
+
+import numpy as np
+
+from utils.quantization import assign, kmeans, truncate_file
+
+logger = logging.getLogger(__name__)
+
+
+def default_nlist(count: int) -> int:
+    """About 4 * sqrt(N) lists, the usual starting point for IVF."""
+    return max(1, int(4 * np.sqrt(count)))
+
+
+class IVFIndex:
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    OFFSETS_FILE = "ivf_offsets.npy"
+    LISTS_FILE = "ivf_lists.bin"
+    TAIL_FILE = "ivf_tail.bin"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.centroids = np.load(self._file(self.CENTROIDS_FILE))
+        self.offsets = np.load(self._file(self.OFFSETS_FILE))
+        self._centroid_norms = (self.centroids**2).sum(axis=1)
+        if self.offsets[-1]:
+            self.lists = np.memmap(
+                self._file(self.LISTS_FILE),
+                dtype=np.int64,
+                mode="r",
+                shape=(int(self.offsets[-1]),),
+            )
+        else:
+            self.lists = np.empty(0, dtype=np.int64)
+        # (row, list) pairs for rows added since the last build or compaction.
+        if os.path.exists(self._file(self.TAIL_FILE)):
+            tail = np.fromfile(self._file(self.TAIL_FILE), dtype=np.int64)
+            self.tail = tail[: len(tail) // 2 * 2].reshape(-1, 2)
+        else:
+            self.tail = np.empty((0, 2), dtype=np.int64)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        iterations: int = 20,
+        sample: int = 100000,
+    ) -> "IVFIndex":
+        """Train centroids on a sample of vectors and write the inverted lists."""
+        nlist = nlist or default_nlist(len(vectors))
+        rng = np.random.default_rng(0)
+        training = vectors
+        if len(vectors) > sample:
+            training = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+        centroids = kmeans(training, nlist, iterations)
+        np.save(os.path.join(path, cls.CENTROIDS_FILE), centroids)
+        cls._write_lists(path, assign(vectors, centroids), len(centroids))
+        logger.info(f"Built IVF index at {path}: {len(vectors)} vectors, {nlist} lists")
+        return cls(path)
+
+    @classmethod
+    def _write_lists(cls, path: str, labels: np.ndarray, nlist: int):
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+        # Lists before offsets: a reader never sees offsets past the lists' end.
+        tmp = os.path.join(path, cls.LISTS_FILE + ".tmp")
+        order.tofile(tmp)
+        os.replace(tmp, os.path.join(path, cls.LISTS_FILE))
+        np.save(os.path.join(path, cls.OFFSETS_FILE), offsets)
+        tail = os.path.join(path, cls.TAIL_FILE)
+        if os.path.exists(tail):
+            os.remove(tail)
+
+    def add(self, vectors: np.ndarray, first_row: int):
+        """Assign new rows to their nearest lists without touching the built lists."""
+        labels = assign(vectors, self.centroids)
+        pairs = np.stack(
+            [np.arange(first_row, first_row + len(vectors)), labels], axis=1
+        ).astype(np.int64)
+        with open(self._file(self.TAIL_FILE), "ab") as f:
+            f.write(pairs.tobytes())
+        self.tail = np.concatenate([self.tail, pairs])
+
+    def truncate(self, count: int):
+        """Drop tail entries for rows past count.
+
+        An add that crashed before the store recorded its rows leaves them
+        behind, and later adds would reuse those row numbers.
+        """
+        # Rows are appended in order, so the entries to keep are a prefix.
+        keep = int(np.count_nonzero(self.tail[:, 0] < count))
+        self.tail = self.tail[:keep]
+        truncate_file(self._file(self.TAIL_FILE), keep * self.tail.itemsize * 2)
+
+    def compact(self, vectors: np.ndarray):
+        """Fold the tail into the inverted lists, keeping the trained centroids."""
+        labels = np.full(len(vectors), -1, dtype=np.int64)
+        sizes = np.diff(self.offsets)
+        labels[np.asarray(self.lists)] = np.repeat(np.arange(self.nlist), sizes)
+        tail = self.tail[self.tail[:, 0] < len(vectors)]
+        labels[tail[:, 0]] = tail[:, 1]
+        # Rows whose tail entry was lost (e.g. a crash mid-add) are reassigned.
+        missing = np.flatnonzero(labels < 0)
+        if len(missing):
+            labels[missing] = assign(vectors[missing], self.centroids)
+        self._write_lists(self.path, labels, self.nlist)
+        self.__init__(self.path)
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        """The nprobe nearest lists (L2 to the centroids) for each query."""
+        nprobe = min(nprobe, self.nlist)
+        distances = self._centroid_norms - 2.0 * queries @ self.centroids.T
+        return np.argpartition(distances, nprobe - 1, axis=1)[:, :nprobe]
+
+    def rows(self, lists: Iterable[int], count: int) -> np.ndarray:
+        """Sorted row numbers (below count) stored in the given lists."""
+        lists = np.asarray(list(lists))
+        parts = [self.lists[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        if len(self.tail):
+            parts.append(self.tail[np.isin(self.tail[:, 1], lists), 0])
+        rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, np.int64)
+        return rows[rows < count]
+
+    def remove_files(self):
+        for name in (
+            self.CENTROIDS_FILE,
+            self.OFFSETS_FILE,
+            self.LISTS_FILE,
+            self.TAIL_FILE,
+        ):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+
+
+def main():
+    from utils.local_vector_store import LocalVectorStore
+
+    parser = argparse.ArgumentParser(description="Manage the local IVF index.")
+    parser.add_argument("command", choices=["build", "compact", "drop"])
+    parser.add_argument("--index", required=True)
+    parser.add_argument("--nlist", type=int, help="Default: 4 * sqrt(vectors)")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocalVectorStore(args.index, None)
+    if args.command == "build":
+        store.build_ivf(args.nlist, args.iterations)
+    elif args.command == "compact":
+        store.compact_ivf()
+    else:
+        store.drop_ivf()
+
+
+if __name__ == "__main__":
+    main()
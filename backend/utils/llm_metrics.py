@@ -0,0 +1,159 @@
+"""Latency and token metrics, and trace spans, for LLM calls.
+
+Groq is called through its SDK, so instrument_groq() wraps the client's
+chat.completions.create. Gemini is called through LangChain, so
+LLMMetricsCallback is attached to the ChatGoogleGenerativeAI instances and
+reads the model name and token usage LangChain reports for each run. Both
+feed the same metrics, labelled by provider and model, and record an "llm"
+span with the model and token counts when the call is part of a trace.
+"""
+
+import time
+import functools
+import threading
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from utils.metrics import REGISTRY
+from utils.tracing import child_span, current_span, start_span
+
+llm_request_seconds = REGISTRY.histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency by provider and model.",
+    ["provider", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60),
+)
+llm_tokens = REGISTRY.counter(
+    "llm_tokens_total",
+    "LLM tokens by provider, model and type (prompt, completion).",
+    ["provider", "model", "type"],
+)
+llm_errors = REGISTRY.counter(
+    "llm_request_errors_total", "LLM calls that raised.", ["provider", "model"]
+)
+
+
+def record_usage(
+    provider: str, model: str, prompt_tokens, completion_tokens, llm_span=None
+):
+    if llm_span is not None:
+        llm_span.set_attributes(
+            prompt_tokens=prompt_tokens or 0, completion_tokens=completion_tokens or 0
+        )
+    if prompt_tokens:
+        llm_tokens.inc(prompt_tokens, provider=provider, model=model, type="prompt")
+    if completion_tokens:
+        llm_tokens.inc(
+            completion_tokens, provider=provider, model=model, type="completion"
+        )
+
+
+def instrument_groq(client):
+    """Record latency and token usage of every chat completion made with client."""
+    create = client.chat.completions.create
+
+    @functools.wraps(create)
+    def timed_create(*args, **kwargs):
+        model = kwargs.get("model", "unknown")
+        with child_span("llm", provider="groq", model=model) as llm_span:
+            started = time.perf_counter()
+            try:
+                response = create(*args, **kwargs)
+            except Exception:
+                llm_errors.inc(provider="groq", model=model)
+                raise
+            finally:
+                llm_request_seconds.observe(
+                    time.perf_counter() - started, provider="groq", model=model
+                )
+            usage = getattr(response, "usage", None)  # absent on streamed responses
+            if usage is not None:
+                record_usage(
+                    "groq",
+                    model,
+                    usage.prompt_tokens,
+                    usage.completion_tokens,
+                    llm_span,
+                )
+        return response
+
+    client.chat.completions.create = timed_create
+    return client
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """LangChain callback recording latency, token usage and spans of chat model runs."""
+
+    run_inline = True
+
+    def __init__(self):
+        # run_id -> (start time, provider, model, span)
+        self._runs: Dict[UUID, Tuple[float, str, str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]]):
+        metadata = metadata or {}
+        provider = metadata.get("ls_provider", "unknown")
+        model = metadata.get("ls_model_name", "unknown")
+        # Only traced as part of a request; inline callbacks run in its context.
+        parent = current_span()
+        llm_span = None
+        if parent is not None and parent.recording:
+            llm_span = start_span("llm", {"provider": provider, "model": model})
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), provider, model, llm_span)
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[str, str, Any]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        started, provider, model, llm_span = run
+        llm_request_seconds.observe(
+            time.perf_counter() - started, provider=provider, model=model
+        )
+        return provider, model, llm_span
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs
+    ):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        run = self._finish(run_id)
+        if run is None:
+            return
+        provider, model, llm_span = run
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    record_usage(
+                        provider,
+                        model,
+                        usage.get("input_tokens"),
+                        usage.get("output_tokens"),
+                        llm_span,
+                    )
+        if llm_span is not None:
+            llm_span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        run = self._finish(run_id)
+        if run is None:
+            return
+        provider, model, llm_span = run
+        llm_errors.inc(provider=provider, model=model)
+        if llm_span is not None:
+            llm_span.record_error(error)
+            llm_span.end()
+
+
+llm_metrics = LLMMetricsCallback()
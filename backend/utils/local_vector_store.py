@@ -0,0 +1,399 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from utils.ivf_index import IVFIndex
+from utils.quantization import (
+    ProductQuantizer,
+    ScalarQuantizer,
+    load_quantizer,
+    truncate_file,
+)
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a local index directory:
+#   meta.json    {"dim": 768, "dtype": "float32", "count": N}
+#   vectors.bin  N x dim row-major matrix of L2-normalized embeddings
+#   docs.jsonl   one {"id", "text", "metadata"} record per row, same order
+VECTORS_FILE = "vectors.bin"
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+
+# Rows scored per matrix product; bounds the float32 scratch memory per search.
+SEARCH_BLOCK_ROWS = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k highest scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return (
+        np.take_along_axis(part, order, axis=1),
+        np.take_along_axis(part_scores, order, axis=1),
+    )
+
+
+class LocalVectorStore(VectorStore):
+    """Cosine-similarity vector store backed by a memory-mapped NumPy matrix.
+
+    Vectors are appended to a flat binary file and mapped read-only for
+    search, so opening an index costs nothing up front and the OS page cache
+    keeps hot rows in memory. Search is an exact, blocked brute-force scan,
+    which gives the same top-k as an exact cosine index such as Pinecone's.
+    float16 halves disk and page-cache footprint but converts every scanned
+    block to float32, so it is several times slower per query.
+
+    A quantized index (see utils.quantization) scans compact codes instead
+    and re-scores the best `rescore` x k candidates (default per quantizer)
+    against the stored vectors, which are then only paged in for those rows.
+
+    With an IVF index (see utils.ivf_index), only the rows in each query's
+    `nprobe` nearest inverted lists are scored, exactly or via the codes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding: Embeddings,
+        dim: int = 768,
+        dtype: str = "float32",
+        rescore: Optional[int] = None,
+        nprobe: int = 8,
+    ):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.path = path
+        self._embedding = embedding
+        self.rescore = rescore
+        self.nprobe = nprobe
+        self.quantizer = None
+        self.ivf: Optional[IVFIndex] = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.dtype = meta["dim"], meta["dtype"]
+            self.quantizer = load_quantizer(path, self.dim, meta.get("quantization"))
+            if meta.get("ivf"):
+                self.ivf = IVFIndex(path)
+        else:
+            self.dim, self.dtype = dim, dtype
+            self._write_meta(0)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _write_meta(self, count: int):
+        tmp = self._file(META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            meta = {"dim": self.dim, "dtype": self.dtype, "count": count}
+            if self.quantizer is not None:
+                meta["quantization"] = self.quantizer.config()
+            if self.ivf is not None:
+                meta["ivf"] = {"nlist": self.ivf.nlist}
+            json.dump(meta, f)
+        os.replace(tmp, self._file(META_FILE))
+
+    def _load(self):
+        """Map the vectors and index the byte offsets of each document record.
+
+        Rows past the recorded count, left by an append that crashed before
+        meta.json was updated, are truncated away so the next append lands
+        right after the last committed row.
+        """
+        with open(self._file(META_FILE)) as f:
+            count = json.load(f)["count"]
+        self.ids: List[str] = []
+        self._offsets: List[int] = []
+        offset = 0
+        if os.path.exists(self._file(DOCS_FILE)):
+            with open(self._file(DOCS_FILE), "rb") as f:
+                for line in f:
+                    if len(self.ids) == count:
+                        break
+                    self.ids.append(json.loads(line)["id"])
+                    self._offsets.append(offset)
+                    offset += len(line)
+        truncate_file(self._file(DOCS_FILE), offset)
+        truncate_file(
+            self._file(VECTORS_FILE), count * self.dim * np.dtype(self.dtype).itemsize
+        )
+        if self.quantizer is not None:
+            self.quantizer.truncate(count)
+        if self.ivf is not None:
+            self.ivf.truncate(count)
+        self._map(count)
+        logger.info(
+            f"Local vector index at {self.path}: {count} vectors ({self.dtype})"
+        )
+
+    def _map(self, count: int):
+        if count:
+            self.vectors = np.memmap(
+                self._file(VECTORS_FILE),
+                dtype=self.dtype,
+                mode="r",
+                shape=(count, self.dim),
+            )
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+        if self.quantizer is not None:
+            self.quantizer.map(count)
+
+    def _read_documents(self, rows: Iterable[int]) -> List[Document]:
+        documents = []
+        with open(self._file(DOCS_FILE), "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                record = json.loads(f.readline())
+                documents.append(
+                    Document(
+                        id=record["id"],
+                        page_content=record["text"],
+                        metadata=record["metadata"],
+                    )
+                )
+        return documents
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Append precomputed embeddings; used by ingestion to skip re-embedding."""
+        vectors = normalize(embeddings)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected {self.dim}-dim embeddings, got {vectors.shape[1]}"
+            )
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        with self._lock:
+            # Vectors first, then documents, then the count: a crash part-way
+            # leaves trailing bytes that _load truncates.
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                f.write(vectors.astype(self.dtype).tobytes())
+            if self.quantizer is not None:
+                self.quantizer.append(vectors)
+            if self.ivf is not None:
+                self.ivf.add(vectors, first_row=len(self.ids))
+            offsets = []
+            with open(self._file(DOCS_FILE), "ab") as f:
+                for id_, text, metadata in zip(ids, texts, metadatas):
+                    record = {"id": id_, "text": text, "metadata": metadata}
+                    offsets.append(f.tell())
+                    f.write((json.dumps(record) + "\n").encode())
+            count = len(self.ids) + len(ids)
+            self._write_meta(count)
+            self.ids.extend(ids)
+            self._offsets.extend(offsets)
+            self._map(count)
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(
+            texts, self._embedding.embed_documents(texts), metadatas, ids
+        )
+
+    def _scan(
+        self, queries: np.ndarray, k: int, score_block
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Blocked top-k over all rows, scoring each block with score_block(start, end)."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, len(self.vectors))
+            rows, scores = top_k(score_block(start, end), k)
+            # Merge this block's candidates with the running best.
+            rows = np.concatenate([best_rows, rows + start], axis=1)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            keep, best_scores = top_k(scores, k)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+        return best_rows, best_scores
+
+    def _rescore(
+        self, queries: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k among each query's candidate rows."""
+        best_rows, best_scores = [], []
+        for query, rows in zip(queries, candidates):
+            rows = np.sort(rows)  # sequential reads from the mapped file
+            exact = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            keep, scores = top_k(exact[np.newaxis, :], k)
+            best_rows.append(rows[keep[0]])
+            best_scores.append(scores[0])
+        return np.array(best_rows), np.array(best_scores)
+
+    def _search_ivf(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k over each query's probed inverted lists; short results pad with -1."""
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        probes = self.ivf.probe(queries, self.nprobe)
+        prepared = self.quantizer.prepare(queries) if self.quantizer else None
+        for i, query in enumerate(queries):
+            rows = self.ivf.rows(probes[i], len(self.ids))
+            if self.quantizer is not None:
+                rescore = self.rescore or self.quantizer.default_rescore
+                approx = self.quantizer.score_rows(prepared[i : i + 1], rows)
+                keep, _ = top_k(approx, k * rescore)
+                rows = np.sort(rows[keep[0]])
+            exact = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            keep, scores = top_k(exact[np.newaxis, :], k)
+            best_rows[i, : keep.shape[1]] = rows[keep[0]]
+            best_scores[i, : keep.shape[1]] = scores[0]
+        return best_rows, best_scores
+
+    def search_vectors(
+        self, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows and cosine scores for a batch of query vectors."""
+        queries = normalize(np.atleast_2d(queries))
+        if self.ivf is not None:
+            return self._search_ivf(queries, k)
+        if self.quantizer is None:
+            return self._scan(
+                queries,
+                k,
+                lambda start, end: queries
+                @ np.asarray(self.vectors[start:end], dtype=np.float32).T,
+            )
+        prepared = self.quantizer.prepare(queries)
+        candidates, _ = self._scan(
+            queries,
+            k * (self.rescore or self.quantizer.default_rescore),
+            lambda start, end: self.quantizer.scores(prepared, start, end),
+        )
+        return self._rescore(queries, candidates, k)
+
+    def quantize(self, kind: Optional[str], m: int = 192):
+        """Build codes for every stored vector ("int8", "pq" or None to drop them)."""
+        with self._lock:
+            if self.quantizer is not None:
+                self.quantizer.remove_files()
+                self.quantizer = None
+            if kind:
+                quantizer = (
+                    ScalarQuantizer(self.path, self.dim)
+                    if kind == "int8"
+                    else ProductQuantizer(self.path, self.dim, m)
+                )
+                quantizer.train(self.vectors)
+                for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+                    quantizer.append(self.vectors[start : start + SEARCH_BLOCK_ROWS])
+                self.quantizer = quantizer
+            self._write_meta(len(self.ids))
+            self._map(len(self.ids))
+        logger.info(f"Local vector index at {self.path} quantization: {kind or 'none'}")
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 20):
+        """Train IVF centroids over the stored vectors and write the inverted lists."""
+        with self._lock:
+            if self.ivf is not None:
+                self.ivf.remove_files()
+            self.ivf = IVFIndex.build(self.path, self.vectors, nlist, iterations)
+            self._write_meta(len(self.ids))
+
+    def compact_ivf(self):
+        with self._lock:
+            if self.ivf is not None:
+                self.ivf.compact(self.vectors)
+
+    def drop_ivf(self):
+        with self._lock:
+            if self.ivf is not None:
+                self.ivf.remove_files()
+                self.ivf = None
+                self._write_meta(len(self.ids))
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        rows, scores = self.search_vectors(np.asarray([embedding]), k)
+        found = rows[0] >= 0
+        documents = self._read_documents(rows[0][found].tolist())
+        return list(zip(documents, scores[0][found].tolist()))
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_by_vector_with_score(embedding, k)
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities; map [-1, 1] onto [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: str = "data/vector_index",
+        dtype: str = "float32",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        vectors = embedding.embed_documents(texts)
+        store = cls(path, embedding, dim=len(vectors[0]), dtype=dtype)
+        store.add_embeddings(texts, vectors, metadatas, ids)
+        return store
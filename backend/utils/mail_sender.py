@@ -0,0 +1,270 @@
+"""Delivers queued email from the email_outbox table.
+
+Each worker thread claims a batch of due rows with FOR UPDATE SKIP LOCKED,
+so any number of threads and processes can share one outbox. Claiming
+pushes next_attempt_at forward by a lease; if a sender dies mid-batch its
+rows become due again when the lease runs out. A batch is sent over one
+pooled SMTP session and the results are written back in one round trip.
+Transient failures are retried with exponential backoff and jitter;
+permanent 5xx rejections, and rows out of attempts, are marked failed.
+
+Run a standalone sender from backend/:  python -m utils.mail_sender
+"""
+
+import time
+import random
+import smtplib
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from config.settings import settings
+from utils.db import get_db_connection
+from utils.email import SMTPPool, create_smtp_pool, send_message, session_broken
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+emails_sent = REGISTRY.counter(
+    "email_sent_total", "Emails delivered to the SMTP server.", ["kind"]
+)
+email_failures = REGISTRY.counter(
+    "email_send_failures_total",
+    "Email send failures by outcome (retry, failed).",
+    ["kind", "outcome"],
+)
+email_send_seconds = REGISTRY.histogram(
+    "email_send_seconds",
+    "SMTP time per message.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+email_delivery_delay = REGISTRY.histogram(
+    "email_delivery_delay_seconds",
+    "Time from enqueue to delivery.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800),
+)
+email_batch_size = REGISTRY.histogram(
+    "email_batch_size",
+    "Outbox rows claimed per batch.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250),
+)
+
+# id, kind, recipient, subject, body, attempts, created_at
+Row = Tuple[str, str, str, str, str, int, datetime]
+
+
+def is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class OutboxSender:
+    def __init__(
+        self,
+        pool: SMTPPool,
+        batch_size: int = 50,
+        poll_seconds: float = 1.0,
+        max_attempts: int = 8,
+        retry_base_seconds: float = 30.0,
+        lease_seconds: float = 300.0,
+        workers: Optional[int] = None,
+    ):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.workers = workers or pool.size
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def claim(self) -> List[Row]:
+        now = datetime.utcnow()
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute(
+                """
+                UPDATE email_outbox
+                SET attempts = attempts + 1, next_attempt_at = %s
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= %s
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, kind, recipient, subject, body, attempts, created_at
+                """,
+                (now + timedelta(seconds=self.lease_seconds), now, self.batch_size),
+            )
+            rows = c.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        return rows
+
+    def _backoff(self, attempts: int) -> float:
+        delay = self.retry_base_seconds * 2 ** (attempts - 1)
+        return min(delay, 6 * 3600) * random.uniform(0.8, 1.2)
+
+    def send_batch(self, rows: List[Row]):
+        sent, retries, failed = [], [], []
+        remaining = list(rows)
+        try:
+            self._deliver(remaining, sent, retries, failed)
+        finally:
+            # Always mark what was sent, so it is not re-sent after the lease.
+            self.record(sent, retries, failed)
+
+    def _deliver(self, remaining: List[Row], sent, retries, failed):
+        while remaining:
+            connected = False
+            try:
+                with self.pool.connection() as connection:
+                    connected = True
+                    while remaining:
+                        row = remaining.pop(0)
+                        started = time.perf_counter()
+                        try:
+                            send_message(connection, row[2], row[3], row[4])
+                        except OSError as e:  # includes smtplib.SMTPException
+                            if session_broken(e):
+                                retries.append((row, str(e)))
+                                raise
+                            target = failed if is_permanent(e) else retries
+                            target.append((row, str(e)))
+                            continue
+                        except Exception as e:
+                            # e.g. the message could not be built; the session
+                            # is still usable, so carry on with the batch.
+                            logger.error(f"Email outbox row {row[0]} failed: {e}")
+                            retries.append((row, str(e)))
+                            continue
+                        email_send_seconds.observe(time.perf_counter() - started)
+                        sent.append(row)
+            except OSError as e:
+                if connected:
+                    # The session dropped mid-batch; carry on over a new one.
+                    continue
+                logger.error(f"SMTP connection failed: {e}")
+                retries.extend((row, str(e)) for row in remaining)
+                break
+
+    def record(
+        self,
+        sent: List[Row],
+        retries: List[Tuple[Row, str]],
+        failed: List[Tuple[Row, str]],
+    ):
+        now = datetime.utcnow()
+        for row, error in retries:
+            if row[5] >= self.max_attempts:
+                failed.append((row, error))
+        retries = [(row, error) for row, error in retries if row[5] < self.max_attempts]
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            if sent:
+                c.execute(
+                    """
+                    UPDATE email_outbox SET status = 'sent', sent_at = %s, last_error = NULL
+                    WHERE id = ANY(%s::uuid[])
+                    """,
+                    (now, [row[0] for row in sent]),
+                )
+            for row, error in retries:
+                c.execute(
+                    "UPDATE email_outbox SET next_attempt_at = %s, last_error = %s WHERE id = %s",
+                    (now + timedelta(seconds=self._backoff(row[5])), error, row[0]),
+                )
+            for row, error in failed:
+                c.execute(
+                    "UPDATE email_outbox SET status = 'failed', last_error = %s WHERE id = %s",
+                    (error, row[0]),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+        for row in sent:
+            emails_sent.inc(kind=row[1])
+            email_delivery_delay.observe((now - row[6]).total_seconds())
+        for row, error in retries:
+            email_failures.inc(kind=row[1], outcome="retry")
+            logger.warning(f"Email {row[0]} to {row[2]} will be retried: {error}")
+        for row, error in failed:
+            email_failures.inc(kind=row[1], outcome="failed")
+            logger.error(f"Email {row[0]} to {row[2]} failed permanently: {error}")
+        if sent:
+            logger.info(f"Sent {len(sent)} emails")
+
+    def run_once(self) -> int:
+        rows = self.claim()
+        if rows:
+            email_batch_size.observe(len(rows))
+            self.send_batch(rows)
+        return len(rows)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logger.error(f"Email outbox sender error: {e}")
+                claimed = 0
+            # A full batch suggests more is due; otherwise wait for new rows.
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, name=f"mail-sender-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started email outbox sender with {self.workers} workers")
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=self.poll_seconds + self.pool.timeout)
+        self.pool.close()
+
+
+def create_outbox_sender() -> OutboxSender:
+    return OutboxSender(
+        create_smtp_pool(),
+        batch_size=settings.EMAIL_BATCH_SIZE,
+        poll_seconds=settings.EMAIL_POLL_SECONDS,
+        max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+        retry_base_seconds=settings.EMAIL_RETRY_BASE_SECONDS,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued email.")
+    parser.add_argument("--once", action="store_true", help="Send one batch and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sender = create_outbox_sender()
+    if args.once:
+        sender.run_once()
+        sender.pool.close()
+        return
+    sender.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sender.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 import re
 import logging
 from llama_cloud_services import LlamaParse
@@ -8,7 +9,9 @@ from dotenv import load_dotenv
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 from collections import defaultdict
+from typing import Optional
 from config.settings import settings
+from utils.llm_metrics import instrument_groq
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +23,11 @@ load_dotenv()
 LLAMA_PARSER_API_KEY = os.getenv("LLAMA_PARSER_API_KEY")
 
 parser = LlamaParse(api_key=LLAMA_PARSER_API_KEY, result_type="markdown")
-client = Groq(api_key=settings.GROQ_API_KEY)
+if settings.LLAMA_PARSE_BASE_URL:
+    parser.base_url = settings.LLAMA_PARSE_BASE_URL
+client = instrument_groq(
+    Groq(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_BASE_URL or None)
+)
 
 # In-memory conversation history: {user_id: [{"query": str, "report_json": str, "response": str, "timestamp": datetime}, ...]}
 conversation_history = defaultdict(list)
@@ -118,13 +125,13 @@ Exclude empty entries and non-test data. Ensure the JSON is well-structured. Her
     ]
 
     logger.info("Sending structure request to Groq")
-    response = (
-        client.chat.completions.create(
-            messages=generation_chat_history, model="llama3-70b-8192"
-        )
-        .choices[0]
-        .message.content
+    # The Groq client is synchronous; keep it off the event loop.
+    completion = await asyncio.to_thread(
+        client.chat.completions.create,
+        messages=generation_chat_history,
+        model="llama3-70b-8192",
     )
+    response = completion.choices[0].message.content
     logger.info(f"Received structure response: {response[:100]}...")
 
     json_match = re.search(r"```json\s*(.*?)\s*```", response, re.DOTALL)
@@ -146,6 +153,104 @@ Exclude empty entries and non-test data. Ensure the JSON is well-structured. Her
         )
 
 
+async def structure_report_or_none(report_text: str) -> Optional[dict]:
+    """structure_report, falling back to None when the report cannot be structured."""
+    try:
+        json_output, raw_json = await structure_report(report_text)
+        logger.info(
+            f"Raw JSON from structure_report: {raw_json[:200]}..."
+        )  # Log raw JSON for debugging
+        # Validate JSON structure
+        if not isinstance(json_output, dict):
+            logger.error("structure_report returned invalid JSON structure")
+            json_output = None  # Fallback to None if JSON is invalid
+    except json.JSONDecodeError as json_err:
+        logger.error(f"JSON parsing error in structure_report: {str(json_err)}")
+        json_output = None  # Fallback to None if JSON parsing fails
+    except Exception as e:
+        logger.error(f"Error in structure_report: {str(e)}")
+        json_output = None  # Fallback to None for other errors
+    return json_output
+
+
+def answer_medical_query(effective_query: str, json_output: Optional[dict]) -> str:
+    """Answer a CBC question, with the structured report if there is one, using Groq."""
+    prompt = f"""
+        You are a friendly medical AI assistant who analyzes Complete Blood Count (CBC) results and answers medical questions in simple, kind words for non-experts. Follow these guidelines:
+        1. Keep answers 100-150 words, clear, and focused.
+        2. Use analogies (e.g., "Red blood cells are like delivery trucks carrying oxygen").
+        3. Avoid medical jargon; explain terms simply.
+        4. Suggest 1-2 next steps (e.g., "Discuss with your doctor about possible iron supplements").
+        5. Highlight urgency (e.g., "If you feel very weak or dizzy, see a doctor right away").
+        6. Emphasize this is not a diagnosis and recommend consulting a doctor.
+        7. Output only the answer text, without labels like "assistant:" or code blocks.
+
+        For CBC analysis, focus on:
+        - Red blood cell count (RBC), hemoglobin, hematocrit (normal ranges: males 4.5-6.1 million/mcL, 13-17 g/dL, 40-55%; females 4.0-5.4 million/mcL, 11.5-15.5 g/dL, 36-48%).
+        - White blood cell count (WBC, normal 4,000-10,000/mcL) and differential (e.g., neutrophils, lymphocytes).
+        - Platelet count (normal 150,000-400,000/mcL).
+        - If available, mean corpuscular volume (MCV, normal 80-100 fL), mean corpuscular hemoglobin (MCH, normal 27-31 pg), and red cell distribution width (RDW, normal 12-15%).
+        - Compare results to normal ranges, explain abnormalities, and suggest possible causes (e.g., anemia, infection).
+
+        Current Query: {effective_query}
+    """
+
+    if json_output:
+        patient_age = json_output.get("patient_info", {}).get("age", "Unknown")
+        patient_gender = json_output.get("patient_info", {}).get(
+            "gender", "Unknown"
+        )
+        prompt += f"""
+            Patient Age: {patient_age}
+            Patient Gender: {patient_gender}
+            Blood Test Results (JSON):
+            {json.dumps(json_output, indent=2)}
+        """
+    else:
+        prompt += "\nNo blood test results available."
+
+    logger.info(f"Sending prompt to Groq API: {prompt[:100]}...")
+    # Call Groq API
+    chat_completion = client.chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        model="llama-3.3-70b-versatile",
+        stream=False,
+    )
+
+    # Extract the response
+    raw_response = chat_completion.choices[0].message.content
+    if not raw_response:
+        logger.error("No content in Groq API response")
+        raise HTTPException(
+            status_code=500, detail="No content in Groq API response"
+        )
+
+    # Clean the response
+    cleaned_response = raw_response.strip()
+    cleaned_response = re.sub(
+        r"^(assistant:|[\[\{]?(ANSWER|RESPONSE)[\]\}]?:?\s*)",
+        "",
+        cleaned_response,
+        flags=re.IGNORECASE,
+    )
+    cleaned_response = re.sub(
+        r"```(?:json)?\s*(.*?)\s*```", r"\1", cleaned_response, flags=re.DOTALL
+    )
+    cleaned_response = re.sub(r"\s*(</s>|[EOT]|\[.*?\])$", "", cleaned_response)
+    if not cleaned_response.strip():
+        logger.error("Cleaned response is empty")
+        raise HTTPException(status_code=500, detail="Cleaned response is empty")
+
+    response = cleaned_response.strip()
+    logger.info(f"Parsed Groq API response: {response[:100]}...")
+    return response
+
+
 async def interpret_report(json_output: dict, user_query: str, user_id: str):
     """Generate initial interpretation of blood report using Groq."""
     patient_age = json_output.get("patient_info", {}).get("age", "Unknown")
@@ -0,0 +1,130 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from config.settings import settings
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Hashes made with a different cost are flagged by verify_and_update, so
+# changing BCRYPT_ROUNDS upgrades stored hashes as users log in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+password_hash_queue_depth = REGISTRY.gauge(
+    "password_hash_queue_depth", "Password hash/verify calls waiting for a worker."
+)
+password_hash_in_flight = REGISTRY.gauge(
+    "password_hash_in_flight", "Password hash/verify calls running on a worker."
+)
+password_hash_seconds = REGISTRY.histogram(
+    "password_hash_seconds",
+    "Password hash/verify CPU time by operation.",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+password_hash_wait_seconds = REGISTRY.histogram(
+    "password_hash_wait_seconds",
+    "Time password hash/verify calls waited for a worker.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+password_hash_rejected = REGISTRY.counter(
+    "password_hash_rejected_total", "Password operations rejected with a full queue."
+)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL, so `workers` threads use that many cores while
+    the event loop keeps serving other routes. At most `max_queue` calls
+    wait for a worker; beyond that callers get a 503 instead of piling up
+    behind a burst of logins.
+    """
+
+    def __init__(
+        self, workers: int, max_queue: int, context: CryptContext = pwd_context
+    ):
+        self.workers = workers
+        self.context = context
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def _run(self, operation: str, function, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                password_hash_rejected.inc()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many concurrent sign-ins, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        password_hash_queue_depth.inc()
+        submitted = time.perf_counter()
+        # Set under the lock by whichever of the worker or a cancelled caller
+        # leaves the queue first, so the depth gauge is decremented once.
+        dequeued = [False]
+
+        def leave_queue() -> bool:
+            with self._lock:
+                if dequeued[0]:
+                    return False
+                dequeued[0] = True
+            password_hash_queue_depth.dec()
+            return True
+
+        def timed():
+            started = time.perf_counter()
+            if not leave_queue():
+                return None
+            password_hash_in_flight.inc()
+            password_hash_wait_seconds.observe(started - submitted)
+            try:
+                return function(*args)
+            finally:
+                password_hash_in_flight.dec()
+                password_hash_seconds.observe(
+                    time.perf_counter() - started, operation=operation
+                )
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed
+            )
+        finally:
+            leave_queue()
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(
+        self, password: str, hashed: Optional[str]
+    ) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash should be upgraded."""
+        if not hashed:
+            # Same cost as a real check, so unknown usernames are not faster.
+            await self._run("verify", self.context.dummy_verify)
+            return False, None
+        return await self._run(
+            "verify", self.context.verify_and_update, password, hashed
+        )
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE
+)
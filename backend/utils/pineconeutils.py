@@ -4,6 +4,7 @@ import time
 import gc
 from langchain_core.documents import Document
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from langchain_google_genai._genai_extension import build_generative_service
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
@@ -11,22 +12,38 @@ from langchain.chains import create_retrieval_chain
 from pinecone import Pinecone, ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
 import logging
+import threading
 from config.settings import settings
+from utils.local_vector_store import LocalVectorStore
+from utils.embedding_cache import CachedEmbeddings
+from utils.embedding_batcher import BatchingEmbeddings
+from utils.chat_history import chat_history
+from utils.bm25 import BM25Index
+from utils.hybrid_retriever import CrossEncoderReranker, HybridRetriever
+from utils.llm_metrics import llm_metrics
+from utils.metrics import REGISTRY
+from utils.tracing import child_span
 from typing import List
-import uuid
-import psycopg2
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+vector_search_seconds = REGISTRY.histogram(
+    "vector_search_duration_seconds",
+    "Vector store similarity search latency, including the query embedding.",
+    ["backend"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
 # --- RAG System Configuration ---
 PATIENT_COL = "Patient"
 DOCTOR_COL = "Doctor"
 DESCRIPTION_COL = "Description"
 PINECONE_INDEX_NAME = "medical-conversations-rag"
 EMBEDDING_DIMENSION = 768
+EMBEDDING_MODEL = "models/embedding-001"
 BATCH_SIZE = 1000
 SUB_BATCH_SIZE = 100
 TOTAL_ROWS = 200000
@@ -34,9 +51,8 @@ START_ROW = 0
 
 # Set API keys (should be in environment variables or settings)
 os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY  # Ensure this is set in settings
-os.environ["PINECONE_API_KEY"] = (
-    settings.PINECONE_API_KEY
-)  # Ensure this is set in settings
+if settings.PINECONE_API_KEY:
+    os.environ["PINECONE_API_KEY"] = settings.PINECONE_API_KEY
 
 # Initialize RAG components globally
 embeddings_model = None
@@ -44,49 +60,147 @@ vector_store = None
 retrieval_chain = None
 
 
+def gemini_client_kwargs() -> dict:
+    """Client arguments sending Gemini calls to GOOGLE_API_ENDPOINT, if set.
+
+    Plain REST is used there, so the endpoint can be a local http:// fake.
+    """
+    if not settings.GOOGLE_API_ENDPOINT:
+        return {}
+    return {
+        "client_options": {"api_endpoint": settings.GOOGLE_API_ENDPOINT},
+        "transport": "rest",
+    }
+
+
+def create_gemini_embeddings() -> GoogleGenerativeAIEmbeddings:
+    client_kwargs = gemini_client_kwargs()
+    embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, **client_kwargs)
+    if client_kwargs:
+        # The embeddings class ignores transport when building its client.
+        embeddings.client = build_generative_service(
+            api_key=settings.GOOGLE_API_KEY, **client_kwargs
+        )
+    return embeddings
+
+
+def create_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        BatchingEmbeddings(
+            create_gemini_embeddings(),
+            window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+            max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+        ),
+        model=EMBEDDING_MODEL,
+        path=settings.EMBEDDING_CACHE_PATH or None,
+        max_memory_items=settings.EMBEDDING_CACHE_SIZE,
+    )
+
+
+def create_pinecone_vector_store(embeddings) -> PineconeVectorStore:
+    pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+    index_names = pc.list_indexes().names()
+    if PINECONE_INDEX_NAME not in index_names:
+        logger.info(f"Creating Pinecone index '{PINECONE_INDEX_NAME}'...")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=EMBEDDING_DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+        )
+        while not pc.describe_index(PINECONE_INDEX_NAME).status["ready"]:
+            time.sleep(5)
+        logger.info("Index created.")
+    else:
+        logger.info(f"Using existing index '{PINECONE_INDEX_NAME}'.")
+
+    index = pc.Index(PINECONE_INDEX_NAME)
+    logger.info(
+        f"Connected to index. Initial vector count: {index.describe_index_stats().total_vector_count}"
+    )
+    return PineconeVectorStore(index_name=PINECONE_INDEX_NAME, embedding=embeddings)
+
+
+def time_similarity_search(vector_store, backend: str):
+    """Time every similarity_search on the store, in metrics and trace spans."""
+    search = vector_store.similarity_search
+
+    def timed_search(*args, **kwargs):
+        with child_span("vector_search", backend=backend) as search_span:
+            started = time.perf_counter()
+            try:
+                documents = search(*args, **kwargs)
+            finally:
+                vector_search_seconds.observe(
+                    time.perf_counter() - started, backend=backend
+                )
+            search_span.set_attribute("results", len(documents))
+            return documents
+
+    vector_store.similarity_search = timed_search
+    return vector_store
+
+
+def create_vector_store(embeddings):
+    """Vector store selected by VECTOR_STORE_BACKEND ("pinecone" or "local")."""
+    if settings.VECTOR_STORE_BACKEND == "local":
+        store = LocalVectorStore(
+            settings.LOCAL_INDEX_PATH,
+            embeddings,
+            dim=EMBEDDING_DIMENSION,
+            dtype=settings.LOCAL_INDEX_DTYPE,
+            rescore=settings.LOCAL_INDEX_RESCORE,
+            nprobe=settings.LOCAL_INDEX_NPROBE,
+        )
+    else:
+        store = create_pinecone_vector_store(embeddings)
+    return time_similarity_search(store, settings.VECTOR_STORE_BACKEND)
+
+
+def create_retriever(vector_store):
+    """Similarity retriever, or the hybrid BM25 + vector retriever if configured."""
+    if settings.RAG_RETRIEVAL_MODE == "hybrid":
+        if os.path.exists(settings.BM25_INDEX_PATH):
+            reranker = None
+            if settings.RAG_RERANKER_MODEL:
+                reranker = CrossEncoderReranker(settings.RAG_RERANKER_MODEL)
+            logger.info("Using hybrid BM25 + vector retriever.")
+            return HybridRetriever(
+                vector_store=vector_store,
+                bm25=BM25Index.load(settings.BM25_INDEX_PATH),
+                k=settings.RAG_TOP_K,
+                candidates=settings.RAG_CANDIDATES,
+                reranker=reranker,
+            )
+        logger.warning(
+            f"No BM25 index at {settings.BM25_INDEX_PATH}; using vector retrieval only."
+        )
+    return vector_store.as_retriever(
+        search_type="similarity", search_kwargs={"k": settings.RAG_TOP_K}
+    )
+
+
 def initialize_rag_system():
     global embeddings_model, vector_store, retrieval_chain
     try:
         logger.info("Initializing RAG system...")
 
         # Initialize Embedding Model
-        embeddings_model = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        embeddings_model = create_embeddings()
         logger.info("Embedding model initialized.")
 
-        # Initialize Pinecone
-        pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
-        index_names = pc.list_indexes().names()
-        if PINECONE_INDEX_NAME not in index_names:
-            logger.info(f"Creating Pinecone index '{PINECONE_INDEX_NAME}'...")
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=EMBEDDING_DIMENSION,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-            )
-            while not pc.describe_index(PINECONE_INDEX_NAME).status["ready"]:
-                time.sleep(5)
-            logger.info("Index created.")
-        else:
-            logger.info(f"Using existing index '{PINECONE_INDEX_NAME}'.")
-
-        index = pc.Index(PINECONE_INDEX_NAME)
-        logger.info(
-            f"Connected to index. Initial vector count: {index.describe_index_stats().total_vector_count}"
-        )
-
-        # Load data into Pinecone if index is empty
-        vector_store = PineconeVectorStore(
-            index_name=PINECONE_INDEX_NAME, embedding=embeddings_model
-        )
+        vector_store = create_vector_store(embeddings_model)
 
         # Initialize LLM and RAG Chain
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.3)
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-1.5-flash-latest",
+            temperature=0.3,
+            callbacks=[llm_metrics],
+            **gemini_client_kwargs(),
+        )
         logger.info("LLM initialized.")
 
-        retriever = vector_store.as_retriever(
-            search_type="similarity", search_kwargs={"k": 3}
-        )
+        retriever = create_retriever(vector_store)
         prompt_template = ChatPromptTemplate.from_template(
             """
                 **Note:** You are an AI assistant using only the provided context from a dataset of patient-doctor conversations. You are not a doctor. Do not provide medical advice beyond the context. If the context lacks information, say so. Use the conversation history to understand references (e.g., pronouns like 'it') if relevant.
@@ -114,57 +228,75 @@ def initialize_rag_system():
         raise Exception(f"RAG initialization failed: {e}")
 
 
-# Initialize RAG system on startup
-initialize_rag_system()
+# --- Background initialization and readiness ---
+# initialize_rag_system talks to Pinecone and may wait for a new index, so it
+# runs on a background thread; only RAG requests wait for it to finish.
+rag_ready = threading.Event()
+_rag_lock = threading.Lock()
+rag_status = {
+    "state": "not_started",
+    "error": None,
+    "started_at": None,
+    "ready_at": None,
+}
 
 
-def get_db_connection():
-    return psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
+def _initialize_in_background():
+    try:
+        initialize_rag_system()
+    except Exception as e:
+        with _rag_lock:
+            rag_status.update(state="failed", error=str(e))
+    else:
+        with _rag_lock:
+            rag_status.update(
+                state="ready", error=None, ready_at=datetime.utcnow().isoformat()
+            )
+    finally:
+        rag_ready.set()
+
+
+def start_rag_initialization():
+    """Start initializing the RAG system unless it is running or already done."""
+    with _rag_lock:
+        if rag_status["state"] in ("initializing", "ready"):
+            return
+        rag_ready.clear()
+        rag_status.update(
+            state="initializing", error=None, started_at=datetime.utcnow().isoformat()
+        )
+    thread = threading.Thread(
+        target=_initialize_in_background, name="rag-init", daemon=True
     )
+    thread.start()
+
+
+def get_rag_status() -> dict:
+    with _rag_lock:
+        return dict(rag_status)
+
+
+def get_retrieval_chain():
+    """The RAG chain, waiting for initialization if it is still in progress.
+
+    Starts initialization on first use (and retries after a failure), so the
+    RAG system also works when it was not started at application startup.
+    """
+    if not rag_ready.is_set() or rag_status["state"] == "failed":
+        start_rag_initialization()
+        if not rag_ready.wait(settings.RAG_INIT_WAIT_SECONDS):
+            raise RuntimeError("RAG system is still initializing, try again shortly")
+    if rag_status["state"] != "ready":
+        raise RuntimeError(f"RAG system unavailable: {rag_status['error']}")
+    return retrieval_chain
 
 
 # --- Chat History Storage for General Queries ---
 def store_general_chat_history(user_id: str, query: str, response: str):
-    """Store general query chat history in PostgreSQL."""
-    conn = get_db_connection()
-    c = conn.cursor()
-    chat_id = str(uuid.uuid4())
-    created_at = datetime.utcnow().isoformat()
-    c.execute(
-        """
-        INSERT INTO general_chat_history (id, user_id, query, response, created_at)
-        VALUES (%s, %s, %s, %s, %s)
-        """,
-        (chat_id, user_id, query, response, created_at),
-    )
-    conn.commit()
-    conn.close()
-    logger.info(f"Stored chat history for user {user_id}")
+    """Queue a general query turn; it is written to PostgreSQL in the background."""
+    chat_history.store(user_id, query, response)
 
 
 def get_general_chat_history(user_id: str) -> list:
-    """Retrieve general query chat history for a user from PostgreSQL."""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT query, response, created_at
-        FROM general_chat_history
-        WHERE user_id = %s
-        ORDER BY created_at DESC
-        LIMIT 2
-        """,
-        (user_id,),
-    )
-    history = [
-        {"query": row[0], "response": row[1], "created_at": row[2]}
-        for row in c.fetchall()
-    ]
-    conn.close()
-    logger.info(f"Retrieved chat history for user {user_id}")
-    return history
+    """The user's last two general query turns, newest first."""
+    return chat_history.recent(user_id, limit=2)
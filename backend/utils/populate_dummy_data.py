@@ -1,22 +1,10 @@
-import psycopg2
 import uuid
 from datetime import datetime
-from passlib.context import CryptContext
-from config.settings import settings
+from utils.db import get_db_connection
+from utils.passwords import pwd_context
 import logging
 
 logger = logging.getLogger(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def get_db_connection():
-    return psycopg2.connect(
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-    )
 
 
 def populate_dummy_data():
@@ -0,0 +1,268 @@
+"""Compressed codes for the local vector index.
+
+The full-precision vectors stay on disk for re-scoring; search scans only
+the compact codes, so the resident working set shrinks to the code size:
+int8 scalar codes are 4x smaller than float32, product-quantization codes
+(one byte per subspace, 192 by default) 16x smaller.
+
+Quantize an existing index from backend/:
+    python -m utils.quantization --index data/vector_index --kind int8
+    python -m utils.quantization --index data/vector_index --kind pq --pq-m 192
+"""
+
+import os
+import logging
+import argparse
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scanned per block; bounds the float32 scratch memory per search.
+SEARCH_BLOCK_ROWS = 65536
+
+
+def truncate_file(path: str, size: int):
+    """Cut path down to size bytes if it is longer."""
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) for each row of data."""
+    centroid_norms = (centroids**2).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), SEARCH_BLOCK_ROWS):
+        block = np.asarray(data[start : start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+        labels[start : start + len(block)] = np.argmin(
+            centroid_norms - 2.0 * block @ centroids.T, axis=1
+        )
+    return labels
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        # Per-cluster sums via one sort + reduceat; np.add.at is far slower.
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, np.newaxis]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty))]
+    return centroids
+
+
+class ScalarQuantizer:
+    """Per-vector symmetric int8 codes: v ~= codes * scale."""
+
+    kind = "int8"
+    CODES_FILE = "codes_int8.bin"
+    SCALES_FILE = "scales.bin"
+    WIDEN_ROWS = 1024
+    # Candidates re-scored per result; int8 ranks are already close to exact.
+    default_rescore = 10
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.codes = np.empty((0, dim), dtype=np.int8)
+        self.scales = np.empty(0, dtype=np.float32)
+
+    def config(self) -> dict:
+        return {"kind": self.kind}
+
+    def train(self, vectors: np.ndarray):
+        pass
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def append(self, vectors: np.ndarray):
+        codes, scales = self.encode(vectors)
+        with open(os.path.join(self.path, self.CODES_FILE), "ab") as f:
+            f.write(codes.tobytes())
+        with open(os.path.join(self.path, self.SCALES_FILE), "ab") as f:
+            f.write(scales.tobytes())
+
+    def truncate(self, count: int):
+        """Drop codes past count, left by an append that crashed part-way."""
+        truncate_file(os.path.join(self.path, self.CODES_FILE), count * self.dim)
+        truncate_file(os.path.join(self.path, self.SCALES_FILE), count * 4)
+
+    def map(self, count: int):
+        if not count:
+            return
+        self.codes = np.memmap(
+            os.path.join(self.path, self.CODES_FILE),
+            dtype=np.int8,
+            mode="r",
+            shape=(count, self.dim),
+        )
+        self.scales = np.memmap(
+            os.path.join(self.path, self.SCALES_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(count,),
+        )
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        return queries
+
+    def scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        # Widen small slices into a reused buffer that stays in cache; one
+        # large astype() costs more than the matrix product itself.
+        scores = np.empty((len(queries), end - start), dtype=np.float32)
+        buffer = np.empty((self.WIDEN_ROWS, self.dim), dtype=np.float32)
+        for offset in range(start, end, self.WIDEN_ROWS):
+            codes = self.codes[offset : min(offset + self.WIDEN_ROWS, end)]
+            widened = buffer[: len(codes)]
+            np.copyto(widened, codes, casting="unsafe")
+            scores[:, offset - start : offset - start + len(codes)] = (
+                queries @ widened.T
+            )
+        return scores * self.scales[start:end]
+
+    def score_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        codes = np.asarray(self.codes[rows], dtype=np.float32)
+        return (queries @ codes.T) * self.scales[rows]
+
+    def remove_files(self):
+        for name in (self.CODES_FILE, self.SCALES_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+
+class ProductQuantizer:
+    """Splits vectors into m subspaces, each coded by one of 256 centroids.
+
+    Inner products are computed with per-query lookup tables (asymmetric
+    distance computation), so queries are never quantized.
+    """
+
+    kind = "pq"
+    CODEBOOK_FILE = "pq_codebooks.npy"
+    CODES_FILE = "pq_codes.bin"
+    default_rescore = 50
+
+    def __init__(self, path: str, dim: int, m: int = 192):
+        if dim % m:
+            raise ValueError(f"PQ subspaces ({m}) must divide the dimension ({dim})")
+        self.path = path
+        self.dim = dim
+        self.m = m
+        self.codes = np.empty((0, m), dtype=np.uint8)
+        codebook_path = os.path.join(path, self.CODEBOOK_FILE)
+        self.codebooks: Optional[np.ndarray] = (
+            np.load(codebook_path) if os.path.exists(codebook_path) else None
+        )
+
+    def config(self) -> dict:
+        return {"kind": self.kind, "m": self.m}
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) -> (m, n, dim / m)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors.reshape(len(vectors), self.m, -1).transpose(1, 0, 2)
+
+    def train(self, vectors: np.ndarray, sample: int = 50000, iterations: int = 15):
+        rng = np.random.default_rng(0)
+        if len(vectors) > sample:
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+        subspaces = self._split(vectors)
+        self.codebooks = np.stack(
+            [kmeans(sub, 256, iterations, seed=i) for i, sub in enumerate(subspaces)]
+        )
+        np.save(os.path.join(self.path, self.CODEBOOK_FILE), self.codebooks)
+        logger.info(f"Trained PQ codebooks: {self.m} x {self.codebooks.shape[1]}")
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subspaces = self._split(vectors)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign(subspaces[j], self.codebooks[j])
+        return codes
+
+    def append(self, vectors: np.ndarray):
+        with open(os.path.join(self.path, self.CODES_FILE), "ab") as f:
+            f.write(self.encode(vectors).tobytes())
+
+    def truncate(self, count: int):
+        """Drop codes past count, left by an append that crashed part-way."""
+        truncate_file(os.path.join(self.path, self.CODES_FILE), count * self.m)
+
+    def map(self, count: int):
+        if not count:
+            return
+        self.codes = np.memmap(
+            os.path.join(self.path, self.CODES_FILE),
+            dtype=np.uint8,
+            mode="r",
+            shape=(count, self.m),
+        )
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        """Lookup tables: tables[q, j, c] = <subvector j of query q, centroid c>."""
+        return np.einsum("mqd,mcd->qmc", self._split(queries), self.codebooks)
+
+    def scores(self, tables: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = np.asarray(self.codes[start:end])
+        scores = np.zeros((len(tables), len(block)), dtype=np.float32)
+        for j in range(self.m):
+            scores += tables[:, j, block[:, j]]
+        return scores
+
+    def score_rows(self, tables: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        codes = np.asarray(self.codes[rows])
+        scores = np.zeros((len(tables), len(rows)), dtype=np.float32)
+        for j in range(self.m):
+            scores += tables[:, j, codes[:, j]]
+        return scores
+
+    def remove_files(self):
+        for name in (self.CODEBOOK_FILE, self.CODES_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+
+def load_quantizer(path: str, dim: int, config: Optional[dict]):
+    if not config:
+        return None
+    if config["kind"] == "int8":
+        return ScalarQuantizer(path, dim)
+    if config["kind"] == "pq":
+        return ProductQuantizer(path, dim, config["m"])
+    raise ValueError(f"Unknown quantization: {config['kind']}")
+
+
+def main():
+    from utils.local_vector_store import LocalVectorStore
+
+    parser = argparse.ArgumentParser(description="Quantize a local vector index.")
+    parser.add_argument("--index", required=True)
+    parser.add_argument("--kind", choices=["int8", "pq", "none"], required=True)
+    parser.add_argument("--pq-m", type=int, default=192, help="PQ subspaces")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocalVectorStore(args.index, None)
+    store.quantize(None if args.kind == "none" else args.kind, m=args.pq_m)
+
+
+if __name__ == "__main__":
+    main()
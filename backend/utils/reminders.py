@@ -0,0 +1,226 @@
+"""Next-day appointment reminders, queued in bulk into the email outbox.
+
+For a given date, one query (served by appointments_reminder_idx) fetches
+every non-cancelled appointment of the hospitals in this worker's shard,
+with the patient's email, the doctor and the department joined in. The
+messages are rendered in memory and queued per hospital with one multi-row
+INSERT into email_outbox; utils.mail_sender delivers them over pooled SMTP
+sessions. The dedupe key includes the appointment's date and time, so
+re-running a day, or two workers on the same shard, never queues a
+reminder twice, while a rescheduled appointment gets a fresh one.
+
+Hospitals are split into REMINDER_SHARD_COUNT shards by their id; run one
+scheduler per shard index to spread the work.
+
+Run once from backend/ (e.g. from cron):
+    python -m utils.reminders --date 2026-10-20 --shard 0 --shards 4
+"""
+
+import time
+import uuid
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from utils.db import get_db_connection
+from utils.email import enqueue_emails
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+reminders_queued = REGISTRY.counter(
+    "appointment_reminders_queued_total", "Appointment reminders added to the outbox."
+)
+reminders_skipped = REGISTRY.counter(
+    "appointment_reminders_duplicate_total",
+    "Appointment reminders already in the outbox from an earlier run.",
+)
+reminder_run_seconds = REGISTRY.histogram(
+    "appointment_reminder_run_seconds", "Duration of one reminder run for a shard."
+)
+
+
+def render_reminder_email(
+    patient_username: str,
+    doctor_username: str,
+    department_name: str,
+    hospital_name: str,
+    appointment_date: str,
+    start_time: str,
+) -> dict:
+    body = f"""
+        Dear {patient_username},
+
+        This is a reminder of your upcoming appointment.
+
+        Details:
+        - Doctor: {doctor_username}
+        - Department: {department_name}
+        - Hospital: {hospital_name}
+        - Date: {appointment_date}
+        - Time: {start_time}
+
+        Please arrive 10 minutes early. If you need to cancel or reschedule, contact us.
+
+        Best regards,
+        Your Healthcare Team
+        """
+    return {"subject": "Appointment Reminder", "body": body}
+
+
+def shard_hospitals(cursor, shard: int, shards: int) -> List[str]:
+    cursor.execute("SELECT id FROM hospitals")
+    return [
+        row[0]
+        for row in cursor.fetchall()
+        if uuid.UUID(str(row[0])).int % shards == shard
+    ]
+
+
+def queue_reminders(day: date, shard: int = 0, shards: int = 1) -> int:
+    """Queue reminders for every appointment on `day` in this shard's hospitals."""
+    started = time.perf_counter()
+    appointment_date = day.isoformat()
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        hospitals = shard_hospitals(c, shard, shards)
+        if not hospitals:
+            return 0
+        c.execute(
+            """
+            SELECT a.id, a.hospital_id, a.start_time, p.username, p.email,
+                   d.username, dep.name, h.name
+            FROM appointments a
+            JOIN users p ON p.id = a.user_id
+            JOIN users d ON d.id = a.doctor_id
+            JOIN departments dep ON dep.id = a.department_id
+            JOIN hospitals h ON h.id = a.hospital_id
+            WHERE a.appointment_date = %s
+              AND a.status <> 'cancelled'
+              AND a.hospital_id = ANY(%s::uuid[])
+              AND p.email IS NOT NULL
+            """,
+            (appointment_date, hospitals),
+        )
+        by_hospital: Dict[str, List[dict]] = defaultdict(list)
+        for (
+            appointment_id,
+            hospital_id,
+            start_time,
+            patient_username,
+            patient_email,
+            doctor_username,
+            department_name,
+            hospital_name,
+        ) in c.fetchall():
+            email = render_reminder_email(
+                patient_username,
+                doctor_username,
+                department_name,
+                hospital_name,
+                appointment_date,
+                start_time,
+            )
+            email.update(
+                kind="reminder",
+                recipient=patient_email,
+                dedupe_key=f"reminder:{appointment_id}:{appointment_date}:{start_time}",
+            )
+            by_hospital[hospital_id].append(email)
+
+        # One transaction per hospital keeps a failure from losing the
+        # others' work; a re-run picks up where this one stopped.
+        queued = total = 0
+        for emails in by_hospital.values():
+            queued += enqueue_emails(c, emails)
+            conn.commit()
+            total += len(emails)
+    finally:
+        conn.close()
+
+    reminders_queued.inc(queued)
+    reminders_skipped.inc(total - queued)
+    reminder_run_seconds.observe(time.perf_counter() - started)
+    logger.info(
+        f"Queued {queued} reminders for {appointment_date} "
+        f"(shard {shard}/{shards}, {total - queued} already queued)"
+    )
+    return queued
+
+
+def next_run(times: List[str], now: datetime) -> datetime:
+    """The next of the daily HH:MM (UTC) run times after now."""
+    candidates = []
+    for value in times:
+        hour, minute = (int(part) for part in value.split(":"))
+        run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        candidates.append(run if run > now else run + timedelta(days=1))
+    return min(candidates)
+
+
+class ReminderScheduler:
+    """Queues the next day's reminders at each configured time of day."""
+
+    def __init__(self, times: List[str], shard: int = 0, shards: int = 1):
+        self.times = times
+        self.shard = shard
+        self.shards = shards
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while True:
+            now = datetime.utcnow()
+            if self._stop.wait((next_run(self.times, now) - now).total_seconds()):
+                return
+            try:
+                tomorrow = datetime.utcnow().date() + timedelta(days=1)
+                queue_reminders(tomorrow, self.shard, self.shards)
+            except Exception as e:
+                logger.error(f"Reminder run failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="reminder-scheduler", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Reminder scheduler running at {', '.join(self.times)} UTC "
+            f"for shard {self.shard}/{self.shards}"
+        )
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_reminder_scheduler() -> ReminderScheduler:
+    return ReminderScheduler(
+        [t.strip() for t in settings.REMINDER_TIMES.split(",") if t.strip()],
+        settings.REMINDER_SHARD_INDEX,
+        settings.REMINDER_SHARD_COUNT,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue appointment reminders.")
+    parser.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        default=datetime.utcnow().date() + timedelta(days=1),
+        help="Appointment date (default: tomorrow, UTC)",
+    )
+    parser.add_argument("--shard", type=int, default=settings.REMINDER_SHARD_INDEX)
+    parser.add_argument("--shards", type=int, default=settings.REMINDER_SHARD_COUNT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    queue_reminders(args.date, args.shard, args.shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""Postgres-backed job queue for /api/medical-query report analysis.
+
+An async request stores the uploaded PDF and query in report_jobs and
+returns the job id at once. Workers claim one job at a time with
+FOR UPDATE SKIP LOCKED and run its stages in order:
+
+    parse      LlamaParse the PDF into text
+    structure  Groq turns the text into the structured report JSON
+    answer     Groq answers the query against the report
+
+Each stage is retried in place (REPORT_JOB_STAGE_RETRIES, exponential
+backoff) and its output is saved before the next stage starts, so a job
+that is re-run resumes at the stage that failed instead of paying for
+LlamaParse again. A job whose stage keeps failing is re-queued with backoff
+up to REPORT_JOB_MAX_ATTEMPTS, then marked failed. Claiming sets a lease on
+next_attempt_at; a worker that dies mid-job loses it and another worker
+picks the job up.
+
+Workers are independent of the API processes: run them in the API with
+REPORT_JOB_WORKERS > 0, or scale them separately from backend/ with
+    python -m utils.report_jobs --concurrency 4
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import psycopg2
+
+from config.settings import settings
+from utils.db import get_db_connection
+from utils.metrics import REGISTRY
+from utils.tracing import span
+from utils.parser import (
+    answer_medical_query,
+    parse_blood_report,
+    store_chat_history,
+    structure_report,
+)
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["parse", "structure", "answer"]
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+report_jobs_finished = REGISTRY.counter(
+    "report_jobs_finished_total",
+    "Report jobs by outcome (succeeded, failed, requeued).",
+    ["outcome"],
+)
+report_job_stage_seconds = REGISTRY.histogram(
+    "report_job_stage_seconds",
+    "Report job stage duration, including in-place retries.",
+    ["stage"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+report_job_stage_retries = REGISTRY.counter(
+    "report_job_stage_retries_total", "In-place report job stage retries.", ["stage"]
+)
+report_job_queue_seconds = REGISTRY.histogram(
+    "report_job_queue_seconds",
+    "Time from submission to first claim.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+report_jobs_running = REGISTRY.gauge(
+    "report_jobs_running", "Report jobs being processed by this process."
+)
+
+
+def create_job(
+    user_id: str,
+    query: str,
+    document: Optional[bytes] = None,
+    filename: Optional[str] = None,
+    structured_report: Optional[dict] = None,
+) -> str:
+    """Queue a job; without a document it starts at the answer stage."""
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            INSERT INTO report_jobs (
+                id, user_id, status, stage, query, filename, document,
+                structured_report, next_attempt_at, created_at
+            ) VALUES (%s, %s, 'queued', %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                job_id,
+                user_id,
+                "parse" if document is not None else "answer",
+                query,
+                filename,
+                psycopg2.Binary(document) if document is not None else None,
+                json.dumps(structured_report) if structured_report else None,
+                now,
+                now,
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Queued report job {job_id} for user {user_id}")
+    return job_id
+
+
+def get_job(job_id: str, user_id: str) -> Optional[dict]:
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT id, status, stage, structured_report, response, error,
+                   attempts, created_at, finished_at
+            FROM report_jobs
+            WHERE id = %s AND user_id = %s
+            """,
+            (job_id, user_id),
+        )
+        row = c.fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {
+        "job_id": row[0],
+        "status": row[1],
+        "stage": row[2],
+        "structured_report": json.loads(row[3]) if row[3] else None,
+        "response": row[4],
+        "error": row[5],
+        "attempts": row[6],
+        "created_at": row[7],
+        "finished_at": row[8],
+    }
+
+
+async def wait_for_job(job_id: str, user_id: str, timeout: float) -> Optional[dict]:
+    """Long-poll: the job once it finishes, or its current state after timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await asyncio.to_thread(get_job, job_id, user_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return job
+        if time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(settings.REPORT_JOB_POLL_SECONDS)
+
+
+def latest_report(user_id: str) -> Optional[dict]:
+    """Structured report of the user's most recent finished job, if any."""
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT structured_report FROM report_jobs
+            WHERE user_id = %s AND status = 'succeeded' AND structured_report IS NOT NULL
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (user_id,),
+        )
+        row = c.fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+class ReportJobWorker:
+    def __init__(
+        self,
+        concurrency: int = 2,
+        stage_retries: int = 3,
+        max_attempts: int = 3,
+        lease_seconds: float = 600.0,
+        poll_seconds: float = 1.0,
+    ):
+        self.concurrency = concurrency
+        self.stage_retries = stage_retries
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+
+    def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute(
+                """
+                UPDATE report_jobs
+                SET status = 'running', attempts = attempts + 1, next_attempt_at = %s
+                WHERE id = (
+                    SELECT id FROM report_jobs
+                    WHERE status IN ('queued', 'running') AND next_attempt_at <= %s
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, user_id, stage, query, filename, document, report_text,
+                          structured_report, attempts, created_at
+                """,
+                (now + timedelta(seconds=self.lease_seconds), now),
+            )
+            row = c.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        job = dict(
+            zip(
+                [
+                    "id",
+                    "user_id",
+                    "stage",
+                    "query",
+                    "filename",
+                    "document",
+                    "report_text",
+                    "structured_report",
+                    "attempts",
+                    "created_at",
+                ],
+                row,
+            )
+        )
+        if job["attempts"] == 1:
+            report_job_queue_seconds.observe((now - job["created_at"]).total_seconds())
+        return job
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = %s" for name in fields)
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute(
+                f"UPDATE report_jobs SET {assignments} WHERE id = %s",
+                (*fields.values(), job_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def _with_retries(self, stage: str, function):
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.stage_retries):
+                try:
+                    with span(f"report_job.{stage}", attempt=attempt + 1):
+                        return await function()
+                except Exception as e:
+                    if attempt + 1 == self.stage_retries:
+                        raise
+                    report_job_stage_retries.inc(stage=stage)
+                    logger.warning(f"Report job stage {stage} failed, retrying: {e}")
+                    await asyncio.sleep(2**attempt)
+        finally:
+            report_job_stage_seconds.observe(
+                time.perf_counter() - started, stage=stage
+            )
+
+    async def _parse(self, job: dict) -> str:
+        suffix = os.path.splitext(job["filename"] or "")[1] or ".pdf"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(bytes(job["document"]))
+            path = f.name
+        try:
+            return await parse_blood_report(path)
+        finally:
+            os.remove(path)
+
+    async def _structure(self, job: dict) -> Optional[dict]:
+        json_output, _ = await structure_report(job["report_text"])
+        return json_output if isinstance(json_output, dict) else None
+
+    async def process(self, job: dict):
+        job_id = job["id"]
+        structured = (
+            json.loads(job["structured_report"]) if job["structured_report"] else None
+        )
+        stage = job["stage"]
+        try:
+            if stage == "parse":
+                job["report_text"] = await self._with_retries(
+                    "parse", lambda: self._parse(job)
+                )
+                stage = "structure"
+                # The PDF is not needed once its text is saved.
+                await asyncio.to_thread(
+                    self._update,
+                    job_id,
+                    stage=stage,
+                    report_text=job["report_text"],
+                    document=None,
+                )
+            if stage == "structure":
+                try:
+                    structured = await self._with_retries(
+                        "structure", lambda: self._structure(job)
+                    )
+                except Exception as e:
+                    # As in the synchronous path, answer without the report.
+                    logger.error(f"Could not structure report for job {job_id}: {e}")
+                    structured = None
+                stage = "answer"
+                await asyncio.to_thread(
+                    self._update,
+                    job_id,
+                    stage=stage,
+                    structured_report=json.dumps(structured) if structured else None,
+                )
+            response = await self._with_retries(
+                "answer",
+                lambda: asyncio.to_thread(
+                    answer_medical_query, job["query"], structured
+                ),
+            )
+        except Exception as e:
+            await asyncio.to_thread(self._fail, job, stage, str(e))
+            return
+
+        await asyncio.to_thread(
+            self._update,
+            job_id,
+            status="succeeded",
+            response=response,
+            error=None,
+            finished_at=datetime.utcnow(),
+        )
+        store_chat_history(
+            user_id=str(job["user_id"]),
+            query=job["query"],
+            report_json=json.dumps(structured) if structured else "",
+            response=response,
+        )
+        report_jobs_finished.inc(outcome="succeeded")
+        logger.info(f"Report job {job_id} succeeded")
+
+    def _fail(self, job: dict, stage: str, error: str):
+        if job["attempts"] < self.max_attempts:
+            delay = 30 * 2 ** (job["attempts"] - 1)
+            self._update(
+                job["id"],
+                status="queued",
+                error=error,
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+            )
+            report_jobs_finished.inc(outcome="requeued")
+            logger.warning(
+                f"Report job {job['id']} failed at {stage}, retrying in {delay}s: {error}"
+            )
+        else:
+            self._update(
+                job["id"],
+                status="failed",
+                error=error,
+                document=None,
+                finished_at=datetime.utcnow(),
+            )
+            report_jobs_finished.inc(outcome="failed")
+            logger.error(f"Report job {job['id']} failed at {stage}: {error}")
+
+    async def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = await asyncio.to_thread(self.claim)
+            except Exception as e:
+                logger.error(f"Report job claim failed: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            report_jobs_running.inc()
+            try:
+                with span("report_job", job_id=str(job["id"]), stage=job["stage"]):
+                    await self.process(job)
+            except Exception as e:
+                # Recording the outcome failed (e.g. the database went away);
+                # the job's lease expires and another claim re-delivers it.
+                logger.error(f"Report job {job['id']} could not be completed: {e}")
+            finally:
+                report_jobs_running.dec()
+
+    async def run(self):
+        logger.info(f"Report job worker running with concurrency {self.concurrency}")
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+    def start(self):
+        """Run in a background thread with its own event loop."""
+        thread = threading.Thread(
+            target=asyncio.run, args=(self.run(),), name="report-jobs", daemon=True
+        )
+        thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_report_job_worker(concurrency: int) -> ReportJobWorker:
+    return ReportJobWorker(
+        concurrency=concurrency,
+        stage_retries=settings.REPORT_JOB_STAGE_RETRIES,
+        max_attempts=settings.REPORT_JOB_MAX_ATTEMPTS,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued report jobs.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(create_report_job_worker(args.concurrency).run())
+
+
+if __name__ == "__main__":
+    main()
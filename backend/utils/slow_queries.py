@@ -0,0 +1,331 @@
+"""Slow-query log for statements run through utils.db's instrumented cursor.
+
+A statement slower than SLOW_QUERY_THRESHOLD_MS is recorded with its
+normalized SQL (literals replaced by ?), the shape of its parameters (types
+only, never values), its row count and duration. A sample of slow SELECTs
+(SLOW_QUERY_EXPLAIN_RATIO, at most one per statement name every
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS) also gets an
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) plan. Other statements are never
+explained, since ANALYZE executes them.
+
+The request only pays for a queue put: a background thread re-runs the
+EXPLAIN on its own connection and writes entries to the slow_queries table
+(SLOW_QUERY_SINK=table) or as JSON lines to SLOW_QUERY_LOG_PATH
+(SLOW_QUERY_SINK=file). Entries are dropped when the queue is full.
+
+Summarize the slowest statements from backend/ with:
+    python -m utils.slow_queries --top 20
+"""
+
+import re
+import json
+import time
+import uuid
+import queue
+import random
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import psycopg2.extensions
+
+from config.settings import settings
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+slow_queries_total = REGISTRY.counter(
+    "db_slow_queries_total",
+    "Statements slower than the slow-query threshold.",
+    ["statement"],
+)
+slow_query_plans_total = REGISTRY.counter(
+    "db_slow_query_plans_total", "EXPLAIN ANALYZE plans captured for slow statements."
+)
+slow_queries_dropped = REGISTRY.counter(
+    "db_slow_queries_dropped_total", "Slow-query entries dropped with the queue full."
+)
+
+_PLACEHOLDER = re.compile(r"%(?:\(\w+\))?s")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_LEADING_COMMENT = re.compile(r"^\s*/\*.*?\*/", re.S)
+# Row lists from execute_values and long IN lists collapse to one entry.
+_REPEATED_TUPLES = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_REPEATED_VALUES = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_sql(query: str) -> str:
+    """SQL with literals and placeholders replaced by ? and whitespace collapsed."""
+    query = _PLACEHOLDER.sub("?", query)
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _WHITESPACE.sub(" ", query).strip()
+    query = _REPEATED_VALUES.sub("?, ...", query)
+    return _REPEATED_TUPLES.sub(r"\1, ...", query)
+
+
+def _type_name(value: Any) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+def params_shape(args: Any, many: bool = False) -> str:
+    """Parameter types without their values, e.g. (str, str, int).
+
+    For executemany, the number of rows and the first row's shape.
+    """
+    if args is None:
+        return ""
+    if many:
+        rows = list(args)
+        return f"{len(rows)} x {params_shape(rows[0]) if rows else '()'}"
+    if isinstance(args, dict):
+        return "{" + ", ".join(f"{k}: {_type_name(v)}" for k, v in args.items()) + "}"
+    return "(" + ", ".join(_type_name(v) for v in args) + ")"
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float,
+        explain_ratio: float = 0.1,
+        explain_interval: float = 300.0,
+        sink: str = "table",
+        path: str = "data/slow_queries.jsonl",
+        max_queue: int = 1000,
+    ):
+        self.threshold = threshold_ms / 1000.0
+        self.explain_ratio = explain_ratio
+        self.explain_interval = explain_interval
+        self.sink = sink
+        self.path = path
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._last_explain: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _should_explain(self, name: str, query: str) -> bool:
+        if not _LEADING_COMMENT.sub("", query).lstrip().upper().startswith("SELECT"):
+            return False
+        if random.random() >= self.explain_ratio:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explain.get(name)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._last_explain[name] = now
+        return True
+
+    def record(
+        self,
+        name: str,
+        query: str,
+        args: Any,
+        duration: float,
+        rows: int,
+        many: bool = False,
+    ):
+        """Queue a slow statement; called by the cursor after it ran."""
+        slow_queries_total.inc(statement=name)
+        explain = not many and self._should_explain(name, query)
+        entry = {
+            "statement": name,
+            "normalized_sql": normalize_sql(query),
+            "params_shape": params_shape(args, many),
+            "rows": rows,
+            "duration_ms": round(duration * 1000, 3),
+            "created_at": datetime.utcnow(),
+            # The raw query and parameters are only kept until EXPLAIN runs.
+            "explain": (query, args) if explain else None,
+        }
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            slow_queries_dropped.inc()
+        logger.warning(f"Slow query {name}: {entry['duration_ms']:.1f} ms, {rows} rows")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="slow-query-log", daemon=True
+                )
+                self._thread.start()
+
+    def _cursor(self):
+        # Imported here: utils.db imports this module for its cursor.
+        from utils.db import get_db_connection
+
+        if self._conn is None or self._conn.closed:
+            self._conn = get_db_connection()
+            self._conn.autocommit = True
+        # A plain cursor, so the log's own statements are not timed and
+        # cannot feed back into it.
+        return self._conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+    def _explain(self, query: str, args: Any) -> Optional[str]:
+        try:
+            c = self._cursor()
+            # ANALYZE runs the SELECT again; a read-only transaction that is
+            # rolled back guarantees it cannot change anything.
+            c.execute("BEGIN READ ONLY")
+            try:
+                c.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, args)
+                plan = c.fetchone()[0]
+            finally:
+                c.execute("ROLLBACK")
+        except Exception as e:
+            logger.warning(f"Could not EXPLAIN slow query: {e}")
+            return None
+        slow_query_plans_total.inc()
+        return json.dumps(plan)
+
+    def _write(self, entry: dict):
+        if self.sink == "file":
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            return
+        c = self._cursor()
+        c.execute(
+            """
+            INSERT INTO slow_queries (
+                id, statement, normalized_sql, params_shape, rows, duration_ms,
+                plan, created_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                str(uuid.uuid4()),
+                entry["statement"],
+                entry["normalized_sql"],
+                entry["params_shape"],
+                entry["rows"],
+                entry["duration_ms"],
+                entry["plan"],
+                entry["created_at"],
+            ),
+        )
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            explain = entry.pop("explain")
+            entry["plan"] = self._explain(*explain) if explain else None
+            try:
+                self._write(entry)
+            except Exception as e:
+                logger.warning(f"Could not write slow query entry: {e}")
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS,
+    explain_ratio=settings.SLOW_QUERY_EXPLAIN_RATIO,
+    explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+    sink=settings.SLOW_QUERY_SINK,
+    path=settings.SLOW_QUERY_LOG_PATH,
+)
+
+
+# --- Report ---
+def load_entries(sink: str, path: str, since_hours: float) -> List[dict]:
+    if sink == "file":
+        cutoff = datetime.utcnow().timestamp() - since_hours * 3600
+        entries = []
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                created = datetime.fromisoformat(entry["created_at"])
+                if created.timestamp() >= cutoff:
+                    entries.append(entry)
+        return entries
+
+    from utils.db import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT statement, normalized_sql, params_shape, rows, duration_ms, plan
+            FROM slow_queries
+            WHERE created_at >= NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 hour'
+            ORDER BY created_at
+            """,
+            (since_hours,),
+        )
+        columns = [
+            "statement",
+            "normalized_sql",
+            "params_shape",
+            "rows",
+            "duration_ms",
+            "plan",
+        ]
+        return [dict(zip(columns, row)) for row in c.fetchall()]
+    finally:
+        conn.close()
+
+
+def plan_summary(plan: str) -> str:
+    """Top plan node, total time and shared buffers hit/read."""
+    root = json.loads(plan)[0]
+    node = root["Plan"]
+    return (
+        f"{node['Node Type']}, {root.get('Execution Time', 0):.1f} ms, "
+        f"buffers hit={node.get('Shared Hit Blocks', 0)} "
+        f"read={node.get('Shared Read Blocks', 0)}"
+    )
+
+
+def print_report(entries: List[dict], top: int):
+    by_statement: Dict[str, List[dict]] = defaultdict(list)
+    for entry in entries:
+        by_statement[entry["statement"]].append(entry)
+    ranked = sorted(
+        by_statement.items(),
+        key=lambda item: sum(e["duration_ms"] for e in item[1]),
+        reverse=True,
+    )
+    for name, group in ranked[:top]:
+        durations = sorted(e["duration_ms"] for e in group)
+        rows = max(e["rows"] for e in group)
+        print(
+            f"{name}: {len(group)} slow, total {sum(durations):.0f} ms, "
+            f"p50 {durations[len(durations) // 2]:.1f} ms, max {durations[-1]:.1f} ms, "
+            f"up to {rows} rows"
+        )
+        print(f"    {group[-1]['normalized_sql'][:200]}")
+        plans = [e["plan"] for e in group if e.get("plan")]
+        if plans:
+            print(f"    latest plan: {plan_summary(plans[-1])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the slow-query log.")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--since-hours", type=float, default=24)
+    args = parser.parse_args()
+    print_report(
+        load_entries(
+            settings.SLOW_QUERY_SINK, settings.SLOW_QUERY_LOG_PATH, args.since_hours
+        ),
+        args.top,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+token_cache_lookups = REGISTRY.counter(
+    "auth_token_cache_lookups_total",
+    "Verified-token cache lookups by result (hit, miss, revoked).",
+    ["result"],
+)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Bounded LRU of already-verified JWT claims, keyed by token digest.
+
+    An entry lives until the token's own `exp`, so a cached token expires
+    exactly when jwt.decode would start rejecting it. Only the digest is
+    kept, never the token itself.
+
+    Revocation is per process: revoke() denylists one token until it
+    expires; revoke_user() rejects every token of that user issued (`iat`)
+    before the call, and tokens without `iat`.
+    """
+
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        self._revoked_users: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                token_cache_lookups.inc(result="miss")
+                return None
+            expires, claims = entry
+            if expires <= now:
+                del self._entries[digest]
+                token_cache_lookups.inc(result="miss")
+                return None
+            self._entries.move_to_end(digest)
+        token_cache_lookups.inc(result="hit")
+        return claims
+
+    def put(self, token: str, claims: dict):
+        expires = claims.get("exp")
+        if expires is None or self.max_items <= 0:
+            return
+        with self._lock:
+            self._entries[token_digest(token)] = (float(expires), claims)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, token: str, claims: dict) -> bool:
+        with self._lock:
+            revoked = token_digest(token) in self._revoked
+            cutoff = self._revoked_users.get(claims.get("sub"))
+        if cutoff is not None:
+            issued = claims.get("iat")
+            revoked = revoked or issued is None or float(issued) < cutoff
+        if revoked:
+            token_cache_lookups.inc(result="revoked")
+        return revoked
+
+    def revoke(self, token: str, expires: float):
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._revoked[digest] = expires
+            # Denylist entries are only needed until the token expires anyway.
+            for key in [k for k, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[key]
+
+    def revoke_user(self, user_id: str):
+        cutoff = time.time()
+        with self._lock:
+            self._revoked_users[user_id] = cutoff
+            for key in [k for k, (_, c) in self._entries.items() if c.get("sub") == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
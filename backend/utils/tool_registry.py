@@ -0,0 +1,120 @@
+import time
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from config.settings import settings
+from utils.metrics import REGISTRY
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+tool_calls_total = REGISTRY.counter(
+    "agent_tool_calls_total", "Agent tool calls by outcome.", ["tool", "status"]
+)
+tool_latency_seconds = REGISTRY.histogram(
+    "agent_tool_latency_seconds", "Agent tool execution latency.", ["tool"]
+)
+tool_in_flight = REGISTRY.gauge(
+    "agent_tool_in_flight", "Agent tool calls currently executing.", ["tool"]
+)
+
+
+class ToolTimeoutError(Exception):
+    pass
+
+
+class NoArgs(BaseModel):
+    pass
+
+
+class Tool(BaseModel):
+    name: str
+    description: str
+    function: Callable
+    args_model: Type[BaseModel] = NoArgs
+    # None: callers wait for completion. Used by non-idempotent writes, which
+    # keep running after a timeout and could succeed after reporting failure.
+    timeout: Optional[float] = settings.TOOL_TIMEOUT_SECONDS
+    max_concurrency: int = settings.TOOL_MAX_CONCURRENCY
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class ToolRegistry:
+    """Name -> tool lookup with validated arguments and bounded async execution.
+
+    Each tool runs its (blocking) function on a dedicated thread pool sized to
+    its concurrency cap, so a hung database or RAG call can only tie up that
+    tool's own workers, and callers give up after the tool's timeout. A
+    timed-out call keeps running on its thread, so tools with side effects
+    set timeout=None rather than report a failure that may still succeed.
+    """
+
+    def __init__(self, tools: Optional[List[Tool]] = None):
+        self._tools: Dict[str, Tool] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        for tool in tools or []:
+            self.register(tool)
+
+    def register(self, tool: Tool):
+        self._tools[tool.name] = tool
+        self._executors[tool.name] = ThreadPoolExecutor(
+            max_workers=tool.max_concurrency, thread_name_prefix=f"tool-{tool.name}"
+        )
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    async def execute(self, name: str, **kwargs) -> Any:
+        tool = self._tools.get(name)
+        if tool is None:
+            raise KeyError(f"Tool {name} not found.")
+        arguments = tool.args_model(**kwargs).model_dump()
+
+        with span(f"tool {name}", tool=name) as tool_span:
+            # Copy the caller's context so request-scoped state, including
+            # the tool span, follows the call.
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, tool.function, **arguments)
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            tool_in_flight.inc(tool=name)
+            try:
+                future = loop.run_in_executor(self._executors[name], call)
+                if tool.timeout is None:
+                    result = await future
+                else:
+                    result = await asyncio.wait_for(future, tool.timeout)
+            except asyncio.TimeoutError:
+                tool_calls_total.inc(tool=name, status="timeout")
+                logger.error(f"Tool {name} timed out after {tool.timeout}s")
+                raise ToolTimeoutError(f"Tool {name} timed out after {tool.timeout}s")
+            except Exception:
+                tool_calls_total.inc(tool=name, status="error")
+                raise
+            finally:
+                tool_in_flight.dec(tool=name)
+                tool_latency_seconds.observe(time.perf_counter() - started, tool=name)
+            if isinstance(result, (list, dict)):
+                tool_span.set_attribute("results", len(result))
+        tool_calls_total.inc(tool=name, status="ok")
+        return result
+
+    async def execute_many(self, calls: List[Tuple[str, Dict]]) -> List[Any]:
+        """Run independent tool calls concurrently, returning results in order."""
+        return await asyncio.gather(
+            *(self.execute(name, **arguments) for name, arguments in calls)
+        )
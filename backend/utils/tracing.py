@@ -0,0 +1,470 @@
+"""Span tracing for requests through the agent pipeline.
+
+A span times one step (an HTTP request, an agent, a tool, a query, an LLM
+call) and records its attributes. The current span lives in a contextvar,
+so spans opened inside it become its children, across awaits and into the
+tool executors, which run calls in a copy of the caller's context.
+
+    with span("router_agent", user_id=user_id) as s:
+        ...
+        s.set_attribute("action", routing.action)
+
+TracingMiddleware opens the root span of every HTTP request (continuing a
+W3C traceparent header if there is one) and returns its id in the
+X-Trace-Id header. child_span() only records inside an existing trace, for
+steps such as DB queries that would otherwise start a trace per statement
+in background workers.
+
+Finished spans are exported in batches by a background thread, either as
+JSON lines to TRACING_FILE or as OTLP/HTTP JSON to TRACING_OTLP_ENDPOINT.
+With TRACING_EXPORTER unset no spans are recorded. Print a trace file as
+timed trees from backend/ with:
+    python -m utils.tracing data/traces.jsonl [--trace TRACE_ID]
+"""
+
+import json
+import time
+import queue
+import random
+import asyncio
+import logging
+import argparse
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from config.settings import settings
+from utils.http_metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    recording = True
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        kind: str = "internal",
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            tracer.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NonRecordingSpan:
+    """Stands in for a span that is not sampled or has nowhere to go."""
+
+    recording = False
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING = _NonRecordingSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span():
+    return _current.get()
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: str = "internal",
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+):
+    """Start a span under the current one without making it current.
+
+    For steps that begin and end in different callbacks (LLM runs); call
+    end() when the step finishes.
+    """
+    parent = _current.get()
+    if parent is not None:
+        if not parent.recording:
+            return NON_RECORDING
+        return Span(name, parent.trace_id, parent.span_id, attributes, kind)
+    if tracer.exporter is None or random.random() >= tracer.sample_ratio:
+        return NON_RECORDING
+    return Span(name, trace_id or _new_trace_id(), parent_id, attributes, kind)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Run the block in a new current span, recording any exception."""
+    current = start_span(name, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def child_span(name: str, **attributes):
+    """Like span(), but only records inside an existing trace."""
+    parent = _current.get()
+    if parent is None or not parent.recording:
+        return _null_span()
+    return span(name, **attributes)
+
+
+@contextmanager
+def _null_span():
+    yield NON_RECORDING
+
+
+def traced(name: Optional[str] = None):
+    """Decorator running each call of a sync or async function in a span."""
+
+    def decorator(function):
+        span_name = name or function.__name__
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# --- Exporters ---
+class JSONFileExporter:
+    """Appends spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter:
+    """Posts spans to an OTLP/HTTP collector as JSON (POST {endpoint}/v1/traces)."""
+
+    KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(self, endpoint: str, service_name: str = "healthsync-backend"):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.session = requests.Session()
+
+    def _span(self, s: Span) -> dict:
+        data = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": self.KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in s.attributes.items()
+            ],
+            "status": (
+                {"code": 2, "message": s.error} if s.status == "error" else {"code": 1}
+            ),
+        }
+        if s.parent_id:
+            data["parentSpanId"] = s.parent_id
+        return data
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "utils.tracing"},
+                            "spans": [self._span(s) for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        response = self.session.post(self.url, json=payload, timeout=5)
+        response.raise_for_status()
+
+
+class Tracer:
+    """Queues finished spans and exports them in batches from one thread.
+
+    Spans are dropped, not blocked on, when the queue is full.
+    """
+
+    def __init__(
+        self,
+        exporter=None,
+        sample_ratio: float = 1.0,
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def export(self, s: Span):
+        if self.exporter is None:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _drain(self, first: Span) -> List[Span]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"Dropped {len(batch)} spans, export failed: {e}")
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._drain(first)
+            stop = batch[-1] is None
+            self._export([s for s in batch if s is not None])
+            if stop:
+                return
+            if len(batch) < self.batch_size:
+                time.sleep(self.flush_seconds)
+
+    def flush(self):
+        """Export everything queued so far and stop the export thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+
+def create_exporter():
+    if settings.TRACING_EXPORTER == "json":
+        return JSONFileExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "otlp":
+        return OTLPExporter(settings.TRACING_OTLP_ENDPOINT)
+    return None
+
+
+tracer = Tracer(create_exporter(), sample_ratio=settings.TRACING_SAMPLE_RATIO)
+
+
+# --- HTTP ---
+def parse_traceparent(header: str):
+    """(trace_id, parent span id) from a W3C traceparent header, or None."""
+    parts = header.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span around each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        headers = dict(scope.get("headers") or [])
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        root = start_span(
+            f"{scope['method']} {route}",
+            {"http.method": scope["method"], "http.route": route},
+            kind="server",
+            trace_id=remote[0] if remote else None,
+            parent_id=remote[1] if remote else None,
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if root.recording:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-trace-id", root.trace_id.encode())
+                    ]
+                if message["status"] >= 500:
+                    root.status = "error"
+            await send(message)
+
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            root.end()
+
+
+# --- Viewer ---
+def print_traces(path: str, trace_id: Optional[str] = None):
+    spans_by_trace: Dict[str, List[dict]] = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            s = json.loads(line)
+            if trace_id is None or s["trace_id"] == trace_id:
+                spans_by_trace[s["trace_id"]].append(s)
+
+    for tid, spans in spans_by_trace.items():
+        children = defaultdict(list)
+        ids = {s["span_id"] for s in spans}
+        for s in sorted(spans, key=lambda s: s["start_ns"]):
+            parent = s["parent_id"] if s["parent_id"] in ids else None
+            children[parent].append(s)
+        trace_start = min(s["start_ns"] for s in spans)
+        print(f"trace {tid}")
+
+        def show(s, depth):
+            offset = (s["start_ns"] - trace_start) / 1e6
+            attributes = " ".join(f"{k}={v}" for k, v in s["attributes"].items())
+            error = f" ERROR {s['error']}" if s["status"] == "error" else ""
+            print(
+                f"  {offset:>9.1f} ms {s['duration_ms']:>9.1f} ms  "
+                f"{'  ' * depth}{s['name']}  {attributes}{error}"
+            )
+            for child in children[s["span_id"]]:
+                show(child, depth + 1)
+
+        for root in children[None]:
+            show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print traces from a span file.")
+    parser.add_argument("path", nargs="?", default=settings.TRACING_FILE)
+    parser.add_argument("--trace", help="Only this trace id")
+    args = parser.parse_args()
+    print_traces(args.path, args.trace)
+
+
+if __name__ == "__main__":
+    main()